@@ -1,11 +1,155 @@
-from typing import Optional, Sequence
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from PIL import Image
+
+"""""
+Plots missions over a shared background raster.
+
+The faint all-waypoints scatter (and the polygon outline) is rasterized once
+with Agg; each mission only draws its path, depot and stops on a transparent
+axes laid over that raster. `render_missions` fans missions out over a
+process pool and skips missions whose route hash matches the manifest in the
+output directory. `plot_single_mission` keeps its old signature on top of it.
+
+Usage (from the repo root):
+  python -m Visualization.plot_mission --routes Optimized_Paths/routes_global.npy --out Optimized_Paths --expand
+"""
+
+FIGSIZE = (8, 7)
+DPI = 150
+AXES_RECT = (0.1, 0.08, 0.85, 0.85)      # left, bottom, width, height (figure fraction)
+MARGIN = 0.03
+PNG_COMPRESSION = 3                        # zlib level; 6 (default) is ~2x slower for ~5% smaller files
+MANIFEST = "plot_manifest.json"
+
+
+# --- Background ---
+@dataclass(frozen=True)
+class Background:
+    rgba: np.ndarray                      # (H, W, 4) uint8 raster of the whole figure
+    xlim: Tuple[float, float]
+    ylim: Tuple[float, float]
+    key: str                              # hash of the inputs, part of every mission hash
+
+# Plain Agg figure (no pyplot state), or a pyplot one when it is going to be shown
+def _new_figure(pyplot: bool = False):
+    if pyplot:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=FIGSIZE, dpi=DPI)
+    else:
+        fig = Figure(figsize=FIGSIZE, dpi=DPI)
+        FigureCanvasAgg(fig)
+    return fig, fig.add_axes(AXES_RECT)
+
+# Hash of everything the raster depends on: point and polygon contents plus the figure layout
+def background_key(points_lon_lat: np.ndarray, polygon_coords: Optional[np.ndarray] = None) -> str:
+    h = hashlib.sha1(np.ascontiguousarray(points_lon_lat, dtype=float).tobytes())
+    if polygon_coords is not None:
+        h.update(np.ascontiguousarray(polygon_coords, dtype=float).tobytes())
+    h.update(repr((FIGSIZE, DPI, AXES_RECT)).encode())
+    return h.hexdigest()
+
+def render_background(points_lon_lat: np.ndarray, polygon_coords: Optional[np.ndarray] = None,
+                      key: Optional[str] = None) -> Background:
+    pts = np.asarray(points_lon_lat, dtype=float)
+    extent = pts if polygon_coords is None else np.r_[pts, polygon_coords]
+    lo, hi = extent.min(axis=0), extent.max(axis=0)
+    pad = (hi - lo) * MARGIN
+    xlim, ylim = (lo[0] - pad[0], hi[0] + pad[0]), (lo[1] - pad[1], hi[1] + pad[1])
+
+    fig, ax = _new_figure()
+    fig.patch.set_facecolor("white")
+    ax.scatter(pts[:, 0], pts[:, 1], s=2, alpha=0.15, color="C0")
+    if polygon_coords is not None:
+        ax.plot(polygon_coords[:, 0], polygon_coords[:, 1], linewidth=0.6, color="0.5")
+    ax.set_xlim(xlim)
+    ax.set_ylim(ylim)
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    fig.canvas.draw()
+    rgba = np.asarray(fig.canvas.buffer_rgba()).copy()
+    return Background(rgba, xlim, ylim, key or background_key(pts, polygon_coords))
+
+_BACKGROUNDS: Dict[str, Background] = {}
+
+# Background for these points, rasterized once per process per content hash
+# (an id() key could hit for a new array that reuses a freed one's address)
+def cached_background(points_lon_lat: np.ndarray, polygon_coords: Optional[np.ndarray] = None) -> Background:
+    key = background_key(points_lon_lat, polygon_coords)
+    bg = _BACKGROUNDS.get(key)
+    if bg is None:
+        bg = _BACKGROUNDS[key] = render_background(points_lon_lat, polygon_coords, key)
+    return bg
+
+
+# --- One mission ---
+def draw_mission(bg: Background, pts: np.ndarray, mission_nodes: Sequence[int], depot_idx: int,
+                 title: Optional[str] = None, path_nodes: Optional[Sequence[int]] = None,
+                 pyplot: bool = False) -> Figure:
+    if len(mission_nodes) < 2:
+        raise ValueError("Mission must have at least depot->depot")
+    path = np.array(mission_nodes, dtype=int)
+
+    fig, ax = _new_figure(pyplot)
+    fig.patch.set_visible(False)
+    if pyplot:
+        fig.figimage(bg.rgba, 0, 0, zorder=0)
+    ax.set_xlim(bg.xlim)
+    ax.set_ylim(bg.ylim)
+    ax.axis("off")
+
+    # Mission path (real flown path when given)
+    flown = path if path_nodes is None else np.asarray(path_nodes, dtype=int)
+    ax.plot(pts[flown, 0], pts[flown, 1], linewidth=1.5, color="C0", label="Mission path")
+
+    # Depot
+    ax.scatter([pts[depot_idx, 0]], [pts[depot_idx, 1]], s=60, c="green", label="Depot")
+
+    # Mark mission middle stops
+    if len(path) > 2:
+        mid = path[1:-1]
+        ax.scatter(pts[mid, 0], pts[mid, 1], s=10, color="C1", label="Mission waypoints")
+
+    handles, labels = ax.get_legend_handles_labels()
+    background = Line2D([], [], marker="o", linestyle="", markersize=2, alpha=0.3, color="C0")
+    ax.legend([background] + handles, ["All waypoints"] + labels, loc="best")
+    ax.set_title(title or "Mission")
+    return fig
+
+# Draws the overlay straight onto a copy of the background raster and writes the PNG;
+# skips compositing the raster as an image artist, which costs more than the overlay
+def save_mission(fig: Figure, bg: Background, path) -> None:
+    renderer = fig.canvas.get_renderer()
+    renderer.clear()
+    np.asarray(renderer.buffer_rgba())[:] = bg.rgba
+    fig.draw(renderer)
+    Image.fromarray(np.asarray(renderer.buffer_rgba())).save(path, dpi=(DPI, DPI), compress_level=PNG_COMPRESSION)
+
+def mission_hash(bg: Background, mission_nodes, depot_idx: int, title, path_nodes) -> str:
+    h = hashlib.sha1(bg.key.encode())
+    h.update(np.asarray(mission_nodes, dtype=np.int64).tobytes())
+    if path_nodes is not None:
+        h.update(b"|" + np.asarray(path_nodes, dtype=np.int64).tobytes())
+    h.update(repr((depot_idx, title)).encode())
+    return h.hexdigest()
+
 
 """""
 Plots a single mission
 Given: (lon, lat) points as array | Sequence of indices mission route | depot index
        Title (optional) | save path (optional) | show boolean
+       Flown path (optional): route expanded through predecessors (src/path_expansion.py),
+       drawn instead of straight chords between the mission nodes
 """
 def plot_single_mission(
     points_lon_lat: np.ndarray,
@@ -14,39 +158,127 @@ def plot_single_mission(
     title: Optional[str] = None,
     save_path: Optional[str] = None,
     show: bool = True,
+    path_nodes: Optional[Sequence[int]] = None,
 ):
-    if len(mission_nodes) < 2:
-        raise ValueError("Mission must have at least depot->depot")
+    bg = cached_background(points_lon_lat)
+    fig = draw_mission(bg, points_lon_lat, mission_nodes, depot_idx, title, path_nodes, pyplot=show)
+    if save_path:
+        if show:
+            fig.savefig(save_path, dpi=DPI)
+        else:
+            save_mission(fig, bg, save_path)
+    if show:
+        import matplotlib.pyplot as plt
+        plt.show()
+        plt.close(fig)
 
-    pts = points_lon_lat
-    path = np.array(mission_nodes, dtype=int)
 
-    # Plot all points
-    plt.figure(figsize=(8, 7))
-    plt.scatter(pts[:, 0], pts[:, 1], s=2, alpha=0.15, label="All waypoints")
+# --- Batch ---
+_WORKER: Dict = {}
 
-    # Mission path
-    xs = pts[path, 0]
-    ys = pts[path, 1]
-    plt.plot(xs, ys, linewidth=1.5, label="Mission path")
+def _init_worker(bg: Background, points: np.ndarray):
+    _WORKER["bg"] = bg
+    _WORKER["points"] = points
 
-    # Depot
-    plt.scatter([pts[depot_idx, 0]], [pts[depot_idx, 1]], s=60, c="green", label="Depot")
+def _render_one(task) -> str:
+    path, nodes, depot_idx, title, flown = task
+    fig = draw_mission(_WORKER["bg"], _WORKER["points"], nodes, depot_idx, title, flown)
+    save_mission(fig, _WORKER["bg"], path)
+    return path
 
-    # Mark mission middle stops
-    if len(path) > 2:
-        mid = path[1:-1]
-        plt.scatter(pts[mid, 0], pts[mid, 1], s=10, label="Mission waypoints")
+def render_missions(points_lon_lat: np.ndarray, routes: Sequence[Sequence[int]], out_dir,
+                    depot_idx: int = 0, titles: Optional[Sequence[str]] = None,
+                    paths: Optional[Sequence[Sequence[int]]] = None,
+                    polygon_coords: Optional[np.ndarray] = None, workers: Optional[int] = None,
+                    pattern: str = "mission_{k}.png", force: bool = False) -> Dict:
+    """
+    Renders every mission to out_dir/pattern. Missions whose hash (route,
+    flown path, title, background) matches the manifest and whose file exists
+    are skipped. Returns {"rendered": [...], "skipped": [...], "background_s", "render_s"}.
+    """
+    import time
 
-    # Labels
-    plt.xlabel("Longitude")
-    plt.ylabel("Latitude")
-    plt.title(title or "Mission")
-    plt.legend(loc="best")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    bg = render_background(points_lon_lat, polygon_coords)
+    t_bg = time.perf_counter() - t0
 
-    if save_path:
-        plt.savefig(save_path, dpi=150, bbox_inches="tight")
-    if show:
-        plt.show()
+    manifest_path = out_dir / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() and not force else {}
+
+    tasks, skipped, hashes = [], [], {}
+    for k, nodes in enumerate(routes):
+        name = pattern.format(k=k)
+        title = titles[k] if titles else None
+        flown = paths[k] if paths is not None else None
+        digest = mission_hash(bg, nodes, depot_idx, title, flown)
+        hashes[name] = digest
+        if manifest.get(name) == digest and (out_dir / name).exists():
+            skipped.append(name)
+            continue
+        tasks.append((str(out_dir / name), np.asarray(nodes), depot_idx, title,
+                      None if flown is None else np.asarray(flown)))
+
+    t1 = time.perf_counter()
+    workers = workers or max(1, min(len(tasks), os.cpu_count() or 1))
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(bg, np.asarray(points_lon_lat))) as pool:
+            rendered = list(pool.map(_render_one, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
     else:
-        plt.close()
+        _init_worker(bg, np.asarray(points_lon_lat))
+        rendered = [_render_one(t) for t in tasks]
+
+    manifest.update(hashes)
+    tmp = manifest_path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    tmp.replace(manifest_path)
+    return {"rendered": rendered, "skipped": skipped, "background_s": t_bg,
+            "render_s": time.perf_counter() - t1, "workers": workers}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.config import DATA_DIR, OPT_DIR
+    from src.route_io import load_routes
+
+    parser = argparse.ArgumentParser(description="Render mission PNGs over a shared background")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--routes", default=str(OPT_DIR / "routes_global.npy"))
+    parser.add_argument("--out", default=str(OPT_DIR))
+    parser.add_argument("--expand", action="store_true", help="draw paths expanded through predecessors")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-render even unchanged missions")
+    args = parser.parse_args()
+
+    from src.geofence import load_polygon, polygon_rings
+
+    data_dir = Path(args.data_dir)
+    points = np.load(data_dir / "points_lat_long.npy")
+    polygon = next(polygon_rings(load_polygon(data_dir / "polygon_lon_lat.wkt")))
+    polygon = np.r_[polygon, polygon[:1]]
+    routes = [r for r in load_routes(args.routes) if len(r) >= 2]
+
+    # Titles with lengths from the distance matrix when it is available
+    titles = [f"Mission {k}" for k in range(len(routes))]
+    paths = None
+    try:
+        from src.route_metrics import load_evaluation_inputs, mission_table, to_csr
+        distances, _, _ = load_evaluation_inputs(data_dir)
+        lengths = mission_table(distances, *to_csr(routes))["length_ft"]
+        titles = [f"Mission {k} (len={length:.0f} ft)" for k, length in enumerate(lengths)]
+    except FileNotFoundError:
+        pass
+    if args.expand:
+        from src.path_expansion import load_expander
+        expander = load_expander(data_dir)
+        if expander is not None:
+            expanded = expander.expand_routes(routes)
+            paths = [expanded.mission(k) for k in range(len(expanded))]
+
+    out = render_missions(points, routes, args.out, titles=titles, paths=paths, polygon_coords=polygon,
+                          workers=args.workers, force=args.force)
+    print(f"[plot] rendered {len(out['rendered'])}, skipped {len(out['skipped'])} unchanged "
+          f"(background {out['background_s']:.2f}s, missions {out['render_s']:.2f}s on {out['workers']} workers)")
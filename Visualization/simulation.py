@@ -1,74 +1,138 @@
+import argparse
+import os
+
 import pygame
 import numpy as np
-from Visualization.visualize_map import load_world, lonlat_to_screen
+from Visualization.visualize_map import WINDOW_SIZE, Viewport, load_world, render_static
 from Visualization.path_samples import get_sample_path
+from src.fleet_sim import haversine_m
+from src.path_expansion import load_expander
 
 DRONE_COLOR = (0, 0, 0)
-DRONE_RADIUS = 6
-SPEED = 0.002
-
-def interpolate(a, b, t):
-    return a + (b - a) * t
-
-def main():
-    pygame
-    screen = pygame.display.set_mode((1000, 800))
+DONE_COLOR = (150, 150, 150)
+DRONE_RADIUS = 4
+SPEED_MPS = 12.0                    # ground speed, same default as src/fleet_sim.py
+SPEED_STEPS = (1, 2, 5, 10, 20, 50, 100, 200, 500)     # sim seconds per wall second
+FPS = 60
+ROUTES_PATH = os.path.join(os.path.dirname(__file__), "..", "Optimized_Paths", "routes_global.npy")
+
+# --- Playback ---
+# Every route as one flat waypoint array (mission k is xy[offsets[k]:offsets[k + 1]]) with a
+# cumulative arc-length table over the whole fleet, so positions at time t for all drones
+# are one searchsorted + interpolation
+class FleetPlayback:
+    def __init__(self, paths, lonlat, speed_mps=SPEED_MPS):
+        paths = [np.asarray(p, dtype=np.int64) for p in paths if len(p)]
+        self.n = len(paths)
+        self.lengths = np.array([len(p) for p in paths], dtype=np.int64)
+        self.offsets = np.r_[0, np.cumsum(self.lengths)].astype(np.int64)
+        nodes = np.concatenate(paths) if paths else np.zeros(0, dtype=np.int64)
+        self.xy = np.asarray(lonlat, dtype=float)[nodes].reshape(-1, 2)
+        self.speed = speed_mps
+
+        # Leg lengths in metres; the first point of each mission starts a new table
+        leg = haversine_m(self.xy[:-1, 1], self.xy[:-1, 0], self.xy[1:, 1], self.xy[1:, 0])
+        leg[self.offsets[1:-1] - 1] = 0.0
+        self.cum = np.r_[0.0, np.cumsum(leg)]                # fleet-wide, non-decreasing
+        self.start = self.cum[self.offsets[:-1]]
+        self.total = self.cum[self.offsets[1:] - 1] - self.start
+        self.duration = float(self.total.max() / speed_mps) if self.n else 0.0
+
+    # (n, 2) lon/lat of every drone and which have landed, t seconds after a common start
+    def positions(self, t):
+        s = self.start + np.minimum(t * self.speed, self.total)
+        i = np.searchsorted(self.cum, s, side="right") - 1
+        i = np.clip(i, self.offsets[:-1], np.maximum(self.offsets[1:] - 2, self.offsets[:-1]))
+        j = np.minimum(i + 1, self.offsets[1:] - 1)
+        seg = self.cum[j] - self.cum[i]
+        frac = np.divide(s - self.cum[i], seg, out=np.zeros_like(s), where=seg > 0)
+        xy = self.xy[i] + (self.xy[j] - self.xy[i]) * frac[:, None]
+        return xy, t * self.speed >= self.total
+
+# Node routes -> node paths flown leg by leg (predecessors) when available
+def expand_paths(routes):
+    expander = load_expander()
+    if expander is None:
+        return routes
+    paths = expander.expand_routes(routes)
+    return [paths.mission(k) for k in range(len(paths))]
+
+def load_paths(routes_path=None, sample=False):
+    if sample or not os.path.exists(routes_path or ROUTES_PATH):
+        return expand_paths([get_sample_path()])
+    from src.route_io import load_routes
+    return expand_paths([r for r in load_routes(routes_path or ROUTES_PATH) if len(r)])
+
+# Cached layer: the map (visualize_map.render_static) plus every route line
+def render_paths(world, view, playback):
+    surface = render_static(world, view)
+    screen_xy = view.to_screen(playback.xy)
+    for k in range(playback.n):
+        line = screen_xy[playback.offsets[k]:playback.offsets[k + 1]]
+        keep = np.r_[True, np.any(np.diff(line, axis=0) != 0, axis=1)]
+        if keep.sum() >= 2:
+            hue = (k * 0.61803) % 1.0
+            color = pygame.Color(0)
+            color.hsva = (hue * 360, 70, 85, 100)
+            pygame.draw.lines(surface, color, False, line[keep].tolist(), 1)
+    return surface
+
+# --- Main Loop ---
+# Space: pause, Up/Down or +/-: speed multiplier, R: restart
+def main(routes_path=None, sample=False, speed_mps=SPEED_MPS, multiplier=SPEED_STEPS[3]):
+    pygame.init()
+    screen = pygame.display.set_mode(WINDOW_SIZE)
     pygame.display.set_caption("Drone Simulation")
     clock = pygame.time.Clock()
+    font = pygame.font.SysFont(None, 20)
 
     world = load_world()
-    path = get_sample_path()
-    points = world["points"]
-
-    # Convert path to lon/lat
-    coords = [points[i] for i in path]
+    playback = FleetPlayback(load_paths(routes_path, sample), world["points"], speed_mps)
+    view = Viewport(world)
+    static = render_paths(world, view, playback)
+    step = int(np.argmin(np.abs(np.array(SPEED_STEPS) - multiplier)))
+    print(f"[sim] {playback.n} drones, longest mission {playback.duration:.0f}s at {speed_mps} m/s")
 
-    lon_min, lon_max = world["lon_min"], world["lon_max"]
-    lat_min, lat_max = world["lat_min"], world["lat_max"]
-
-    # Screen coors for the path
-    screen_path = [
-        lonlat_to_screen(lon, lat, lon_min, lon_max, lat_min, lat_max)
-        for lon, lat in coords
-    ]
-
-    seg_index = 0
     t = 0.0
-
+    paused = False
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-
-        screen.fill((240, 240, 255))
-
-        screen.fill((240, 240, 255))
-
-        # Draw path
-        pygame.draw.lines(screen, (0, 0, 255), False, screen_path, 2)
-
-        # Segments
-        p1 = np.array(screen_path[seg_index])
-        p2 = np.array(screen_path[seg_index + 1])
-
-        drone_pos = interpolate(p1, p2, t)
-
-        # Draw drone
-        pygame.draw.circle(screen, DRONE_COLOR, drone_pos.astype(int), DRONE_RADIUS)
-
-        # Update t
-        t += SPEED
-        if t >= 1.0:
-            t = 0.0
-            seg_index += 1
-            if seg_index >= len(screen_path) - 1:
-                seg_index = 0
-
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key in (pygame.K_UP, pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    step = min(step + 1, len(SPEED_STEPS) - 1)
+                elif event.key in (pygame.K_DOWN, pygame.K_MINUS, pygame.K_KP_MINUS):
+                    step = max(step - 1, 0)
+                elif event.key == pygame.K_r:
+                    t = 0.0
+
+        # Sim time follows wall time, so playback speed does not depend on the frame rate
+        dt = clock.tick(FPS) / 1000.0
+        if not paused:
+            t = min(t + dt * SPEED_STEPS[step], playback.duration)
+
+        screen.blit(static, (0, 0))
+        lonlat, done = playback.positions(t)
+        for (x, y), landed in zip(view.to_screen(lonlat).tolist(), done.tolist()):
+            pygame.draw.circle(screen, DONE_COLOR if landed else DRONE_COLOR, (x, y), DRONE_RADIUS)
+
+        hud = (f"t={t:6.0f}s / {playback.duration:.0f}s  x{SPEED_STEPS[step]}  "
+               f"flying {int((~done).sum())}/{playback.n}  {clock.get_fps():.0f} fps"
+               + ("  [paused]" if paused else ""))
+        screen.blit(font.render(hud, True, (0, 0, 0)), (8, 8))
         pygame.display.flip()
-        clock.tick(60)
 
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Constant-speed playback of every mission in routes_global.npy")
+    parser.add_argument("--routes", default=ROUTES_PATH)
+    parser.add_argument("--sample", action="store_true", help="fly the single sample path instead")
+    parser.add_argument("--speed", type=float, default=SPEED_MPS, help="ground speed (m/s)")
+    parser.add_argument("--multiplier", type=float, default=SPEED_STEPS[3], help="sim seconds per wall second")
+    args = parser.parse_args()
+    main(args.routes, args.sample, args.speed, args.multiplier)
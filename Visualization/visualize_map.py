@@ -1,6 +1,5 @@
 import pygame
 import numpy as np
-from shapely import wkt
 import os
 
 # --- Constants ---
@@ -14,6 +13,11 @@ DEPOT_COLOR = (0, 200, 100)
 POINTS_RADIUS = 2
 SPECIAL_RADIUS = 4
 
+# Pan / zoom
+ZOOM_STEP = 1.25
+MAX_ZOOM = 512.0
+GRID_CELLS = 128        # spatial grid cells per axis
+
 # --- File Paths ---
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "Data")
 PATH_POINTS = f"{DATA_DIR}/points_lat_long.npy"
@@ -30,6 +34,16 @@ def lonlat_to_screen(lon, lat, lon_min, lon_max, lat_min, lat_max):
     y = WINDOW_SIZE[1] - (lat - lat_min) / lat_span * WINDOW_SIZE[1]
     return int(x), int(y)
 
+# Vectorized lonlat_to_screen: (N, 2) lon/lat -> (N, 2) int pixels
+def project(lonlat, lon_min, lon_max, lat_min, lat_max):
+    lonlat = np.asarray(lonlat, dtype=float)
+    lon_span = max(1e-12, lon_max - lon_min)
+    lat_span = max(1e-12, lat_max - lat_min)
+
+    x = (lonlat[:, 0] - lon_min) / lon_span * WINDOW_SIZE[0]
+    y = WINDOW_SIZE[1] - (lonlat[:, 1] - lat_min) / lat_span * WINDOW_SIZE[1]
+    return np.c_[x, y].astype(np.int64)
+
 # We receive [start, end], we clamp to 0 and add 1 if inclusive
 def slice_inclusive(slc, N):
     start, end = int(slc[0]), int(slc[1])
@@ -37,7 +51,7 @@ def slice_inclusive(slc, N):
     if end < N:
         end += 1
 
-    start = max(0, min(start, N)) 
+    start = max(0, min(start, N))
     end = max(0, min(end, N))
 
     if start > end:
@@ -45,25 +59,46 @@ def slice_inclusive(slc, N):
 
     return slice(start, end)
 
-def load_world():
-    # Load the points
-    points = np.load(PATH_POINTS)
-    assert points.ndim == 2 and points.shape[1] == 2, "Points should be Nx2 array"
-    N = points.shape[0]
+# Points, asset and photo indexes and the polygon's exterior ring from Data/
+def load_world_files():
+    from shapely import wkt
 
-    # load assets and photos
+    points = np.load(PATH_POINTS)
     asset_idx = np.load(PATH_ASSETS)
     photo_idx = np.load(PATH_PHOTOS)
-
-    # Convert to python slices
-    asset_sl = slice_inclusive(asset_idx, N)
-    photo_sl = slice_inclusive(photo_idx, N)
-
-    # Load the polygon
     with open(PATH_POLYGON, 'r') as f:
         polygon_wkt = f.read().strip()
     polygon = wkt.loads(polygon_wkt)
     exterior = np.array(polygon.exterior.coords)
+    return points, asset_idx, photo_idx, exterior
+
+# Shared-memory copy of Data (src/shared_data.py), or None. Run as a plain script
+# from Visualization/ the repo's src package is not importable, so just use the files
+def attach_shared():
+    try:
+        from src.shared_data import attach
+    except ImportError:
+        return None
+    return attach(DATA_DIR)
+
+def load_world():
+    # Points, index slices and the polygon ring come from the shared-memory
+    # daemon when it serves Data (src/shared_data.py); otherwise from the files
+    shared = attach_shared()
+    if shared is not None and all(k in shared for k in ("points", "asset_indexes", "photo_indexes", "polygon_exterior")):
+        points = shared.arrays["points"]
+        asset_idx = shared.arrays["asset_indexes"]
+        photo_idx = shared.arrays["photo_indexes"]
+        exterior = shared.arrays["polygon_exterior"]
+    else:
+        points, asset_idx, photo_idx, exterior = load_world_files()
+
+    assert points.ndim == 2 and points.shape[1] == 2, "Points should be Nx2 array"
+    N = points.shape[0]
+
+    # Convert to python slices
+    asset_sl = slice_inclusive(asset_idx, N)
+    photo_sl = slice_inclusive(photo_idx, N)
 
     # Bounds
     lon_min, lat_min = exterior.min(axis=0)
@@ -87,41 +122,146 @@ def load_world():
         "lat_max": lat_max
     }
 
+# --- Viewport ---
+# Visible lon/lat window; starts at the world bounds and changes on pan / zoom
+class Viewport:
+    def __init__(self, world):
+        self.world = world
+        self.reset()
+
+    def reset(self):
+        w = self.world
+        self.bounds = (w["lon_min"], w["lon_max"], w["lat_min"], w["lat_max"])
+
+    @property
+    def zoom(self):
+        w = self.world
+        return (w["lon_max"] - w["lon_min"]) / (self.bounds[1] - self.bounds[0])
+
+    def to_screen(self, lonlat):
+        return project(lonlat, *self.bounds)
+
+    def to_lonlat(self, x, y):
+        lon_min, lon_max, lat_min, lat_max = self.bounds
+        return (lon_min + x / WINDOW_SIZE[0] * (lon_max - lon_min),
+                lat_min + (WINDOW_SIZE[1] - y) / WINDOW_SIZE[1] * (lat_max - lat_min))
+
+    # Shift by a pixel delta (drag direction)
+    def pan(self, dx, dy):
+        lon_min, lon_max, lat_min, lat_max = self.bounds
+        dlon = -dx / WINDOW_SIZE[0] * (lon_max - lon_min)
+        dlat = dy / WINDOW_SIZE[1] * (lat_max - lat_min)
+        self.bounds = (lon_min + dlon, lon_max + dlon, lat_min + dlat, lat_max + dlat)
+
+    # Zoom by factor (> 1 zooms in) keeping the lon/lat under pixel (x, y) fixed
+    def zoom_at(self, factor, x, y):
+        if not 1.0 <= self.zoom * factor <= MAX_ZOOM:
+            factor = min(max(self.zoom * factor, 1.0), MAX_ZOOM) / self.zoom
+        lon, lat = self.to_lonlat(x, y)
+        lon_min, lon_max, lat_min, lat_max = self.bounds
+        self.bounds = (lon - (lon - lon_min) / factor, lon + (lon_max - lon) / factor,
+                       lat - (lat - lat_min) / factor, lat + (lat_max - lat) / factor)
+
+# --- Spatial grid ---
+# Uniform lon/lat grid over the points: indices sorted by cell + per-cell offsets
+class SpatialGrid:
+    def __init__(self, points, bounds, cells=GRID_CELLS):
+        self.lon_min, self.lon_max, self.lat_min, self.lat_max = bounds
+        self.cells = cells
+        cx, cy = self._cell(points[:, 0], points[:, 1])
+        cell = cy * cells + cx
+        self.order = np.argsort(cell, kind="stable")
+        self.offsets = np.searchsorted(cell[self.order], np.arange(cells * cells + 1))
+
+    def _cell(self, lon, lat):
+        fx = (np.asarray(lon) - self.lon_min) / max(1e-12, self.lon_max - self.lon_min)
+        fy = (np.asarray(lat) - self.lat_min) / max(1e-12, self.lat_max - self.lat_min)
+        return (np.clip((fx * self.cells).astype(np.int64), 0, self.cells - 1),
+                np.clip((fy * self.cells).astype(np.int64), 0, self.cells - 1))
+
+    # Indices of points in cells overlapping the lon/lat bounds (a superset of the visible ones)
+    def query(self, bounds):
+        lon_min, lon_max, lat_min, lat_max = bounds
+        (x0, x1), (y0, y1) = self._cell([lon_min, lon_max], [lat_min, lat_max])
+        rows = np.arange(y0, y1 + 1) * self.cells
+        starts = self.offsets[rows + x0]
+        ends = self.offsets[rows + x1 + 1]
+        if not (ends > starts).any():
+            return self.order[:0]
+        return np.concatenate([self.order[s:e] for s, e in zip(starts, ends)])
+
 # --- Drawing functions ---
-def draw_polygon(screen, world):
-    polygon = world["poly_coords"]
-    points = [lonlat_to_screen(lon, lat, 
-                                world["lon_min"], world["lon_max"],
-                                world["lat_min"], world["lat_max"])
-                for lon, lat in polygon]
-    
+# Pixel offsets of a filled disk of the given radius
+def _disk(radius):
+    r = np.arange(-radius, radius + 1)
+    dx, dy = np.meshgrid(r, r)
+    keep = dx ** 2 + dy ** 2 <= radius ** 2 + radius
+    return dx[keep], dy[keep]
+
+# Vectorized dots: marks every point in a pixel mask, grows it into disks with
+# shifted ORs and paints the result in one write (cost independent of point count)
+def stamp(screen, xy, color, radius):
+    if len(xy) == 0:
+        return
+    w, h = screen.get_size()
+    xy = xy[(xy[:, 0] >= -radius) & (xy[:, 0] < w + radius) & (xy[:, 1] >= -radius) & (xy[:, 1] < h + radius)]
+
+    mask = np.zeros((w + 2 * radius, h + 2 * radius), dtype=bool)
+    mask[xy[:, 0] + radius, xy[:, 1] + radius] = True
+    disk = np.zeros((w, h), dtype=bool)
+    for dx, dy in zip(*_disk(radius)):
+        disk |= mask[radius - dx:radius - dx + w, radius - dy:radius - dy + h]
+    pixels = pygame.surfarray.pixels3d(screen)
+    pixels[disk] = color
+    del pixels  # unlock the surface
+
+def _view(world, view):
+    return view if view is not None else Viewport(world)
+
+def _visible(world, view, sl=slice(None)):
+    """Screen coordinates of the points in `sl` that can be on screen."""
+    grid = world.get("grid")
+    if grid is None:
+        return view.to_screen(world["points"][sl])
+    idx = grid.query(view.bounds)
+    if sl != slice(None):
+        idx = idx[(idx >= sl.start) & (idx < sl.stop)]
+    return view.to_screen(world["points"][idx])
+
+def draw_polygon(screen, world, view=None):
+    points = _view(world, view).to_screen(world["poly_coords"])
+
+    # Consecutive vertices on the same pixel add nothing (LOD when zoomed out)
+    keep = np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)]
+    points = points[keep]
+
     # Outline
     if len(points) >= 3:
-        pygame.draw.polygon(screen, POLYGON_COLOR, points, width=1)
-
-def draw_points(screen, world):
-    for lon, lat in world["points"]:
-        x, y = lonlat_to_screen(lon, lat, 
-                                world["lon_min"], world["lon_max"],
-                                world["lat_min"], world["lat_max"])
-        pygame.draw.circle(screen, ALL_POINTS_COLOR, (x, y), 2)
-
-def draw_subsets(screen, world, slice, color, radius):
-    points = world["points"][slice]
-    for lon, lat in points:
-        x, y = lonlat_to_screen(lon, lat, 
-                                world["lon_min"], world["lon_max"],
-                                world["lat_min"], world["lat_max"])
-        pygame.draw.circle(screen, color, (x, y), radius)
-
-def draw_depot(screen, world):
-    lon, lat = world["points"][0]
-    x, y = lonlat_to_screen(lon, lat, 
-                            world["lon_min"], world["lon_max"],
-                            world["lat_min"], world["lat_max"])
-    pygame.draw.circle(screen, DEPOT_COLOR, (x, y), 8)
+        pygame.draw.polygon(screen, POLYGON_COLOR, points.tolist(), width=1)
+
+def draw_points(screen, world, view=None):
+    stamp(screen, _visible(world, _view(world, view)), ALL_POINTS_COLOR, POINTS_RADIUS)
+
+def draw_subsets(screen, world, slice, color, radius, view=None):
+    stamp(screen, _visible(world, _view(world, view), slice), color, radius)
+
+def draw_depot(screen, world, view=None):
+    x, y = _view(world, view).to_screen(world["points"][:1])[0]
+    pygame.draw.circle(screen, DEPOT_COLOR, (int(x), int(y)), 8)
+
+# Static layers for one viewport, rendered once into an off-screen Surface
+def render_static(world, view):
+    surface = pygame.Surface(WINDOW_SIZE)
+    surface.fill(BACKGROUND_COLOR)
+    draw_polygon(surface, world, view)
+    draw_points(surface, world, view)
+    draw_subsets(surface, world, world["asset_sl"], ASSET_COLOR, 5, view)
+    draw_subsets(surface, world, world["photo_sl"], PHOTO_COLOR, 3, view)
+    draw_depot(surface, world, view)
+    return surface
 
 # -- Main Loop ---
+# Wheel / +/-: zoom at cursor, drag or arrows: pan, R: reset
 def main():
     pygame.init()
     screen = pygame.display.set_mode(WINDOW_SIZE)
@@ -130,22 +270,56 @@ def main():
 
     # Load world data
     world = load_world()
+    world["grid"] = SpatialGrid(world["points"], (world["lon_min"], world["lon_max"],
+                                                  world["lat_min"], world["lat_max"]))
+    view = Viewport(world)
+    static = render_static(world, view)
+    drag_from, drag = None, (0, 0)
 
     running = True
     while running:
+        changed = False
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            
-        # Clear screen
-        screen.fill(BACKGROUND_COLOR)
+            elif event.type == pygame.MOUSEWHEEL:
+                mx, my = pygame.mouse.get_pos()
+                view.zoom_at(ZOOM_STEP ** event.y, mx, my)
+                changed = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                drag_from = event.pos
+            elif event.type == pygame.MOUSEMOTION and drag_from is not None:
+                drag = (event.pos[0] - drag_from[0], event.pos[1] - drag_from[1])
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and drag_from is not None:
+                # The cached layer follows the drag; re-render once on release
+                view.pan(*drag)
+                drag_from, drag = None, (0, 0)
+                changed = True
+            elif event.type == pygame.KEYDOWN:
+                cx, cy = WINDOW_SIZE[0] // 2, WINDOW_SIZE[1] // 2
+                step = WINDOW_SIZE[0] // 8
+                if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    view.zoom_at(ZOOM_STEP, cx, cy)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    view.zoom_at(1 / ZOOM_STEP, cx, cy)
+                elif event.key == pygame.K_LEFT:
+                    view.pan(step, 0)
+                elif event.key == pygame.K_RIGHT:
+                    view.pan(-step, 0)
+                elif event.key == pygame.K_UP:
+                    view.pan(0, step)
+                elif event.key == pygame.K_DOWN:
+                    view.pan(0, -step)
+                elif event.key == pygame.K_r:
+                    view.reset()
+                changed = True
+
+        # Only pan / zoom re-render the static layers
+        if changed:
+            static = render_static(world, view)
 
-        # Draw wolrd
-        draw_polygon(screen, world)
-        draw_points(screen, world)
-        draw_subsets(screen, world, world["asset_sl"], ASSET_COLOR, 5)
-        draw_subsets(screen, world, world["photo_sl"], PHOTO_COLOR, 3)
-        draw_depot(screen, world)
+        screen.fill(BACKGROUND_COLOR)
+        screen.blit(static, drag)
 
         # Update display
         pygame.display.flip()
@@ -154,4 +328,4 @@ def main():
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1 @@
+# Performance benchmarks for the planner, data loading and visualization
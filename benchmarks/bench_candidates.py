@@ -0,0 +1,101 @@
+"""
+KDKR benchmarks/bench_candidates.py
+
+Solve time and objective vs. the number of candidate successors per node
+(RouteFinder candidate_k, src/candidates.py) on the same instance and time
+budget. k = 0 is the unpruned model. As in RouteFinder.find_initial_route, a
+pruned k first builds its start on full successor domains (unpruned_start) and
+searches the pruned model from it for the rest of the budget; start_s is that
+first phase. With --warm every k starts from the unpruned model's first
+solution instead, as a RouteFinder re-run with existing routes would.
+
+Usage (from the repo root):
+  python -m benchmarks.bench_candidates --ks 0,5,10,20,40 --seconds 60 --drones 40
+  python -m benchmarks.bench_candidates --ks 0,5,10,20 --reduce-assets
+  python -m benchmarks.bench_candidates --ks 0,10,20,40 --warm
+"""
+
+import argparse
+import time
+
+from src.config import DATA_DIR, MAX_BATTERY_CAP, VEHICLE_FIXED_COST
+from src.find_initial_route import RouteFinder, extract_routes, read_routes_assignment
+from src.route_metrics import evaluate, index_slice
+
+
+def run_k(finder: RouteFinder, k: int, seconds: float) -> dict:
+    finder.candidate_k = k or None
+    t_start = time.perf_counter()
+    warm = bool(finder.routes)
+    start_s = 0.0
+    if finder.candidate_k:
+        routes, _, _, _ = finder.unpruned_start(seconds)
+        start_s = time.perf_counter() - t_start
+        if routes is None:
+            return {"k": k, "warm": warm, "start_s": start_s, "wall_s": start_s, "objective": None}
+        finder.routes = routes
+
+    t0 = time.perf_counter()
+    manager, routing = finder.build_model()
+    build_s = time.perf_counter() - t0
+
+    params = finder.search_parameters()
+    params.time_limit.FromMilliseconds(int(max(seconds - (time.perf_counter() - t_start), 0) * 1000))
+    params.log_search = False
+    first = []
+    routing.AddAtSolutionCallback(lambda: first or first.append(time.perf_counter()))
+    t0 = time.perf_counter()
+    initial = None
+    if finder.routes:
+        initial = read_routes_assignment(routing, manager, finder.to_model_routes(finder.routes))
+    if initial is not None:
+        solution = routing.SolveFromAssignmentWithParameters(initial, params)
+    else:
+        solution = routing.SolveWithParameters(params)
+    solve_s = time.perf_counter() - t0
+
+    out = {"k": k, "warm": warm, "start_s": start_s, "build_s": build_s,
+           "first_s": first[0] - t0 if first else None, "wall_s": time.perf_counter() - t_start,
+           "branches_per_s": routing.solver().Branches() / max(solve_s, 1e-9), "objective": None}
+    if solution:
+        routes = finder.from_model_routes(extract_routes(routing, manager, solution, drop_empty=True))
+        photo_ids = index_slice(finder.photo_indexes, len(finder.distance_matrix))
+        s = evaluate(finder.distance_matrix, routes, MAX_BATTERY_CAP, photo_ids)["summary"]
+        out.update(objective=solution.ObjectiveValue(), drones=s["drones"], total_ft=s["total_ft"])
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--ks", default="0,5,10,20,40", help="comma-separated; 0 = all arcs")
+    parser.add_argument("--drones", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--reduce-assets", action="store_true", help="on the super-node model (src/supernodes.py)")
+    parser.add_argument("--warm", action="store_true", help="start every k from the unpruned first solution")
+    args = parser.parse_args()
+
+    finder = RouteFinder(args.seconds, args.drones, data_dir=args.data_dir, battery_cap=MAX_BATTERY_CAP,
+                         vehicle_fixed_cost=VEHICLE_FIXED_COST, reduce_assets=args.reduce_assets)
+    print(f"[bench] N={len(finder.transit_matrix())} drones={args.drones} limit={args.seconds}s")
+    seed = []
+    if args.warm:
+        manager, routing = finder.build_model()
+        params = finder.search_parameters()
+        params.log_search = False
+        params.solution_limit = 1
+        solution = routing.SolveWithParameters(params)
+        seed = finder.from_model_routes(extract_routes(routing, manager, solution, drop_empty=True))
+        print(f"[bench] warm start: objective={solution.ObjectiveValue()} drones={len(seed)}")
+    for k in (int(k) for k in args.ks.split(",")):
+        finder.routes = list(seed)
+        r = run_k(finder, k, args.seconds)
+        if r["objective"] is None:
+            print(f"[bench] k={k or 'all':>4}: no solution in {r['wall_s']:.1f}s")
+            continue
+        print(f"[bench] k={k or 'all':>4}: warm={r['warm']} start={r['start_s']:.2f}s build={r['build_s']:.2f}s "
+              f"first={r['first_s'] or 0:.2f}s wall={r['wall_s']:.1f}s branches/s={r['branches_per_s']:,.0f} objective={r['objective']} "
+              f"drones={r['drones']} total={r['total_ft']:.0f} ft")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+KDKR benchmarks/bench_decomposition.py
+
+Decomposed solve vs. single-model solve at equal wall-clock time.
+
+The decomposition runs first with --seconds of budget; the monolithic
+RouteFinder model then gets the same measured wall time. The report shows
+both distances / drone counts and, from the monolithic solver's improvement
+trace, how long it needed to match the decomposed distance (if ever).
+
+Usage (from the repo root):
+  python -m benchmarks.bench_decomposition --seconds 60 --sectors 8
+"""
+
+import argparse
+import math
+import time
+
+from src.config import DATA_DIR, MAX_BATTERY_CAP, VEHICLE_FIXED_COST
+from src.decomposition import METHODS, decompose_and_solve, print_report, route_lengths
+from src.find_initial_route import RouteFinder, extract_routes
+
+
+def solve_monolithic(data_dir, seconds: float, drones: int, battery_cap: float) -> dict:
+    finder = RouteFinder(math.ceil(seconds), drones, data_dir=data_dir,
+                         battery_cap=battery_cap, vehicle_fixed_cost=VEHICLE_FIXED_COST)
+    t0 = time.perf_counter()
+    manager, routing = finder.build_model()
+    params = finder.search_parameters()
+    params.log_search = False
+    params.time_limit.FromMilliseconds(int(max(0.1, seconds - (time.perf_counter() - t0)) * 1000))
+
+    # (elapsed, distance) for every improving solution, fixed costs excluded
+    trace = []
+    def on_solution():
+        used = sum(1 for v in range(routing.vehicles())
+                   if not routing.IsEnd(routing.NextVar(routing.Start(v)).Value()))
+        trace.append((time.perf_counter() - t0, routing.CostVar().Max() - used * VEHICLE_FIXED_COST))
+    routing.AddAtSolutionCallback(on_solution)
+
+    solution = routing.SolveWithParameters(params)
+    wall = time.perf_counter() - t0
+    if not solution:
+        return {"wall_s": wall, "total_distance": math.inf, "drones": 0, "trace": trace}
+    routes = extract_routes(routing, manager, solution, drop_empty=True)
+    return {"wall_s": wall, "total_distance": float(route_lengths(finder.distance_matrix, routes).sum()),
+            "drones": len(routes), "trace": trace}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--sectors", type=int, default=8)
+    parser.add_argument("--method", choices=METHODS, default="sweep")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--battery-cap", type=float, default=MAX_BATTERY_CAP)
+    args = parser.parse_args()
+
+    routes, report = decompose_and_solve(args.data_dir, args.sectors, args.method, args.seconds,
+                                         args.battery_cap, workers=args.workers)
+    print_report(report)
+
+    mono = solve_monolithic(args.data_dir, report["wall_s"], 2 * report["drones"], args.battery_cap)
+    print(f"[bench] monolithic: wall={mono['wall_s']:.2f}s distance={mono['total_distance']:.0f} ft "
+          f"drones={mono['drones']} improvements={len(mono['trace'])}")
+
+    target = report["total_distance"]
+    reached = next((t for t, d in mono["trace"] if d <= target), None)
+    ratio = mono["total_distance"] / target if target else math.nan
+    print(f"[bench] equal wall time: monolithic/decomposed distance = {ratio:.3f}")
+    if reached is None:
+        print(f"[bench] monolithic never matched {target:.0f} ft within {mono['wall_s']:.1f}s "
+              f"(speedup > {mono['wall_s'] / report['wall_s']:.2f}x)")
+    else:
+        print(f"[bench] monolithic matched after {reached:.1f}s -> speedup {reached / report['wall_s']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
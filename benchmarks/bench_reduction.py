@@ -0,0 +1,74 @@
+"""
+KDKR benchmarks/bench_reduction.py
+
+Compares the asset-cluster reduction (src/supernodes.py) against a model with
+one node per photo waypoint on the same instance and the same time budget.
+Both plans cover every photo; lengths are measured on the expanded routes.
+
+Usage (from the repo root):
+  python -m benchmarks.bench_reduction --seconds 60 --drones 40
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.config import DATA_DIR, DEPOT_INDEX, MAX_BATTERY_CAP, VEHICLE_FIXED_COST
+from src.find_initial_route import (RouteFinder, build_matrix_model, extract_routes,
+                                    make_search_parameters, quantize_costs)
+from src.route_metrics import evaluate, index_slice
+
+
+def solve(costs, drones: int, seconds: float, battery_cap: float):
+    t0 = time.perf_counter()
+    manager, routing = build_matrix_model(costs, drones, battery_cap, VEHICLE_FIXED_COST)
+    build_s = time.perf_counter() - t0
+    first = []
+    routing.AddAtSolutionCallback(lambda: first or first.append(time.perf_counter()))
+    t0 = time.perf_counter()
+    solution = routing.SolveWithParameters(make_search_parameters(seconds))
+    if not solution:
+        return None, build_s, None
+    return extract_routes(routing, manager, solution, drop_empty=True), build_s, first[0] - t0
+
+def report(name: str, finder: RouteFinder, routes, nodes: int, build_s: float, first_s, photo_ids) -> None:
+    if routes is None:
+        print(f"[bench] {name:>9}: nodes={nodes} no solution")
+        return
+    s = evaluate(finder.distance_matrix, routes, MAX_BATTERY_CAP, photo_ids)["summary"]
+    print(f"[bench] {name:>9}: nodes={nodes} build={build_s:.2f}s first={first_s:.2f}s "
+          f"drones={s['drones']} total={s['total_ft']:.0f} ft max={s['max_ft']:.0f} ft "
+          f"photos={s['photos_covered']:.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--drones", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=60)
+    args = parser.parse_args()
+
+    finder = RouteFinder(args.seconds, args.drones, data_dir=args.data_dir,
+                         battery_cap=MAX_BATTERY_CAP, reduce_assets=True)
+    n = len(finder.distance_matrix)
+    photo_ids = index_slice(finder.photo_indexes, n)
+
+    # One node per photo (depot first)
+    sub = np.r_[DEPOT_INDEX, photo_ids[photo_ids != DEPOT_INDEX]]
+    routes, build_s, first_s = solve(quantize_costs(np.asarray(finder.distance_matrix[np.ix_(sub, sub)])),
+                                     args.drones, args.seconds, MAX_BATTERY_CAP)
+    routes = None if routes is None else [sub[np.asarray(r)].tolist() for r in routes]
+    report("photos", finder, routes, len(sub), build_s, first_s, photo_ids)
+
+    # Super-nodes
+    t0 = time.perf_counter()
+    costs = finder.cost_matrix()
+    reduce_s = time.perf_counter() - t0
+    routes, build_s, first_s = solve(costs, args.drones, args.seconds, MAX_BATTERY_CAP)
+    routes = None if routes is None else finder.from_model_routes(routes)
+    print(f"[bench] reduction: {len(photo_ids)} photos -> {len(costs)} super-nodes in {reduce_s:.2f}s")
+    report("supernode", finder, routes, len(costs), build_s, first_s, photo_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+KDKR benchmarks/bench_transit.py
+
+Compares OR-Tools search throughput between the Python `distance_callback`
+transit and the native `RegisterTransitMatrix` transit on the same instance
+and the same time budget.
+
+Usage (from the repo root):
+  python -m benchmarks.bench_transit --nodes 800 --seconds 10 --drones 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.config import DATA_DIR, MAX_BATTERY_CAP
+from src.find_initial_route import RouteFinder, TRANSIT_MODES
+
+
+def run_mode(finder: RouteFinder, mode: str, seconds: int) -> dict:
+    finder.transit_mode = mode
+    t0 = time.perf_counter()
+    manager, routing = finder.build_model()
+    build_s = time.perf_counter() - t0
+
+    params = finder.search_parameters()
+    params.time_limit.seconds = seconds
+    params.log_search = False
+
+    solutions = []
+    routing.AddAtSolutionCallback(lambda: solutions.append(routing.CostVar().Max()))
+
+    t0 = time.perf_counter()
+    solution = routing.SolveWithParameters(params)
+    solve_s = time.perf_counter() - t0
+    solver = routing.solver()
+    return {
+        "mode": mode,
+        "build_s": build_s,
+        "solve_s": solve_s,
+        "objective": solution.ObjectiveValue() if solution else None,
+        "solutions": len(solutions),
+        "branches_per_s": solver.Branches() / solve_s,
+        "failures_per_s": solver.Failures() / solve_s,
+        "solutions_per_s": len(solutions) / solve_s,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--nodes", type=int, default=800, help="first N nodes of the matrix (0 = all)")
+    parser.add_argument("--drones", type=int, default=4)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--no-battery", action="store_true")
+    args = parser.parse_args()
+
+    finder = RouteFinder(args.seconds, args.drones, data_dir=args.data_dir,
+                         battery_cap=None if args.no_battery else MAX_BATTERY_CAP)
+    if args.nodes:
+        idx = np.arange(min(args.nodes, len(finder.distance_matrix)))
+        finder.distance_matrix = np.asarray(finder.distance_matrix[np.ix_(idx, idx)])
+    print(f"[bench] N={len(finder.distance_matrix)} drones={args.drones} limit={args.seconds}s")
+
+    results = [run_mode(finder, mode, args.seconds) for mode in TRANSIT_MODES]
+    for r in results:
+        print(f"[bench] {r['mode']:>8}: build={r['build_s']:.2f}s objective={r['objective']} "
+              f"branches/s={r['branches_per_s']:,.0f} failures/s={r['failures_per_s']:,.0f} "
+              f"solutions/s={r['solutions_per_s']:.2f}")
+    native, callback = results
+    if callback["branches_per_s"]:
+        print(f"[bench] native speedup: {native['branches_per_s'] / callback['branches_per_s']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+KDKR benchmarks/suite.py
+
+Timed benchmark suite over synthetic instances (benchmarks/synthetic.py):
+  generate     instance + matrix generation
+  matrix_load  open_matrices and a random 100k-entry gather
+  solve        RouteFinder model build, time to first solution, objective,
+               drones and total length (src/route_metrics.py) per time limit
+  mission_view frontend/sim/data_model.build_mission_view, cold and warm
+  mission_plot Visualization/plot_mission.plot_single_mission to PNG (Agg),
+               then the batch renderer cold and with every mission unchanged
+  map_render   one full frame of Visualization/visualize_map on a dummy display
+  polish       src/polish.py on the challenge's own route (Data/routes.npy,
+               one 2780-node mission) when its matrices have been built;
+               slower than POLISH_BUDGET_S fails the run even without a baseline
+
+Results are written as JSON ({"meta": ..., "results": {"<case>@<n>": {...}}}).
+With --baseline, every metric ending in "_s" (seconds) or "_ft" (solution
+length) is compared against the stored run; a metric more than --tolerance
+worse is a regression and the exit code is 1. Cases whose optional
+dependency (ortools, matplotlib, pygame) is missing are recorded as skipped;
+a case that raises is recorded as an error and also exits with 1.
+
+Usage (from the repo root):
+  python -m benchmarks.suite --sizes 500,2000 --out bench.json
+  python -m benchmarks.suite --sizes 500,2000 --baseline bench.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import generate_instance
+from src.config import DATA_DIR, MAX_BATTERY_CAP, ROOT_DIR
+from src.matrix_store import open_matrices
+
+GATHER_SAMPLES = 100_000
+WARM_REPEATS = 20
+MIN_ABS_REGRESSION_S = 0.005
+POLISH_BUDGET_S = 5.0                # the challenge route polishes in about 1 s
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+# --- Cases -------------------------------------------------------------
+def bench_matrix_load(data_dir: Path) -> Dict:
+    (distances, _), open_s = _timed(open_matrices, data_dir)
+    n = len(distances)
+    rng = np.random.default_rng(0)
+    i, j = rng.integers(0, n, GATHER_SAMPLES), rng.integers(0, n, GATHER_SAMPLES)
+    _, gather_s = _timed(lambda: np.asarray(distances[i, j], dtype=float).sum())
+    return {"open_s": open_s, "gather_100k_s": gather_s}
+
+def bench_solve(data_dir: Path, time_limit: float, keep: List) -> Dict:
+    """Appends the solved routes to `keep` for the view/plot cases."""
+    from src.decomposition import estimate_drones
+    from src.find_initial_route import RouteFinder, make_search_parameters
+    from src.route_metrics import evaluate, index_slice
+
+    finder = RouteFinder(time_limit, 1, data_dir=data_dir, battery_cap=MAX_BATTERY_CAP)
+    finder.num_drones = estimate_drones(np.asarray(finder.distance_matrix), MAX_BATTERY_CAP)
+    (manager, routing), build_s = _timed(finder.build_model)
+
+    t0 = time.perf_counter()
+    first = []
+    routing.AddAtSolutionCallback(lambda: first or first.append(time.perf_counter() - t0))
+    solution, solve_s = _timed(routing.SolveWithParameters, make_search_parameters(time_limit))
+    if not solution:
+        return {"build_s": build_s, "solve_s": solve_s, "solved": False}
+
+    finder.getRouteList(routing, manager, solution)
+    keep.append([r for r in finder.routes if len(r) > 2])
+    photo_ids = index_slice(finder.photo_indexes, len(finder.distance_matrix))
+    s = evaluate(finder.distance_matrix, finder.routes, MAX_BATTERY_CAP, photo_ids)["summary"]
+    return {"build_s": build_s, "first_solution_s": first[0] if first else None, "solve_s": solve_s,
+            "solved": True, "objective": solution.ObjectiveValue(), "drones": s["drones"],
+            "total_ft": s["total_ft"], "photos_missed": s["photos_missed"]}
+
+def _load_data_model(data_dir: Path, routes_path: Path):
+    """
+    frontend/sim/data_model.py as a fresh module pointed at `data_dir`: points,
+    photo indexes, routes and the predecessors used for path expansion, so
+    whatever sits in the repo's own Data folder never leaks into the case.
+    """
+    from src.matrix_store import PREDECESSORS_FILE
+
+    spec = importlib.util.spec_from_file_location("kdkr_bench_data_model",
+                                                  ROOT_DIR / "frontend" / "sim" / "data_model.py")
+    dm = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dm)
+    dm.DATA_DIR = data_dir
+    dm.POINTS_FILE = data_dir / "points_lat_long.npy"
+    dm.PHOTO_IDX_FILE = data_dir / "photo_indexes.npy"
+    dm.ROUTES_GLOBAL_FILE = routes_path
+    dm.PRED_FILES = (data_dir / PREDECESSORS_FILE, data_dir / "predecessors.npy")
+    return dm
+
+def bench_mission_view(data_dir: Path, routes_path: Path) -> Dict:
+    dm = _load_data_model(data_dir, routes_path)
+    _, cold_s = _timed(dm.build_mission_view, 1)
+    _, warm = _timed(lambda: [dm.build_mission_view(1) for _ in range(WARM_REPEATS)])
+    _, payload_s = _timed(dm.mission_view_payload, 1, "json")
+    # The paths must expand through this instance's predecessors, not the repo's Data folder
+    expander = dm._expander()
+    n = len(dm._snapshot().points)
+    if expander is None or len(expander.predecessors) != n:
+        raise RuntimeError(f"mission view expanded through {'no' if expander is None else 'the wrong'} "
+                           f"predecessors for a {n}-node instance")
+    return {"cold_s": cold_s, "warm_s": warm / WARM_REPEATS, "json_payload_s": payload_s}
+
+def bench_mission_plot(data_dir: Path, routes: List[np.ndarray], out_dir: Path) -> Dict:
+    import matplotlib
+    matplotlib.use("Agg")
+    sys.path.insert(0, str(ROOT_DIR / "Visualization"))
+    from plot_mission import plot_single_mission, render_missions
+
+    points = np.load(data_dir / "points_lat_long.npy")
+    _, total = _timed(lambda: [plot_single_mission(points, r, 0, save_path=str(out_dir / f"mission_{k}.png"),
+                                                   show=False) for k, r in enumerate(routes)])
+    _, batch = _timed(render_missions, points, routes, out_dir / "plots", force=True)
+    _, unchanged = _timed(render_missions, points, routes, out_dir / "plots")
+    return {"missions": len(routes), "total_s": total, "per_mission_s": total / max(len(routes), 1),
+            "batch_s": batch, "batch_unchanged_s": unchanged}
+
+def bench_map_render(data_dir: Path) -> Dict:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from Visualization import visualize_map as vm
+
+    vm.PATH_POINTS = str(data_dir / "points_lat_long.npy")
+    vm.PATH_ASSETS = str(data_dir / "asset_indexes.npy")
+    vm.PATH_PHOTOS = str(data_dir / "photo_indexes.npy")
+    vm.PATH_POLYGON = str(data_dir / "polygon_lon_lat.wkt")
+    world, load_s = _timed(vm.load_world)
+
+    pygame.init()
+    screen = pygame.Surface(vm.WINDOW_SIZE)
+
+    def frame():
+        screen.fill(vm.BACKGROUND_COLOR)
+        vm.draw_polygon(screen, world)
+        vm.draw_points(screen, world)
+        vm.draw_subsets(screen, world, world["asset_sl"], vm.ASSET_COLOR, 5)
+        vm.draw_subsets(screen, world, world["photo_sl"], vm.PHOTO_COLOR, 3)
+        vm.draw_depot(screen, world)
+
+    _, frame_s = _timed(frame)
+    pygame.quit()
+    return {"load_s": load_s, "frame_s": frame_s}
+
+def bench_polish(data_dir: Path, routes_path: Path) -> Dict:
+    from src.polish import polish_routes
+    from src.route_io import load_routes
+
+    try:
+        distances, _ = open_matrices(data_dir)
+    except FileNotFoundError:
+        return {"skipped": f"no matrices in {data_dir} (python -m src.build_matrices)"}
+    routes = load_routes(routes_path)
+    (_, report), polish_s = _timed(polish_routes, distances, routes)
+    return {"routes": len(routes), "nodes": int(sum(len(r) for r in routes)), "polish_s": polish_s,
+            "before_ft": report["distance_before"], "after_ft": report["distance_after"],
+            "over_budget": polish_s > POLISH_BUDGET_S}
+
+
+# --- Driver ------------------------------------------------------------
+def _guard(results: Dict, key: str, fn, *args) -> None:
+    """
+    Runs one case; a missing optional dependency marks it skipped, any other
+    error is recorded (and fails the run) without stopping the other cases.
+    """
+    try:
+        results[key] = fn(*args)
+    except ImportError as e:
+        results[key] = {"skipped": f"missing dependency: {e.name or e}"}
+    except Exception as e:
+        results[key] = {"error": f"{type(e).__name__}: {e}"}
+    print(f"[suite] {key}: {results[key]}")
+
+def run_suite(sizes: List[int], time_limits: List[float], work_dir: Path, seed: int = 0,
+              solve_max_n: int = 5000, challenge_dir: Path = DATA_DIR) -> Dict:
+    results: Dict[str, Dict] = {}
+    _guard(results, "polish@challenge", bench_polish, challenge_dir, challenge_dir / "routes.npy")
+    for n in sizes:
+        data_dir = work_dir / f"n{n}"
+        info, gen_s = _timed(generate_instance, data_dir, n, seed)
+        results[f"generate@{n}"] = {"total_s": gen_s, "matrix": info["matrix"]}
+        print(f"[suite] generate@{n}: {results[f'generate@{n}']}")
+        _guard(results, f"matrix_load@{n}", bench_matrix_load, data_dir)
+
+        solved: List = []
+        if n <= solve_max_n:
+            for limit in time_limits:
+                _guard(results, f"solve_{limit:g}s@{n}", bench_solve, data_dir, limit, solved)
+
+        # View and plot cases use the last solve's routes
+        if solved and solved[-1]:
+            from src.route_io import save_routes
+            routes = solved[-1]
+            save_routes(data_dir / "routes_global.npy", routes)
+            _guard(results, f"mission_view@{n}", bench_mission_view, data_dir, data_dir / "routes_global.npy")
+            _guard(results, f"mission_plot@{n}", bench_mission_plot, data_dir, routes, data_dir)
+        _guard(results, f"map_render@{n}", bench_map_render, data_dir)
+    return results
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Lines describing metrics that got worse than baseline by more than `tolerance`."""
+    regressions = []
+    for key, metrics in current.items():
+        base = baseline.get(key, {})
+        for name, value in metrics.items():
+            old = base.get(name)
+            if not (name.endswith("_s") or name.endswith("_ft")):
+                continue
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            if name.endswith("_s") and value - old < MIN_ABS_REGRESSION_S:
+                continue
+            if value > old * (1 + tolerance):
+                regressions.append(f"{key} {name}: {old:.4g} -> {value:.4g} ({value / old - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="500,2000", help="comma-separated node counts")
+    parser.add_argument("--time-limits", default="2,10", help="comma-separated solve limits (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--solve-max-n", type=int, default=5000, help="skip OR-Tools solves above this size")
+    parser.add_argument("--work-dir", default=None, help="where instances go (default: a temp dir)")
+    parser.add_argument("--challenge-dir", default=str(DATA_DIR), help="Data folder for the polish case")
+    parser.add_argument("--out", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=None, help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    limits = [float(x) for x in args.time_limits.split(",") if x]
+    with tempfile.TemporaryDirectory(prefix="kdkr_bench_") as tmp:
+        work_dir = Path(args.work_dir or tmp)
+        results = run_suite(sizes, limits, work_dir, args.seed, args.solve_max_n, Path(args.challenge_dir))
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sizes": sizes,
+            "time_limits": limits,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[suite] wrote {args.out}")
+
+    errors = [key for key, metrics in results.items() if "error" in metrics]
+    for key in errors:
+        print(f"[suite] ERROR {key}: {results[key]['error']}")
+    failed = bool(errors)
+    polish = results.get("polish@challenge", {})
+    if polish.get("over_budget"):
+        print(f"[suite] OVER BUDGET polish@challenge: {polish['polish_s']:.2f}s > {POLISH_BUDGET_S:g}s")
+        failed = True
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"[suite] REGRESSION {line}")
+        print(f"[suite] {len(regressions)} regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
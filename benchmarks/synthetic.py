@@ -0,0 +1,146 @@
+"""
+KDKR benchmarks/synthetic.py
+
+Generates synthetic instances shaped like the challenge data, in the Data/
+layout RouteFinder.load_assets expects:
+  - a random star-shaped polygon around the real site, scaled so the node
+    density matches ours (~3,750 sq ft of polygon per node),
+  - depot at index 0, then 4 photo points per pole (PHOTO_OFFSET_FT around
+    the pole, random rotation), then general waypoints, then the poles,
+  - photo / waypoint / asset index files as inclusive [first, last] slices,
+  - a matching distance matrix:
+      geodesic   src/build_matrices.py (visibility graph + Dijkstra, also
+                 writes predecessors.npy),
+      euclidean  straight-line feet, written in row chunks to a memmap,
+      none       no matrix.
+    "auto" uses geodesic up to GEODESIC_MAX_N nodes, euclidean above.
+
+A dense N x N float64 matrix is 8 N^2 bytes (50k nodes: 20 GB); use
+--dtype float32 or --store (compact .kdm) for the largest sizes.
+
+Usage (from the repo root):
+  python -m benchmarks.synthetic --n 2000 --out /tmp/kdkr_2000 --seed 0
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import shapely
+from shapely import affinity
+
+from src.build_matrices import make_projection, project, projection_at, unproject
+
+SITE_LON_LAT = (-80.1150898, 26.7877536)
+SQFT_PER_NODE = 3750.0
+PHOTO_OFFSET_FT = 21.25
+WAYPOINT_FRACTION = 0.18
+POLYGON_VERTICES = 64
+GEODESIC_MAX_N = 5000
+CHUNK_ROWS = 1024
+
+
+def split_counts(n: int):
+    """(poles, general waypoints) so that 1 + 5 * poles + waypoints == n."""
+    if n < 6:
+        raise ValueError("need at least 6 nodes (depot + one pole with 4 photo points)")
+    poles = max(1, int(round((n - 1) * (1 - WAYPOINT_FRACTION) / 5)))
+    return poles, n - 1 - 5 * poles
+
+def random_polygon(rng: np.random.Generator, area_sqft: float) -> shapely.Polygon:
+    """Star-shaped polygon (in local feet, centred on 0, 0) with the given area."""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, POLYGON_VERTICES))
+    radii = rng.uniform(0.55, 1.0, POLYGON_VERTICES)
+    ring = np.c_[radii * np.cos(angles), radii * np.sin(angles)]
+    poly = shapely.Polygon(ring)
+    return affinity.scale(poly, *(2 * [np.sqrt(area_sqft / poly.area)]), origin=(0, 0))
+
+def sample_inside(rng: np.random.Generator, polygon, count: int) -> np.ndarray:
+    """`count` uniform points inside `polygon` by rejection sampling in its bounds."""
+    minx, miny, maxx, maxy = polygon.bounds
+    shapely.prepare(polygon)
+    out = np.zeros((0, 2))
+    while len(out) < count:
+        cand = rng.uniform((minx, miny), (maxx, maxy), size=(2 * (count - len(out)) + 16, 2))
+        out = np.r_[out, cand[shapely.contains_xy(polygon, cand[:, 0], cand[:, 1])]]
+    return out[:count]
+
+def euclidean_matrix(xy: np.ndarray, path: Path, dtype=np.float64) -> None:
+    n = len(xy)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n, n))
+    for start in range(0, n, CHUNK_ROWS):
+        block = xy[start:start + CHUNK_ROWS]
+        out[start:start + len(block)] = np.hypot(block[:, None, 0] - xy[None, :, 0],
+                                                 block[:, None, 1] - xy[None, :, 1])
+    out.flush()
+    del out
+
+
+def generate_instance(out_dir, n: int, seed: int = 0, matrix: str = "auto",
+                      dtype: str = "float64", workers=None) -> dict:
+    """Writes one instance of `n` nodes into `out_dir`; returns a small description."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+
+    poles, n_way = split_counts(n)
+    polygon = random_polygon(rng, n * SQFT_PER_NODE)
+
+    # Poles keep their photo points inside: sample them from the inward buffer
+    pole_xy = sample_inside(rng, polygon.buffer(-1.5 * PHOTO_OFFSET_FT), poles)
+    turn = rng.uniform(0, np.pi / 2, poles)[:, None] + np.arange(4)[None, :] * np.pi / 2
+    photo_xy = (pole_xy[:, None, :] + PHOTO_OFFSET_FT * np.stack([np.cos(turn), np.sin(turn)], axis=2)).reshape(-1, 2)
+    depot_xy = sample_inside(rng, polygon.buffer(-PHOTO_OFFSET_FT), 1)
+    way_xy = sample_inside(rng, polygon, n_way)
+    xy = np.r_[depot_xy, photo_xy, way_xy, pole_xy]
+
+    # Local feet -> lon/lat around the real site, using the builder's projection
+    proj = projection_at(*SITE_LON_LAT)
+    polygon_ll = shapely.transform(polygon, lambda c: unproject(c, proj))
+    points = unproject(xy, proj)
+
+    first_way = 1 + 4 * poles
+    first_pole = first_way + n_way
+    np.save(out_dir / "points_lat_long.npy", points)
+    np.save(out_dir / "photo_indexes.npy", np.array([0, first_way - 1]))
+    np.save(out_dir / "waypoint_indexes.npy", np.array([first_way, first_pole - 1]))
+    np.save(out_dir / "asset_indexes.npy", np.array([first_pole, n - 1]))
+    with open(out_dir / "polygon_lon_lat.wkt", "w") as f:
+        f.write(polygon_ll.wkt)
+
+    if matrix == "auto":
+        matrix = "geodesic" if n <= GEODESIC_MAX_N else "euclidean"
+    if matrix == "geodesic":
+        from src.build_matrices import build
+        build(out_dir, workers=workers)
+    elif matrix == "euclidean":
+        # Same projection the builder uses, so both modes agree on straight legs
+        euclidean_matrix(project(points, make_projection(polygon_ll)), out_dir / "distance_matrix.npy",
+                         np.dtype(dtype))
+    elif matrix != "none":
+        raise ValueError(f"unknown matrix mode {matrix!r}")
+
+    return {"n": n, "poles": poles, "photos": 4 * poles, "waypoints": n_way, "seed": seed,
+            "matrix": matrix, "area_sqft": polygon.area, "generate_s": time.perf_counter() - t0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic KDKR instance")
+    parser.add_argument("--n", type=int, required=True, help="total nodes (500 - 50k)")
+    parser.add_argument("--out", required=True, help="output data directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--matrix", choices=("auto", "geodesic", "euclidean", "none"), default="auto")
+    parser.add_argument("--dtype", choices=("float64", "float32"), default="float64",
+                        help="euclidean matrix dtype")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--store", action="store_true", help="also convert to the compact .kdm store")
+    args = parser.parse_args()
+
+    info = generate_instance(args.out, args.n, args.seed, args.matrix, args.dtype, args.workers)
+    print(f"[synthetic] {info['n']} nodes: {info['poles']} poles, {info['photos']} photo points, "
+          f"{info['waypoints']} waypoints, {info['matrix']} matrix ({info['generate_s']:.1f}s) -> {args.out}")
+    if args.store:
+        from src.matrix_store import convert_data_dir
+        convert_data_dir(args.out)
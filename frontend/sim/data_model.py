@@ -5,21 +5,62 @@ Loads mission/waypoint data from the project’s Data and Optimized Paths folder
 and exposes:
   - build_all_waypoints(default_alt=50.0)
   - build_mission_view(mission_id: int, default_alt=50.0)
+  - mission_view_payload(mission_id: int, fmt="json", default_alt=50.0)
+  - tile_payload(z: int, x: int, y: int)
+  - fleet_paths(default_alt=50.0)
+  - publish_routes(routes, tag="")
+
+The input files are loaded once into a process-wide snapshot that is rebuilt
+only when one of them (predecessors included) changes (mtime/size) or new
+routes are published (e.g. by a finished optimization job). The shared
+all_waypoints payload is serialized once per snapshot; per-mission payloads
+are built on first request and then served from memory with a stable ETag.
+fmt="bin" returns the same view as packed little-endian typed arrays (see
+_pack_binary) for large fleets.
+Points, photo indexes and the polygon come from the shared-memory daemon
+(src/shared_data.py) when it serves their Data folder.
+
+tile_payload serves the level-of-detail pyramid (src/lod.py) one z/x/y tile at a
+time: photo waypoints (raw or aggregated), the simplified polygon boundary and the
+route pieces that fall inside the tile. The pyramid is built once per snapshot.
+
+Every payload (mission view, waypoints, tiles) gives coordinates as true
+lat/lon, the order Leaflet and src/fleet_sim.py use.
+
+Mission paths are expanded leg by leg through predecessors.npy (src/path_expansion.py)
+so the drawn/flown path follows the geofence; without predecessors it falls back to
+straight chords between route nodes.
 
 Expected files (searched in multiple locations):
   Data/
-    - points_lat_long.npy     # shape (N, 2+): [lat, lon, ...]
-    - photo_indexes.npy       # bool mask of length N OR integer indices
+    - points_lat_long.npy     # shape (N, 2+): [lon, lat, ...] despite the name
+    - photo_indexes.npy       # bool mask, inclusive [first, last] pair OR indices
+    - polygon_lon_lat.wkt     # flight area, only needed for tiles (either Data folder)
   Optimized Paths/ OR Optimized_Paths/
+    - routes_global.kdr       # compact route set (src/route_io.py), used when present
     - routes_global.npy       # array/list of missions, each is a sequence of point indices
 """
 
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+import hashlib
+import json
+import struct
+import sys
+import threading
 import numpy as np
 
 # --- Path resolution ---------------------------------------------------
 BASE_DIR = Path(__file__).parent  # .../frontend/sim
+ROOT_DIR = BASE_DIR.parent.parent  # project root, for the shared src/ package
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from src.matrix_store import PREDECESSORS_FILE
+from src.path_expansion import load_expander
+from src.route_metrics import index_slice
+from src.route_io import load_routes
+from src.shared_data import attach
 
 # Try frontend/Data first, then project-root/Data
 DATA_DIR: Optional[Path] = next(
@@ -43,7 +84,21 @@ OPT_DIR: Optional[Path] = next(
 
 POINTS_FILE        = (DATA_DIR / "points_lat_long.npy") if DATA_DIR else None
 PHOTO_IDX_FILE     = (DATA_DIR / "photo_indexes.npy")   if DATA_DIR else None
-ROUTES_GLOBAL_FILE = (OPT_DIR  / "routes_global.npy")   if OPT_DIR  else None
+# The compact .kdr route set (src/route_io.py) wins over the pickled .npy when both exist
+ROUTES_GLOBAL_FILE = next((p for p in [OPT_DIR / "routes_global.kdr", OPT_DIR / "routes_global.npy"]
+                           if p.exists()), OPT_DIR / "routes_global.npy") if OPT_DIR else None
+# Predecessors for path expansion, .kdm or .npy (src/matrix_store.py prefers the .kdm),
+# from the first Data folder that has them; all candidates go into the snapshot version
+PRED_DIRS  = [BASE_DIR.parent / "Data", BASE_DIR.parent.parent / "Data"]
+PRED_FILES = tuple(d / name for d in PRED_DIRS for name in (PREDECESSORS_FILE, "predecessors.npy"))
+# frontend/Data ships without the polygon, so look in both Data folders
+POLYGON_FILE: Optional[Path] = next(
+    (p for p in [
+        BASE_DIR.parent / "Data" / "polygon_lon_lat.wkt",
+        BASE_DIR.parent.parent / "Data" / "polygon_lon_lat.wkt",
+    ] if p.exists()),
+    None
+)
 # ----------------------------------------------------------------------
 
 
@@ -53,37 +108,177 @@ def _assert_exists(path: Optional[Path], label: str) -> None:
     if p is None or not p.exists():
         raise FileNotFoundError(f"{label} not found at {p}")
 
+def _shared_array(name: str) -> Optional[np.ndarray]:
+    """`name` from the shared-memory daemon serving DATA_DIR (src/shared_data.py), if any."""
+    world = attach(DATA_DIR) if DATA_DIR is not None else None
+    return world.get(name) if world is not None else None
+
 def _load_points() -> np.ndarray:
-    """Returns (N,2) float array of [lat, lon]."""
-    _assert_exists(POINTS_FILE, "points_lat_long.npy")
-    pts = np.load(str(POINTS_FILE), allow_pickle=True)
+    """Returns (N,2) float array of [lon, lat] (the file's column order)."""
+    pts = _shared_array("points")
+    if pts is None:
+        _assert_exists(POINTS_FILE, "points_lat_long.npy")
+        pts = np.load(str(POINTS_FILE), allow_pickle=True)
     pts = np.asarray(pts, dtype=float)
     if pts.ndim != 2 or pts.shape[1] < 2:
         raise ValueError(f"points_lat_long.npy has unexpected shape {pts.shape}; expected (N,2+).")
     return pts[:, :2]  # (N,2)
 
 def _load_photo_indexes(n_points: int) -> np.ndarray:
-    """Returns (M,) int indices into points array."""
-    _assert_exists(PHOTO_IDX_FILE, "photo_indexes.npy")
-    arr = np.load(str(PHOTO_IDX_FILE), allow_pickle=True)
+    """Returns (M,) int indices into points array (src.route_metrics.index_slice)."""
+    arr = _shared_array("photo_indexes")
+    if arr is None:
+        _assert_exists(PHOTO_IDX_FILE, "photo_indexes.npy")
+        arr = np.load(str(PHOTO_IDX_FILE), allow_pickle=True)
     arr = np.asarray(arr)
+    if arr.dtype == bool and arr.size != n_points:
+        raise ValueError(f"photo_indexes mask size {arr.size} != points size {n_points}")
+    return index_slice(arr, n_points)
+
+def _load_routes_global() -> List[np.ndarray]:
+    """Loads routes_global.kdr / routes_global.npy as a list of int arrays."""
+    _assert_exists(ROUTES_GLOBAL_FILE, "routes_global.npy")
+    return load_routes(ROUTES_GLOBAL_FILE)
 
-    if arr.dtype == bool:
-        if arr.size != n_points:
-            raise ValueError(f"photo_indexes mask size {arr.size} != points size {n_points}")
-        idx = np.where(arr)[0]
-    else:
-        idx = np.asarray(arr, dtype=int).ravel()
+_EXPANDER = None
+_EXPANDER_LOADED = False
 
-    # keep only valid indices
-    idx = idx[(idx >= 0) & (idx < n_points)]
-    return idx
+def _expander():
+    global _EXPANDER, _EXPANDER_LOADED
+    if not _EXPANDER_LOADED:
+        pred_dir = next((f.parent for f in PRED_FILES if f.exists()), None)
+        _EXPANDER = load_expander(pred_dir) if pred_dir is not None else None
+        _EXPANDER_LOADED = True
+    return _EXPANDER
 
-def _load_routes_global():
-    """Loads routes_global.npy (array/list of missions)."""
-    _assert_exists(ROUTES_GLOBAL_FILE, "routes_global.npy")
-    routes = np.load(str(ROUTES_GLOBAL_FILE), allow_pickle=True)
-    return routes
+def _flown_path(path_idx: np.ndarray) -> np.ndarray:
+    """Route nodes expanded through predecessors (LRU-cached legs), or the nodes as-is."""
+    expander = _expander()
+    if expander is None or len(path_idx) < 2:
+        return path_idx
+    return expander.expand_routes([path_idx]).mission(0)
+
+def _flown_paths(routes: List[np.ndarray]) -> List[np.ndarray]:
+    """_flown_path for every mission in one batched expansion."""
+    expander = _expander()
+    if expander is None:
+        return routes
+    paths = expander.expand_routes([r for r in routes if len(r) >= 2])
+    it = iter(range(len(paths)))
+    return [paths.mission(next(it)) if len(r) >= 2 else r for r in routes]
+# ----------------------------------------------------------------------
+
+
+# --- Snapshot cache ----------------------------------------------------
+BINARY_MAGIC = b"KDMV"
+BINARY_VERSION = 2                  # 2: coordinates as lat/lon (1 sent the file's lon/lat)
+# magic, version, mission_id, n_waypoints, n_visited, n_path
+BINARY_HEADER = struct.Struct("<4s5I")
+
+class _Snapshot:
+    """Everything derived from one version of the input files."""
+
+    def __init__(self, version: str, routes=None):
+        self.version = version
+        self.points = _load_points()                # (lon, lat), for the LOD pyramid
+        self.latlon = self.points[:, ::-1]          # (lat, lon), for every other payload
+        self.photo_ids = _load_photo_indexes(len(self.points))
+        routes = _load_routes_global() if routes is None else routes
+        self.routes = []
+        for raw in routes:
+            idx = np.asarray(raw, dtype=np.int64).ravel()
+            self.routes.append(idx[(idx >= 0) & (idx < len(self.points))])  # valid only
+        self.waypoints: Dict[float, Tuple[List[Dict[str, Any]], bytes]] = {}
+        self.payloads: Dict[Tuple[int, str, float, bool], Tuple[bytes, str]] = {}
+        self.views: Dict[Tuple[int, float], Dict[str, Any]] = {}
+        self.tiles: Dict[Tuple[int, int, int], Tuple[bytes, str]] = {}
+        self._lod = None                # src.lod.LodPyramid
+        self.lock = threading.Lock()
+
+    def lod(self):
+        """LOD pyramid over photo waypoints, polygon and flown paths; caller holds self.lock."""
+        if self._lod is None:
+            from src.lod import LodPyramid      # shapely, only needed once tiles are requested
+
+            polygon = None
+            if POLYGON_FILE is not None and Path(POLYGON_FILE).exists():
+                shared = attach(POLYGON_FILE.parent)
+                polygon = shared.polygon() if shared is not None else None
+                if polygon is None:
+                    from src.geofence import load_polygon
+                    polygon = load_polygon(POLYGON_FILE)
+            # Point columns are (lon, lat) on disk, which is what the pyramid takes
+            paths = [self.points[p] for p in _flown_paths(self.routes)]
+            self._lod = LodPyramid(self.points[self.photo_ids], self.photo_ids, polygon, paths)
+        return self._lod
+
+    def all_waypoints(self, default_alt: float) -> Tuple[List[Dict[str, Any]], bytes]:
+        """(list of dicts, its JSON encoding), built once per altitude."""
+        hit = self.waypoints.get(default_alt)
+        if hit is None:
+            coords = self.latlon[self.photo_ids]
+            wps = [{"id": i, "lat": lat, "lon": lon, "alt": float(default_alt)}
+                   for i, (lat, lon) in zip(self.photo_ids.tolist(), coords.tolist())]
+            hit = (wps, json.dumps(wps, separators=(",", ":")).encode())
+            self.waypoints[default_alt] = hit
+        return hit
+
+    def view(self, mission_id: int, default_alt: float) -> Optional[Dict[str, Any]]:
+        if mission_id < 1 or mission_id > len(self.routes):
+            return None
+        key = (mission_id, default_alt)
+        hit = self.views.get(key)
+        if hit is None:
+            path_idx = self.routes[mission_id - 1]
+            flown = _flown_path(path_idx)
+            hit = {
+                "mission_id": mission_id,
+                "all_waypoints": self.all_waypoints(default_alt)[0],
+                "visited_ids": path_idx.tolist(),
+                "path": np.c_[self.latlon[flown], np.full(len(flown), float(default_alt))].tolist(),
+            }
+            self.views[key] = hit
+        return hit
+
+_SNAPSHOT: Optional[_Snapshot] = None
+_SNAPSHOT_LOCK = threading.Lock()
+_PUBLISHED: Optional[Tuple[str, list]] = None   # (tag, routes) set by publish_routes
+
+def _files_version() -> str:
+    """Short hash over path, mtime and size of every input file."""
+    sig = []
+    for path in (POINTS_FILE, PHOTO_IDX_FILE, ROUTES_GLOBAL_FILE, POLYGON_FILE, *PRED_FILES):
+        st = Path(path).stat() if path is not None and Path(path).exists() else None
+        sig.append((str(path), st.st_mtime_ns if st else None, st.st_size if st else None))
+    return hashlib.sha1(repr(sig).encode()).hexdigest()[:16]
+
+def _snapshot() -> _Snapshot:
+    """Current snapshot; reloads the input files only if one of them changed."""
+    global _SNAPSHOT, _EXPANDER_LOADED
+    published = _PUBLISHED
+    version = _files_version() + (f"-{published[0]}" if published else "")
+    snap = _SNAPSHOT
+    if snap is not None and snap.version == version:
+        return snap
+    with _SNAPSHOT_LOCK:
+        if _SNAPSHOT is None or _SNAPSHOT.version != version:
+            _EXPANDER_LOADED = False        # predecessors are part of the version
+            _SNAPSHOT = _Snapshot(version, published[1] if published else None)
+        return _SNAPSHOT
+
+def _pack_binary(view: Dict[str, Any], photo_ids: np.ndarray, latlon: np.ndarray,
+                 default_alt: float) -> bytes:
+    """
+    Header, then float64 blocks first (8-byte aligned), then int32 blocks:
+      waypoints (M,3) lat/lon/alt | path (P,3) lat/lon/alt | waypoint ids (M,) | visited ids (V,)
+    """
+    wp = np.c_[latlon[photo_ids], np.full(len(photo_ids), float(default_alt))].astype("<f8")
+    path = np.asarray(view["path"], dtype="<f8").reshape(-1, 3)
+    visited = np.asarray(view["visited_ids"], dtype="<i4")
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, view["mission_id"],
+                                len(wp), len(visited), len(path))
+    return b"".join([header, wp.tobytes(), path.tobytes(), photo_ids.astype("<i4").tobytes(),
+                     visited.tobytes()])
 # ----------------------------------------------------------------------
 
 
@@ -92,20 +287,9 @@ def build_all_waypoints(default_alt: float = 50.0) -> List[Dict[str, Any]]:
     """
     Returns a flat list of all survey/photo waypoints (from photo_indexes.npy):
       [ {id, lat, lon, alt}, ... ]
+    The list is shared by the cache; do not modify it.
     """
-    pts = _load_points()                          # (N,2)
-    photo_ids = _load_photo_indexes(len(pts))     # (M,)
-    coords = pts[photo_ids]                       # (M,2)
-
-    out = []
-    for i, (lat, lon) in zip(photo_ids.tolist(), coords.tolist()):
-        out.append({
-            "id":  int(i),
-            "lat": float(lat),
-            "lon": float(lon),
-            "alt": float(default_alt),
-        })
-    return out
+    return _snapshot().all_waypoints(float(default_alt))[0]
 
 def build_mission_view(mission_id: int, default_alt: float = 50.0) -> Optional[Dict[str, Any]]:
     """
@@ -116,35 +300,88 @@ def build_mission_view(mission_id: int, default_alt: float = 50.0) -> Optional[D
         "mission_id":   int,
         "all_waypoints":[ {id, lat, lon, alt}, ... ],  # from photo_indexes.npy
         "visited_ids":  [int, ...],                    # indices visited in this mission
-        "path":         [ [lat, lon, alt], ... ]       # ordered path coordinates
+        "path":         [ [lat, lon, alt], ... ]       # ordered flown path coordinates
       }
-    or None if mission_id is out of range.
+    or None if mission_id is out of range. The dict is shared by the cache; do not modify it.
+    """
+    return _snapshot().view(mission_id, float(default_alt))
+
+def mission_view_payload(mission_id: int, fmt: str = "json", default_alt: float = 50.0,
+                         waypoints: bool = True) -> Optional[Tuple[bytes, str]]:
+    """
+    Serialized mission view as (body, etag), or None if mission_id is out of range.
+    fmt is "json" (same shape as build_mission_view) or "bin" (see _pack_binary).
+    waypoints=False sends all_waypoints empty, for clients that read them from tiles.
+    The ETag changes whenever the input files change.
+    """
+    if fmt not in ("json", "bin"):
+        raise ValueError(f"unknown format {fmt!r}; expected 'json' or 'bin'")
+    default_alt = float(default_alt)
+    snap = _snapshot()
+    key = (mission_id, fmt, default_alt, waypoints)
+    hit = snap.payloads.get(key)
+    if hit is not None:
+        return hit
+
+    with snap.lock:
+        view = snap.view(mission_id, default_alt)
+        if view is None:
+            return None
+        if fmt == "json":
+            # Splice the pre-serialized all_waypoints instead of re-encoding it
+            rest = json.dumps({"visited_ids": view["visited_ids"], "path": view["path"]},
+                              separators=(",", ":")).encode()
+            body = b"".join([b'{"mission_id":', str(mission_id).encode(), b',"all_waypoints":',
+                             snap.all_waypoints(default_alt)[1] if waypoints else b"[]", b",", rest[1:]])
+        else:
+            photo_ids = snap.photo_ids if waypoints else snap.photo_ids[:0]
+            body = _pack_binary(view, photo_ids, snap.latlon, default_alt)
+        etag = f"{snap.version}-{mission_id}-{fmt}-{default_alt:g}{'' if waypoints else '-nowp'}"
+        snap.payloads[key] = (body, etag)
+        return body, etag
+
+def fleet_paths(default_alt: float = 50.0) -> List[np.ndarray]:
+    """
+    One (L_k, 3) [lat, lon, alt] array per mission with at least one node, the
+    same flown paths as build_mission_view, for src.fleet_sim.FleetSim. Drone k
+    is the k-th non-empty mission.
+    """
+    snap = _snapshot()
+    routes = [r for r in snap.routes if len(r)]
+    return [np.c_[snap.latlon[p], np.full(len(p), float(default_alt))] for p in _flown_paths(routes)]
+
+def publish_routes(routes: Optional[list], tag: str = "") -> None:
+    """
+    Serves `routes` (list of node sequences) instead of routes_global.npy, e.g.
+    the result of an optimization job; None goes back to the file. The next
+    request builds a fresh snapshot, and `tag` goes into every ETag.
     """
-    pts = _load_points()                 # (N,2)
-    routes = _load_routes_global()
-
-    # Normalize routes into a list of missions
-    try:
-        n_missions = len(routes)
-    except TypeError:
-        routes = [routes]
-        n_missions = 1
-
-    if mission_id < 1 or mission_id > n_missions:
-        return None
-
-    raw_idx = routes[mission_id - 1]
-    path_idx = np.asarray(raw_idx, dtype=float).astype(int).ravel()
-    path_idx = path_idx[(path_idx >= 0) & (path_idx < len(pts))]  # valid only
-
-    path_coords = [[float(lat), float(lon), float(default_alt)]
-                   for (lat, lon) in pts[path_idx].tolist()]
-    visited_ids = path_idx.astype(int).tolist()
-
-    return {
-        "mission_id": mission_id,
-        "all_waypoints": build_all_waypoints(default_alt=default_alt),
-        "visited_ids": visited_ids,
-        "path": path_coords,
-    }
-# ----------------------------------------------------------------------
\ No newline at end of file
+    global _PUBLISHED
+    _PUBLISHED = None if routes is None else (tag or hashlib.sha1(repr(routes).encode()).hexdigest()[:8],
+                                              [list(r) for r in routes])
+
+def tile_payload(z: int, x: int, y: int) -> Optional[Tuple[bytes, str]]:
+    """
+    One LOD tile as (JSON body, etag), or None if z is outside the pyramid
+    or x/y outside the zoom level. Body (coordinates as [lat, lon]):
+      {"z", "x", "y",
+       "points":  {"mode": "raw", "id": [...], "lat": [...], "lon": [...]}
+                | {"mode": "grid", "lat": [...], "lon": [...], "count": [...]},
+       "polygon": [ [[lat, lon], ...], ... ],             # boundary pieces
+       "routes":  {"mission": [k, ...], "path": [ [[lat, lon], ...], ... ]}}
+    """
+    snap = _snapshot()
+    key = (z, x, y)
+    hit = snap.tiles.get(key)
+    if hit is not None:
+        return hit
+
+    with snap.lock:
+        tile = snap.lod().tile(z, x, y)
+        if tile is None:
+            return None
+        body = json.dumps(tile, separators=(",", ":")).encode()
+        hit = (body, f"{snap.version}-t{z}-{x}-{y}")
+        snap.tiles[key] = hit
+        return hit
+# ----------------------------------------------------------------------
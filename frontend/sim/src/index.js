@@ -104,20 +104,77 @@ function mount(host, options = {}) {
   };
 }
 
+// Subscribe to the server-side fleet simulation (/fleet_stream, Server-Sent Events).
+// onFrame gets {t, lat[], lon[], alt[], soc[], wp[], state[]} per batch; returns a close() fn.
+// record: true keeps every step as a telemetry run; onRecording gets its id for fetchTelemetry.
+function streamFleet(onFrame, { dt = 1, batch = 60, speed = 12, rate = 0, record = false,
+                                onSummary, onRecording } = {}) {
+  const src = new EventSource(`/fleet_stream?dt=${dt}&batch=${batch}&speed=${speed}&rate=${rate}` +
+                              `&record=${record ? 1 : 0}`);
+  src.addEventListener('recording', e => onRecording && onRecording(JSON.parse(e.data).run));
+  src.addEventListener('frame', e => onFrame(JSON.parse(e.data)));
+  src.addEventListener('summary', e => {
+    src.close();
+    if (onSummary) onSummary(JSON.parse(e.data));
+  });
+  return () => src.close();
+}
+
+// Time-range slice of a recorded run (/telemetry/<run>): columns {t[], mission[], lat[], lon[],
+// alt[], soc[], wp[], state[]}, at most `points` samples per mission. Omitted bounds = whole run.
+async function fetchTelemetry(run, { t0, t1, points = 500, mission } = {}) {
+  const q = new URLSearchParams({ points });
+  if (t0 !== undefined) q.set('t0', t0);
+  if (t1 !== undefined) q.set('t1', t1);
+  if (mission !== undefined) q.set('mission', mission);
+  const res = await fetch(`/telemetry/${encodeURIComponent(run)}?${q}`);
+  if (!res.ok) throw new Error(`telemetry ${run}: ${res.status}`);
+  return res.json();
+}
+
 // Global API
 window.KDKRSim = {
   mount,
+  streamFleet,
+  fetchTelemetry,
   on: (event, fn) => store.on(event, fn),
   getState: () => store.get()
 };
 export default window.KDKRSim;
 
-// Fetch mission data
-async function loadMissionView(id = 1) {
-  const res = await fetch(`/mission_view/${id}`);
+// Decode /mission_view/<id>?format=bin into the same shape as the JSON view.
+// Layout: "KDMV", u32 version, mission_id, n_waypoints, n_visited, n_path, then
+// f64 waypoints (M,3) | f64 path (P,3) | i32 waypoint ids (M) | i32 visited ids (V)
+function decodeMissionView(buf) {
+  const head = new DataView(buf, 0, 24);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== 'KDMV' || head.getUint32(4, true) !== 2)
+    throw new Error('Unexpected mission view encoding');
+  const missionId = head.getUint32(8, true);
+  const m = head.getUint32(12, true), v = head.getUint32(16, true), p = head.getUint32(20, true);
+
+  let off = 24;
+  const wp = new Float64Array(buf, off, m * 3); off += m * 24;
+  const path = new Float64Array(buf, off, p * 3); off += p * 24;
+  const ids = new Int32Array(buf, off, m); off += m * 4;
+  const visited = new Int32Array(buf, off, v);
+
+  const allWaypoints = new Array(m);
+  for (let i = 0; i < m; i++)
+    allWaypoints[i] = { id: ids[i], lat: wp[3*i], lon: wp[3*i+1], alt: wp[3*i+2] };
+  const pathRows = new Array(p);
+  for (let i = 0; i < p; i++)
+    pathRows[i] = path.subarray(3*i, 3*i + 3);
+  return { mission_id: missionId, all_waypoints: allWaypoints, visited_ids: Array.from(visited), path: pathRows };
+}
+
+// Fetch mission data (binary typed arrays; the server also answers plain JSON).
+// With waypoints = false the map gets them per visible tile instead.
+async function loadMissionView(id = 1, { waypoints = false } = {}) {
+  const res = await fetch(`/mission_view/${id}?format=bin${waypoints ? '' : '&waypoints=0'}`);
   if (!res.ok) 
     throw new Error(`Mission view ${id} not found`);
-  return await res.json();
+  return decodeMissionView(await res.arrayBuffer());
 }
 
 document.addEventListener('DOMContentLoaded', async () => {
@@ -146,9 +203,9 @@ document.addEventListener('DOMContentLoaded', async () => {
       containerId: 'kdkr-map',
       center,
       waypoints,
-      allWaypoints: view.all_waypoints,
       visitedIds: view.visited_ids,
       path: view.path,
+      lod: true,              // waypoints, polygon and other routes come from /tiles
     });
 
     const hud = makeHud(root);
@@ -1,15 +1,17 @@
 console.log('[KDKRSim] map.js loaded');
 
 export function initMap({ containerId = 'kdkr-map', center, waypoints, 
-                          allWaypoints = [], visitedIds = [], path = []}) {
+                          allWaypoints = [], visitedIds = [], path = [], lod = false}) {
   const map = L.map(containerId, { zoomControl: true }).setView(center, 15);
   L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', { maxZoom: 19 }).addTo(map);
 
-  // Draw all waypoints
+  // Draw all waypoints: per visible tile from the server (lod), or every one of them
   const visitedSet = new Set(visitedIds);
   const allGroup = L.layerGroup().addTo(map);
+  if (lod)
+    addLodLayer(map, { visitedIds });
 
-  for (const wp of allWaypoints) {
+  for (const wp of lod ? [] : allWaypoints) {
     const isVisited = visitedSet.has(wp.id);
     L.circleMarker([wp.lat, wp.lon], {
       radius: 4,
@@ -48,4 +50,58 @@ export function initMap({ containerId = 'kdkr-map', center, waypoints,
   };
 }
 
-export default { initMap };
+// Level-of-detail overlay from /tiles/{z}/{x}/{y} (src/lod.py). Leaflet's GridLayer
+// decides which tiles are visible; each tile's waypoints, polygon pieces and route
+// pieces go on a shared canvas renderer and are dropped again when the tile unloads.
+export function addLodLayer(map, { minZoom = 10, maxZoom = 19, visitedIds = [] } = {}) {
+  const renderer = L.canvas({ padding: 0.2 });
+  const visitedSet = new Set(visitedIds);
+  const groups = new Map();
+
+  const layer = L.GridLayer.extend({
+    createTile(coords, done) {
+      const key = `${coords.z}/${coords.x}/${coords.y}`;
+      const el = document.createElement('div');
+      const group = L.layerGroup().addTo(map);
+      groups.set(key, group);
+      fetch(`/tiles/${key}`)
+        .then(res => res.ok ? res.json() : null)
+        .then(tile => {
+          if (tile && groups.get(key) === group) drawTile(group, tile);
+          done(null, el);
+        })
+        .catch(err => done(err, el));
+      return el;
+    },
+  });
+
+  function drawTile(group, tile) {
+    for (const line of tile.polygon)
+      L.polyline(line, { renderer, weight: 1, color: '#555', interactive: false }).addTo(group);
+    for (const line of tile.routes.path)
+      L.polyline(line, { renderer, weight: 2, color: '#888', interactive: false }).addTo(group);
+
+    const pts = tile.points;
+    for (let i = 0; i < pts.lat.length; i++) {
+      if (pts.mode === 'grid') {
+        L.circleMarker([pts.lat[i], pts.lon[i]], {
+          renderer, radius: Math.min(12, 3 + Math.log2(pts.count[i])), color: 'red', weight: 1, fillOpacity: 0.6,
+        }).bindTooltip(`${pts.count[i]} waypoints`).addTo(group);
+      } else {
+        L.circleMarker([pts.lat[i], pts.lon[i]], {
+          renderer, radius: 4, color: visitedSet.has(pts.id[i]) ? 'green' : 'red', weight: 2, fillOpacity: 0.9,
+        }).addTo(group);
+      }
+    }
+  }
+
+  const grid = new layer({ minZoom, maxNativeZoom: maxZoom, tileSize: 256, updateWhenZooming: false });
+  grid.on('tileunload', e => {
+    const key = `${e.coords.z}/${e.coords.x}/${e.coords.y}`;
+    const group = groups.get(key);
+    if (group) { map.removeLayer(group); groups.delete(key); }
+  });
+  return grid.addTo(map);
+}
+
+export default { initMap, addLodLayer };
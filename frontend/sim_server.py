@@ -1,5 +1,5 @@
-from flask import Flask, send_from_directory, render_template_string, jsonify
-import os, runpy
+from flask import Flask, send_from_directory, render_template_string, jsonify, request, Response, stream_with_context
+import json, os, runpy, time
 
 app = Flask(__name__)
 
@@ -31,6 +31,10 @@ if "build_mission_view" not in ns:
         f"Available names: {sorted(k for k in ns.keys() if not k.startswith('__'))}"
     )
 build_mission_view = ns["build_mission_view"]
+mission_view_payload = ns["mission_view_payload"]
+tile_payload = ns["tile_payload"]
+publish_routes = ns["publish_routes"]
+fleet_paths = ns["fleet_paths"]
 # -------------------------------------------------------
 
 DEMO_HTML = os.path.join(BASE_DIR, "sim", "demo", "index.html")
@@ -47,16 +51,201 @@ def sim_page():
 def sim_static(filename):
     return send_from_directory(SIM_SRC, filename)
 
+MISSION_VIEW_TYPES = {"json": "application/json", "bin": "application/octet-stream"}
+
+# ?format=bin returns packed typed arrays (see data_model._pack_binary)
+# ?waypoints=0 leaves all_waypoints empty (the map reads them from /tiles)
 @app.route("/mission_view/<int:mission_id>")
 def mission_view(mission_id):
+    fmt = request.args.get("format", "json")
+    if fmt not in MISSION_VIEW_TYPES:
+        return jsonify({"error": f"unknown format {fmt!r}"}), 400
+    waypoints = request.args.get("waypoints", "1") != "0"
     try:
-        view = build_mission_view(mission_id)
-        if not view:
+        payload = mission_view_payload(mission_id, fmt, waypoints=waypoints)
+        if payload is None:
             return jsonify({"error": "Mission not found"}), 404
-        return jsonify(view)
+        body, etag = payload
+        if etag in request.if_none_match:
+            resp = Response(status=304)
+        else:
+            resp = Response(body, mimetype=MISSION_VIEW_TYPES[fmt])
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"   # always revalidate, 304 when unchanged
+        return resp
+    except Exception as e:
+        import traceback; traceback.print_exc()
+        return jsonify({"error": "internal", "detail": str(e)}), 500
+
+# Level-of-detail map tiles (src/lod.py): waypoints, polygon and routes inside one z/x/y tile
+@app.route("/tiles/<int:z>/<int:x>/<int:y>")
+def tiles(z, x, y):
+    try:
+        payload = tile_payload(z, x, y)
+        if payload is None:
+            return jsonify({"error": "Tile out of range"}), 404
+        body, etag = payload
+        resp = Response(status=304) if etag in request.if_none_match else Response(body, mimetype="application/json")
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
     except Exception as e:
         import traceback; traceback.print_exc()
         return jsonify({"error": "internal", "detail": str(e)}), 500
 
+# Server-Sent Events: the whole fleet simulated headless (src/fleet_sim.py), one
+# "frame" event per batch of steps and a final "summary" event.
+#   ?dt=1&batch=60&speed=12  sim step (s), steps per frame, ground speed (m/s)
+#   ?rate=0                  sim seconds per wall second (0 = as fast as possible)
+#   ?record=1                every step goes to a telemetry run (src/telemetry.py),
+#                            announced first as a "recording" event {"run": id}
+@app.route("/fleet_stream")
+def fleet_stream():
+    from src.fleet_sim import FleetSim        # src/ is on sys.path via data_model.py
+    from src.telemetry import TELEMETRY_DIR, TelemetryRecorder, new_run_id
+
+    dt = request.args.get("dt", 1.0, type=float)
+    batch = request.args.get("batch", 60, type=int)
+    speed = request.args.get("speed", 12.0, type=float)
+    rate = request.args.get("rate", 0.0, type=float)
+    if dt <= 0 or batch < 1 or speed <= 0 or rate < 0:
+        return jsonify({"error": "dt, batch and speed must be positive, rate >= 0"}), 400
+    # Same points, missions and lat/lon order as /mission_view
+    sim = FleetSim(fleet_paths(), speed)
+    recorder = None
+    if request.args.get("record", "0") != "0":
+        recorder = TelemetryRecorder(TELEMETRY_DIR / new_run_id(),
+                                     meta={"dt": dt, "speed_mps": speed, "drones": sim.n})
+        _recording[recorder.run_id] = recorder
+
+    def events():
+        t0 = time.perf_counter()
+        try:
+            if recorder is not None:
+                yield f"event: recording\ndata: {json.dumps({'run': recorder.run_id})}\n\n"
+            for frame in sim.run(dt, batch, on_step=recorder.record if recorder else None):
+                if rate:
+                    time.sleep(max(0.0, frame["t"] / rate - (time.perf_counter() - t0)))
+                yield f"event: frame\ndata: {json.dumps(frame)}\n\n"
+            yield f"event: summary\ndata: {json.dumps(sim.summary())}\n\n"
+        finally:
+            if recorder is not None:
+                recorder.close()
+                _recording.pop(recorder.run_id, None)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Telemetry replay (src/telemetry.py) ---
+# GET /telemetry                 recorded runs (rows, time span, still recording?)
+# GET /telemetry/<run>?t0=&t1=   rows in [t0, t1] as columns, found by binary search
+#     &points=500                at most this many samples per mission (time bins)
+#     &mission=3                 one mission only
+# Runs still streaming include the rows not yet flushed to disk. Runs that cannot
+# be read (index.json gone, or written by another format version) are left out
+# of the list and answer 404 / 409.
+_recording = {}
+_runs = {}
+
+def _telemetry_run(run_id):
+    from src.telemetry import INDEX_FILE, TELEMETRY_DIR, TelemetryRun
+    run_dir = TELEMETRY_DIR / run_id
+    if run_dir.parent != TELEMETRY_DIR or not (run_dir / INDEX_FILE).exists():
+        return None
+    if run_id not in _runs:
+        _runs[run_id] = TelemetryRun(run_dir)
+    return _runs[run_id]
+
+@app.route("/telemetry")
+def telemetry_runs():
+    from src.telemetry import list_runs
+    runs = []
+    for r in list_runs():
+        try:
+            run = _telemetry_run(r)
+            if run is not None:
+                runs.append(run.info(_recording.get(r)))
+        except (ValueError, OSError):
+            _runs.pop(r, None)
+    return jsonify(runs)
+
+@app.route("/telemetry/<run_id>")
+def telemetry_range(run_id):
+    from src.telemetry import to_payload
+    try:
+        run = _telemetry_run(run_id)
+        if run is not None:
+            run.refresh()
+    except FileNotFoundError:
+        run = None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    if run is None:
+        return jsonify({"error": "Run not found"}), 404
+    t0 = request.args.get("t0", float("-inf"), type=float)
+    t1 = request.args.get("t1", float("inf"), type=float)
+    points = request.args.get("points", None, type=int)
+    mission = request.args.get("mission", None, type=int)
+    if t1 < t0 or (points is not None and points < 1):
+        return jsonify({"error": "need t0 <= t1 and points >= 1"}), 400
+    live = _recording.get(run_id)
+    cols = run.query(t0, t1, points, mission, live=live)
+    return jsonify({**run.info(live), "rows_returned": len(cols["t"]), "columns": to_payload(cols)})
+
+# --- Optimization jobs (src/jobs.py) ---
+# POST /jobs {"num_drones", "battery_cap", "time_limit", "nodes", ...} -> 202 {"id", "state", ...}
+# GET /jobs | /jobs/<id> | /jobs/<id>/progress, POST /jobs/<id>/cancel
+# Solves run in a bounded process pool; finished routes replace routes_global.npy
+# in the mission-view cache, so /mission_view and /tiles serve them right away.
+_jobs = None
+
+def job_manager():
+    global _jobs
+    if _jobs is None:
+        from src.jobs import JobManager
+        _jobs = JobManager(on_done=lambda job: publish_routes(job.result["routes"], f"job{job.id}"))
+    return _jobs
+
+def _job_or_404(job_id):
+    job = job_manager().get(job_id)
+    if job is None:
+        return None, (jsonify({"error": "Job not found"}), 404)
+    return job, None
+
+@app.route("/jobs", methods=["GET", "POST"])
+def jobs():
+    from src.jobs import JobQueueFull
+    try:
+        manager = job_manager()
+    except FileNotFoundError as e:
+        return jsonify({"error": "distance matrix not available", "detail": str(e)}), 503
+    if request.method == "GET":
+        return jsonify(manager.list())
+    try:
+        job = manager.submit(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    resp = jsonify(manager.status(job))
+    resp.status_code = 202
+    resp.headers["Location"] = f"/jobs/{job.id}"
+    return resp
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job, err = _job_or_404(job_id)
+    return err or jsonify(job_manager().status(job))
+
+@app.route("/jobs/<job_id>/progress")
+def job_progress(job_id):
+    job, err = _job_or_404(job_id)
+    return err or jsonify(job_manager().progress(job))
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    job, err = _job_or_404(job_id)
+    return err or jsonify(job_manager().cancel(job))
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
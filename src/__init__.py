@@ -0,0 +1 @@
+# Route optimization package (solver, matrix storage and planning tools)
@@ -0,0 +1,391 @@
+"""
+KDKR src/build_matrices.py
+
+Regenerates distance_matrix.npy and predecessors.npy from points_lat_long.npy
+and polygon_lon_lat.wkt, in the layout RouteFinder.load_assets expects.
+
+Pipeline:
+  1. Project points and polygon to local feet (equirectangular around the
+     polygon centroid, scaled by the WGS84 radii of curvature there; a
+     spherical 111,320 m degree of latitude is 0.5% long at our site).
+  2. Exact visibility graph: every pair of nodes whose straight leg stays
+     inside the polygon gets an edge. Pairs are tested in bulk across a
+     process pool against the prepared boundary (about 1.3 us a leg; 9.1M
+     pairs for our 4274 points); only legs with an endpoint on or outside
+     the fence need the slower `covers` test.
+  3. All-pairs shortest paths with scipy.sparse.csgraph.dijkstra, sources
+     chunked across a process pool, rows streamed into .npy memmaps.
+
+The graph is saved next to the matrices (visibility_graph.npz, with the
+projected points it was built for). --incremental uses it when points have
+been appended to points_lat_long.npy: only the legs from the new points are
+tested, Dijkstra runs from the new points only, and old pairs take a path
+through a new point wherever that is shorter. The result equals a full
+rebuild.
+
+With --corners the polygon's reflex vertices (where shortest paths bend) join
+the graph as nodes, so paths around holes and notches can bend at the
+boundary instead of at the nearest waypoint. The matrices then cover them
+too, so the augmented data set goes to a separate --out-dir: points with the
+corners appended, corner_indexes.npy with their [first, last] slice, and the
+challenge index files clamped to the original points so corners never count
+as assets, photos or waypoints. The source Data folder is not modified.
+
+Usage (from the repo root):
+  python -m src.build_matrices --workers 8
+  python -m src.build_matrices --incremental          # after appending points
+  python -m src.build_matrices --corners --out-dir Data_corners
+"""
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import shapely
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from src.config import DATA_DIR
+from src.geofence import boundary_segments, boundary_tree, legs_inside, load_polygon, polygon_rings
+
+FEET_PER_METER = 1 / 0.3048
+WGS84_A_M = 6_378_137.0
+WGS84_E2 = 6.69437999014e-3
+CORNER_OFFSET_FT = 1.0         # corner nodes sit this far inside the polygon, off the fence itself
+CHUNK_SOURCES = 256
+CHUNK_PAIRS = 250_000          # legs per visibility task
+GRAPH_FILE = "visibility_graph.npz"
+
+
+# --- Geometry ----------------------------------------------------------
+def projection_at(lon0: float, lat0: float) -> Tuple[float, float, float, float]:
+    """(lon0, lat0, feet per degree of longitude, feet per degree of latitude) on WGS84."""
+    s = math.sin(math.radians(lat0))
+    w = 1 - WGS84_E2 * s * s
+    prime_vertical = WGS84_A_M / math.sqrt(w)
+    meridian = WGS84_A_M * (1 - WGS84_E2) / w ** 1.5
+    per_degree = math.pi / 180 * FEET_PER_METER
+    return lon0, lat0, prime_vertical * math.cos(math.radians(lat0)) * per_degree, meridian * per_degree
+
+def make_projection(polygon) -> Tuple[float, float, float, float]:
+    c = polygon.centroid
+    return projection_at(c.x, c.y)
+
+def project(lonlat: np.ndarray, proj) -> np.ndarray:
+    lon0, lat0, fx, fy = proj
+    lonlat = np.asarray(lonlat, dtype=float)
+    return np.c_[(lonlat[:, 0] - lon0) * fx, (lonlat[:, 1] - lat0) * fy]
+
+def unproject(xy: np.ndarray, proj) -> np.ndarray:
+    lon0, lat0, fx, fy = proj
+    return np.c_[xy[:, 0] / fx + lon0, xy[:, 1] / fy + lat0]
+
+def reflex_vertices(polygon) -> np.ndarray:
+    """Vertices where the free space is non-convex; shortest paths only bend there."""
+    out = []
+    for ring in polygon_rings(polygon):
+        prev = np.roll(ring, 1, axis=0)
+        nxt = np.roll(ring, -1, axis=0)
+        e1, e2 = ring - prev, nxt - ring
+        cross = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+        out.append(ring[cross < 0])
+    return np.concatenate(out) if out else np.zeros((0, 2))
+
+def corner_nodes(polygon, offset: float = CORNER_OFFSET_FT) -> np.ndarray:
+    """
+    Reflex vertices moved `offset` into the polygon along their angle bisector.
+    Exactly on the boundary, rounding (e.g. through unproject/project) can put
+    them just outside, and then every edge to them fails the inside test.
+    """
+    out = []
+    for ring in polygon_rings(polygon):
+        e1 = ring - np.roll(ring, 1, axis=0)
+        e2 = np.roll(ring, -1, axis=0) - ring
+        reflex = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0] < 0
+        e1 = e1[reflex] / np.linalg.norm(e1[reflex], axis=1, keepdims=True)
+        e2 = e2[reflex] / np.linalg.norm(e2[reflex], axis=1, keepdims=True)
+        bisector = e1 - e2
+        bisector /= np.maximum(np.linalg.norm(bisector, axis=1, keepdims=True), 1e-12)
+        out.append(ring[reflex] + offset * bisector)
+    pts = np.concatenate(out) if out else np.zeros((0, 2))
+    # Nearly straight vertices have no clear bisector; keep only nodes that landed inside
+    return pts[shapely.contains_xy(polygon, pts[:, 0], pts[:, 1])]
+
+
+# --- Visibility graph --------------------------------------------------
+_FENCE = None
+
+def _init_fence(xy, polygon):
+    global _FENCE
+    boundary = shapely.multilinestrings(boundary_segments(polygon))
+    shapely.prepare(boundary)
+    interior = shapely.contains_xy(polygon, xy[:, 0], xy[:, 1])
+    _FENCE = (xy, polygon, boundary_tree(polygon), boundary, interior)
+
+def _visible_pairs(rows) -> Tuple[np.ndarray, np.ndarray]:
+    """Visible pairs (i, j), j < i, for source rows [first, last)."""
+    xy, polygon, tree, boundary, interior = _FENCE
+    first, last = rows
+    src = np.arange(first, last)          # row i pairs with 0..i-1
+    a = np.repeat(src, src)
+    b = np.arange(len(a)) - np.repeat(np.cumsum(src) - src, src)
+    lines = shapely.linestrings(np.stack([xy[a], xy[b]], axis=1))
+    # Between two interior points a leg is inside iff it never touches the fence
+    ok = ~shapely.intersects(boundary, lines)
+    edge = ~(interior[a] & interior[b])
+    if edge.any():
+        ok[edge] = legs_inside(polygon, tree, xy[a[edge]], xy[b[edge]], lines[edge])
+    return a[ok], b[ok]
+
+def visibility_graph(xy: np.ndarray, polygon, first: int = 0, graph: Optional[csr_matrix] = None,
+                     workers: Optional[int] = None) -> csr_matrix:
+    """
+    Undirected weighted visibility graph (feet) over xy: an edge for every
+    pair whose leg stays inside the polygon. With `first`, only pairs that
+    involve a node >= first are tested, and their edges are added to `graph`
+    (the graph over the first `first` nodes).
+    """
+    n = len(xy)
+    tasks, lo = [], max(first, 1)
+    while lo < n:
+        # Row i holds i pairs; cut the rows into tasks of about CHUNK_PAIRS legs
+        hi = lo + 1
+        while hi < n and (hi - lo) * hi < CHUNK_PAIRS:
+            hi += 1
+        tasks.append((lo, hi))
+        lo = hi
+    workers = workers or os.cpu_count() or 1
+    a, b = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_fence, initargs=(xy, polygon)) as pool:
+        for (_, last), (ta, tb) in zip(tasks, pool.map(_visible_pairs, tasks)):
+            a.append(ta)
+            b.append(tb)
+            print(f"[build] visibility rows {last}/{n}", end="\r")
+    print()
+    a, b = np.concatenate(a), np.concatenate(b)
+    w = np.maximum(np.hypot(*(xy[a] - xy[b]).T), 1e-6)
+    g = coo_matrix((w, (a, b)), shape=(n, n))
+    g = g.maximum(g.T).tocsr()
+    if graph is not None:
+        old = graph.tocoo()
+        g = g.maximum(coo_matrix((old.data, (old.row, old.col)), shape=(n, n)).tocsr())
+    return g
+
+def save_graph(path: Path, graph: csr_matrix, xy: np.ndarray) -> None:
+    np.savez(path, xy=xy, data=graph.data, indices=graph.indices, indptr=graph.indptr)
+
+def load_graph(path: Path) -> Tuple[csr_matrix, np.ndarray]:
+    with np.load(path) as f:
+        n = len(f["xy"])
+        return csr_matrix((f["data"], f["indices"], f["indptr"]), shape=(n, n)), f["xy"]
+
+
+# --- All-pairs shortest paths ------------------------------------------
+_GRAPH = None
+
+def _init_worker(graph):
+    global _GRAPH
+    _GRAPH = graph
+
+def _dijkstra_rows(task) -> int:
+    sources, out_rows, dist_path, pred_path = task
+    dist, pred = dijkstra(_GRAPH, directed=False, indices=sources, return_predecessors=True)
+    dm = np.load(dist_path, mmap_mode="r+")
+    pm = np.load(pred_path, mmap_mode="r+")
+    dm[out_rows] = dist
+    pm[out_rows] = pred
+    dm.flush()
+    pm.flush()
+    return len(sources)
+
+def all_pairs(graph: csr_matrix, sources: np.ndarray, dist_path: Path, pred_path: Path,
+              out_rows: Optional[np.ndarray] = None, workers: Optional[int] = None) -> None:
+    """
+    Dijkstra from `sources`, chunked across a process pool; each chunk's rows
+    are written straight into the pre-allocated .npy memmaps at `out_rows`.
+    """
+    out_rows = np.arange(len(sources)) if out_rows is None else np.asarray(out_rows)
+    chunks = [(sources[i:i + CHUNK_SOURCES], out_rows[i:i + CHUNK_SOURCES], str(dist_path), str(pred_path))
+              for i in range(0, len(sources), CHUNK_SOURCES)]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(graph,)) as pool:
+        done = 0
+        for count in pool.map(_dijkstra_rows, chunks):
+            done += count
+            print(f"[build] dijkstra rows {done}/{len(sources)}", end="\r")
+    print()
+
+def first_hops(pred_row: np.ndarray, source: int) -> np.ndarray:
+    """
+    The node after `source` on its shortest path to every node, from the
+    source's Dijkstra predecessor row (-9999 for the source and unreachable
+    nodes). In an undirected graph that is source's predecessor seen from
+    each node, i.e. the source's column of the predecessor matrix.
+    """
+    idx = np.arange(len(pred_row))
+    up = np.where((pred_row == source) | (pred_row < 0), idx, pred_row)
+    while True:
+        nxt = up[up]
+        if np.array_equal(nxt, up):
+            break
+        up = nxt
+    up[pred_row < 0] = -9999
+    return up
+
+def extend_pairs(graph: csr_matrix, m: int, old_dist: np.ndarray, old_pred: np.ndarray,
+                 dist_path: Path, pred_path: Path) -> None:
+    """
+    Matrices for `graph` from those of its first m nodes. Dijkstra runs from
+    the new nodes only; an old pair (a, b) switches to the path through new
+    node v wherever d(a, v) + d(v, b) is shorter, with b's predecessor taken
+    from v's row. Costs len(new) passes over the old m x m block.
+    """
+    n = graph.shape[0]
+    new = np.arange(m, n)
+    dist, pred = dijkstra(graph, directed=False, indices=new, return_predecessors=True)
+    hops = np.array([first_hops(row, v) for row, v in zip(pred, new)])
+    dm = np.lib.format.open_memmap(dist_path, mode="w+", dtype=np.float64, shape=(n, n))
+    pm = np.lib.format.open_memmap(pred_path, mode="w+", dtype=np.int32, shape=(n, n))
+    for r0 in range(0, m, CHUNK_SOURCES):
+        r1 = min(r0 + CHUNK_SOURCES, m)
+        d = np.array(old_dist[r0:r1], dtype=np.float64)
+        p = np.array(old_pred[r0:r1], dtype=np.int32)
+        for k in range(len(new)):
+            via = dist[k, r0:r1, None] + dist[k, None, :m]
+            better = via < d
+            d = np.where(better, via, d)
+            p = np.where(better, pred[k, :m], p)
+        dm[r0:r1, :m] = d
+        pm[r0:r1, :m] = p
+        dm[r0:r1, m:] = dist[:, r0:r1].T
+        pm[r0:r1, m:] = hops[:, r0:r1].T
+        print(f"[build] updated rows {r1}/{m}", end="\r")
+    print()
+    dm[m:] = dist
+    pm[m:] = pred
+    dm.flush()
+    pm.flush()
+
+# --- Driver ------------------------------------------------------------
+INDEX_FILES = ("photo_indexes.npy", "asset_indexes.npy", "waypoint_indexes.npy")
+
+def clamp_indexes(arr: np.ndarray, n_points: int) -> np.ndarray:
+    """An *_indexes.npy array limited to the first n_points nodes (inclusive slices, masks, lists)."""
+    arr = np.asarray(arr)
+    if arr.dtype == bool:
+        return arr[:n_points]
+    if arr.ndim == 1 and len(arr) == 2:
+        return np.array([arr[0], min(int(arr[1]), n_points - 1)], dtype=arr.dtype)
+    return arr[arr < n_points]
+
+def add_corners(data_dir: Path, out_dir: Path, polygon, proj, points: np.ndarray) -> np.ndarray:
+    """Writes the corner-augmented data set to out_dir; returns the augmented points."""
+    import shutil
+
+    extra = corner_nodes(polygon)
+    first = len(points)
+    points = np.r_[points, unproject(extra, proj)]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    np.save(out_dir / "points_lat_long.npy", points)
+    np.save(out_dir / "corner_indexes.npy", np.array([first, len(points) - 1]))
+    for name in INDEX_FILES:
+        if (data_dir / name).exists():
+            np.save(out_dir / name, clamp_indexes(np.load(data_dir / name), first))
+    shutil.copyfile(data_dir / "polygon_lon_lat.wkt", out_dir / "polygon_lon_lat.wkt")
+    print(f"[build] {len(extra)} reflex polygon corners as nodes {first}..{len(points) - 1} in {out_dir}")
+    return points
+
+def previous_build(out_dir: Path, xy: np.ndarray) -> Tuple[csr_matrix, int]:
+    """The saved graph and its node count m, checked to cover the first m points unchanged."""
+    graph_path = out_dir / GRAPH_FILE
+    if not graph_path.exists() or not (out_dir / "distance_matrix.npy").exists():
+        raise ValueError(f"--incremental needs {GRAPH_FILE} and the matrices from a full build in {out_dir}")
+    graph, old_xy = load_graph(graph_path)
+    m = len(old_xy)
+    shape = np.load(out_dir / "distance_matrix.npy", mmap_mode="r").shape
+    if shape != (m, m):
+        raise ValueError(f"distance_matrix.npy is {shape}, the saved graph has {m} nodes; run a full build")
+    if m > len(xy) or not np.allclose(old_xy, xy[:m], atol=1e-6):
+        raise ValueError("--incremental only handles points appended to points_lat_long.npy; "
+                         "existing points changed, run a full build")
+    return graph, m
+
+def build(data_dir=DATA_DIR, corners: bool = False, workers: Optional[int] = None,
+          out_dir=None, incremental: bool = False) -> None:
+    data_dir = Path(data_dir)
+    out_dir = data_dir if out_dir is None else Path(out_dir)
+    t0 = time.perf_counter()
+    polygon_ll = load_polygon(data_dir / "polygon_lon_lat.wkt")
+    proj = make_projection(polygon_ll)
+    polygon = shapely.transform(polygon_ll, lambda c: project(c, proj))
+    points = np.load(data_dir / "points_lat_long.npy")
+
+    if corners and (data_dir / "corner_indexes.npy").exists():
+        print(f"[build] {data_dir} already has corner nodes")
+    elif corners:
+        if out_dir.resolve() == data_dir.resolve():
+            raise ValueError("--corners writes an augmented data set; pass a separate --out-dir")
+        if incremental:
+            raise ValueError("--corners starts a new data set; it cannot be built incrementally")
+        points = add_corners(data_dir, out_dir, polygon, proj, points)
+
+    xy = project(points, proj)
+    inside = shapely.intersects_xy(polygon, xy[:, 0], xy[:, 1])
+    if not inside.all():
+        print(f"[build] warning: {int((~inside).sum())} points lie outside the polygon")
+
+    n = len(xy)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    dist_path = out_dir / "distance_matrix.npy"
+    pred_path = out_dir / "predecessors.npy"
+
+    if incremental:
+        graph, m = previous_build(out_dir, xy)
+        if m == n:
+            print(f"[build] no new points, matrices in {out_dir} are current")
+            return
+        graph = visibility_graph(xy, polygon, first=m, graph=graph, workers=workers)
+        print(f"[build] graph: {n} nodes ({n - m} new), {graph.nnz // 2} edges ({time.perf_counter() - t0:.1f}s)")
+        tmp_dist, tmp_pred = dist_path.with_suffix(".tmp.npy"), pred_path.with_suffix(".tmp.npy")
+        extend_pairs(graph, m, np.load(dist_path, mmap_mode="r"), np.load(pred_path, mmap_mode="r"),
+                     tmp_dist, tmp_pred)
+        os.replace(tmp_dist, dist_path)
+        os.replace(tmp_pred, pred_path)
+    else:
+        graph = visibility_graph(xy, polygon, workers=workers)
+        print(f"[build] graph: {n} nodes, {graph.nnz // 2} edges ({time.perf_counter() - t0:.1f}s)")
+        np.lib.format.open_memmap(dist_path, mode="w+", dtype=np.float64, shape=(n, n))
+        np.lib.format.open_memmap(pred_path, mode="w+", dtype=np.int32, shape=(n, n))
+        all_pairs(graph, np.arange(n), dist_path, pred_path, workers=workers)
+    save_graph(out_dir / GRAPH_FILE, graph, xy)
+
+    unreachable = int(np.isinf(np.load(dist_path, mmap_mode="r")[0]).sum())
+    if unreachable:
+        print(f"[build] warning: {unreachable} points unreachable from the depot (outside the polygon?)")
+    print(f"[build] wrote {dist_path.name} / {pred_path.name} ({n}x{n}) in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build distance/predecessor matrices from points + polygon")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--corners", action="store_true", help="add reflex polygon vertices as graph nodes")
+    parser.add_argument("--out-dir", default=None, help="where the matrices go (default: --data-dir); "
+                        "required with --corners")
+    parser.add_argument("--incremental", action="store_true",
+                        help="extend the previous build to points appended since")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--store", action="store_true", help="also convert to the compact .kdm store")
+    args = parser.parse_args()
+
+    try:
+        build(args.data_dir, args.corners, args.workers, args.out_dir, args.incremental)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.store:
+        from src.matrix_store import convert_data_dir
+        convert_data_dir(args.out_dir or args.data_dir)
@@ -0,0 +1,88 @@
+"""
+KDKR src/candidates.py
+
+Sparse candidate arcs for large instances.
+
+`neighbor_lists` keeps the k nearest nodes of every node, found with an
+`argpartition` over blocks of matrix rows, in one compact (N, k) int32 array.
+`restrict_successors` removes every other successor from each node's NextVar
+domain, so first-solution construction and the local-search neighbourhoods
+only look at about k + vehicles arcs per node instead of N. The lists are
+symmetrized (j may follow i when either lists the other), optional extra arcs
+(the routes of a warm start) are kept, and depot arcs stay allowed: vehicle
+starts keep their full domain and every node may return to the depot.
+
+A tight battery cap can leave the pruned model without a first solution even
+where the full one has many, and a failed first solution costs the whole time
+limit. RouteFinder therefore builds the first solution on full successor
+domains (RouteFinder.unpruned_start) and keeps its arcs as extra arcs, so the
+pruned model only restricts local search.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from src.config import DEPOT_INDEX
+
+CHUNK_ROWS = 512
+
+
+def neighbor_lists(distances, nodes: np.ndarray, k: int) -> np.ndarray:
+    """(N, k) nearest of `nodes` for every node in `nodes`, nearest first (row = node id, -1 elsewhere)."""
+    nodes = np.asarray(nodes, dtype=np.int64)
+    n = len(distances)
+    k = max(0, min(k, len(nodes) - 1))
+    out = np.full((n, k), -1, dtype=np.int32)
+    if k == 0:
+        return out
+    for start in range(0, len(nodes), CHUNK_ROWS):
+        rows = nodes[start:start + CHUNK_ROWS]
+        block = np.asarray(distances[rows[:, None], nodes[None, :]], dtype=float)
+        block[np.arange(len(rows)), start + np.arange(len(rows))] = np.inf      # not itself
+        near = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(block, near, axis=1), axis=1)
+        out[rows] = nodes[np.take_along_axis(near, order, axis=1)]
+    return out
+
+def route_arcs(routes) -> np.ndarray:
+    """(M, 2) consecutive node pairs of `routes`, e.g. a warm start that must stay reachable."""
+    pairs = [(a, b) for r in routes for a, b in zip(r[:-1], r[1:])]
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+def symmetric_candidates(neighbors: np.ndarray, extra_arcs: Optional[np.ndarray] = None):
+    """
+    CSR (offsets, targets) of i -> j for j in neighbors[i] or i in neighbors[j],
+    plus any `extra_arcs`. The reverse arcs keep sparse stretches connected in
+    both directions.
+    """
+    src = np.repeat(np.arange(len(neighbors)), neighbors.shape[1])
+    dst = neighbors.ravel().astype(np.int64)
+    keep = dst >= 0
+    src, dst = np.r_[src[keep], dst[keep]], np.r_[dst[keep], src[keep]]
+    if extra_arcs is not None and len(extra_arcs):
+        src, dst = np.r_[src, extra_arcs[:, 0]], np.r_[dst, extra_arcs[:, 1]]
+    pairs = np.unique(src * len(neighbors) + dst)
+    src, dst = np.divmod(pairs, len(neighbors))
+    offsets = np.searchsorted(src, np.arange(len(neighbors) + 1))
+    return offsets, dst
+
+def restrict_successors(routing, manager, neighbors: np.ndarray, depot: int = DEPOT_INDEX,
+                        extra_arcs: Optional[np.ndarray] = None) -> int:
+    """
+    Limits NextVar of every non-depot node to its (symmetrized) neighbor list,
+    the `extra_arcs` leaving it and the vehicle ends. Returns the number of
+    candidate arcs left.
+    """
+    ends = [routing.End(v) for v in range(routing.vehicles())]
+    offsets, targets = symmetric_candidates(neighbors, extra_arcs)
+    arcs = 0
+    for node in range(manager.GetNumberOfNodes()):
+        if node == depot:
+            continue
+        candidates = targets[offsets[node]:offsets[node + 1]]
+        candidates = candidates[candidates != depot]
+        values = [manager.NodeToIndex(int(j)) for j in candidates] + ends
+        routing.NextVar(manager.NodeToIndex(node)).SetValues(values)
+        arcs += len(values)
+    return arcs
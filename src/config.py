@@ -0,0 +1,10 @@
+from pathlib import Path
+
+# --- Shared paths and problem constants ---
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT_DIR / "Data"
+OPT_DIR = ROOT_DIR / "Optimized_Paths"
+
+DEPOT_INDEX = 0
+MAX_BATTERY_CAP = 37725        # Maximum flight distance per drone (feet)
+VEHICLE_FIXED_COST = 5000      # Cost to use each additional drone
@@ -0,0 +1,298 @@
+"""
+KDKR src/decomposition.py
+
+Cluster-first / route-second planning for instances too large for one VRP.
+
+  1. Partition the waypoints into sectors, either by sweep angle around the
+     depot (points_lat_long.npy) or by k-medoids on the distance matrix.
+  2. Solve each sector's battery-constrained sub-VRP in a worker process.
+     Workers memory-map the matrix store themselves, so only node lists and
+     routes cross the process boundary.
+  3. Boundary repair: relocate nodes into routes of neighbouring sectors
+     whenever that is cheaper and keeps the receiving route under the cap.
+
+Usage (from the repo root):
+  python -m src.decomposition --sectors 8 --method sweep --time-limit 30
+"""
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import DATA_DIR, DEPOT_INDEX, MAX_BATTERY_CAP, VEHICLE_FIXED_COST
+from src.matrix_store import open_matrices
+from src.route_io import save_routes
+
+METHODS = ("sweep", "kmedoids")
+
+
+# --- Partitioning ------------------------------------------------------
+def sweep_sectors(points: np.ndarray, nodes: np.ndarray, k: int,
+                  depot: int = DEPOT_INDEX) -> Tuple[List[np.ndarray], List[List[int]]]:
+    """
+    Splits `nodes` into k equal-count angular sectors around the depot.
+    points are (lon, lat); the sweep starts at the widest angular gap so no
+    sector straddles it. Neighbours are the adjacent sectors on the circle.
+    """
+    lon0, lat0 = points[depot]
+    dx = (points[nodes, 0] - lon0) * math.cos(math.radians(lat0))
+    dy = points[nodes, 1] - lat0
+    angle = np.arctan2(dy, dx)
+
+    order = np.argsort(angle)
+    sorted_angle = angle[order]
+    gaps = np.diff(np.r_[sorted_angle, sorted_angle[0] + 2 * np.pi])
+    start = (int(np.argmax(gaps)) + 1) % len(order)
+    order = np.roll(order, -start)
+
+    sectors = [nodes[chunk] for chunk in np.array_split(order, k) if len(chunk)]
+    n = len(sectors)
+    neighbors = [sorted({(s - 1) % n, (s + 1) % n} - {s}) for s in range(n)]
+    return sectors, neighbors
+
+def kmedoids_sectors(distances, nodes: np.ndarray, k: int, iters: int = 20,
+                     seed: int = 0, n_neighbors: int = 2) -> Tuple[List[np.ndarray], List[List[int]]]:
+    """
+    Alternating k-medoids on the (memory-mapped) distance matrix.
+    Neighbours are the n_neighbors closest other medoids.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(nodes))
+
+    # Farthest-first seeding from a random node
+    medoids = [int(rng.choice(nodes))]
+    nearest = np.asarray(distances[nodes, medoids[0]], dtype=float)
+    for _ in range(1, k):
+        medoids.append(int(nodes[np.argmax(nearest)]))
+        nearest = np.minimum(nearest, np.asarray(distances[nodes, medoids[-1]], dtype=float))
+    medoids = np.array(medoids)
+
+    for _ in range(iters):
+        to_medoid = np.asarray(distances[np.ix_(nodes, medoids)], dtype=float)
+        label = np.argmin(to_medoid, axis=1)
+        new = medoids.copy()
+        for c in range(k):
+            members = nodes[label == c]
+            if len(members) == 0:
+                continue
+            within = np.asarray(distances[np.ix_(members, members)], dtype=float)
+            new[c] = members[np.argmin(within.sum(axis=1))]
+        if np.array_equal(new, medoids):
+            break
+        medoids = new
+
+    label = np.argmin(np.asarray(distances[np.ix_(nodes, medoids)], dtype=float), axis=1)
+    keep = [c for c in range(k) if np.any(label == c)]
+    sectors = [nodes[label == c] for c in keep]
+    medoids = medoids[keep]
+
+    between = np.asarray(distances[np.ix_(medoids, medoids)], dtype=float)
+    np.fill_diagonal(between, np.inf)
+    m = min(n_neighbors, len(medoids) - 1)
+    neighbors = [sorted(np.argsort(row)[:m].tolist()) for row in between]
+    # Make the relation symmetric
+    for s, ns in enumerate(neighbors):
+        for t in ns:
+            if s not in neighbors[t]:
+                neighbors[t].append(s)
+    return sectors, [sorted(ns) for ns in neighbors]
+
+
+# --- Sector solve (runs in worker processes) ---------------------------
+def estimate_drones(sub: np.ndarray, battery_cap: float) -> int:
+    """Rough drone count for a sector: out-and-back plus nearest-neighbour chain."""
+    if len(sub) <= 1:
+        return 1
+    body = sub[1:, 1:].astype(float)
+    np.fill_diagonal(body, np.inf)
+    chain = float(np.min(body, axis=1).sum()) if len(body) > 1 else 0.0
+    need = chain + 2 * float(sub[0, 1:].max())
+    return max(1, math.ceil(need / battery_cap)) + 1
+
+def _solve_sector(task: Dict) -> Dict:
+    # Imported here so the parent can partition without loading ortools
+    from src.find_initial_route import (build_matrix_model, extract_routes,
+                                        make_search_parameters, quantize_costs)
+
+    distances, _ = open_matrices(task["data_dir"])
+    local = np.r_[task["depot"], task["nodes"]].astype(np.int64)
+    sub = np.asarray(distances[np.ix_(local, local)])
+    costs = quantize_costs(sub)
+
+    drones = task["drones"] or estimate_drones(sub, task["battery_cap"])
+    t0 = time.perf_counter()
+    for _ in range(3):
+        manager, routing = build_matrix_model(costs, drones, task["battery_cap"], task["vehicle_fixed_cost"])
+        params = make_search_parameters(task["time_limit"])
+        solution = routing.SolveWithParameters(params)
+        if solution:
+            break
+        drones *= 2
+    else:
+        raise RuntimeError(f"sector {task['sector']} is infeasible with {drones // 2} drones")
+
+    routes = [local[r].tolist() for r in extract_routes(routing, manager, solution, drop_empty=True)]
+    return {"sector": task["sector"], "routes": routes, "drones": drones,
+            "solve_s": time.perf_counter() - t0}
+
+
+# --- Boundary repair ---------------------------------------------------
+def route_lengths(distances, routes: Sequence[Sequence[int]]) -> np.ndarray:
+    return np.array([float(np.sum(distances[np.asarray(r[:-1]), np.asarray(r[1:])])) if len(r) > 1 else 0.0
+                     for r in routes])
+
+def repair_boundaries(distances, routes: List[List[int]], route_sector: List[int],
+                      neighbors: List[List[int]], battery_cap: float,
+                      max_passes: int = 3) -> Tuple[List[List[int]], int]:
+    """
+    Moves single nodes into routes of neighbouring sectors when the cheapest
+    feasible insertion there costs less than what removing them saves.
+    Insertion deltas for all positions of a target route are computed at once.
+    """
+    routes = [list(r) for r in routes]
+    lengths = route_lengths(distances, routes)
+    by_sector: Dict[int, List[int]] = {}
+    for idx, s in enumerate(route_sector):
+        by_sector.setdefault(s, []).append(idx)
+
+    moves = 0
+    for _ in range(max_passes):
+        improved = False
+        for a in range(len(routes)):
+            targets = [b for s in neighbors[route_sector[a]] for b in by_sector.get(s, [])]
+            if not targets:
+                continue
+            i = 1
+            while i < len(routes[a]) - 1:
+                ra = routes[a]
+                prev, v, nxt = ra[i - 1], ra[i], ra[i + 1]
+                gain = float(distances[prev, v]) + float(distances[v, nxt]) - float(distances[prev, nxt])
+
+                best = (gain - 1e-6, None, None)
+                for b in targets:
+                    rb = np.asarray(routes[b])
+                    delta = (np.asarray(distances[rb[:-1], v], dtype=float)
+                             + np.asarray(distances[v, rb[1:]], dtype=float)
+                             - np.asarray(distances[rb[:-1], rb[1:]], dtype=float))
+                    delta[lengths[b] + delta > battery_cap] = np.inf
+                    pos = int(np.argmin(delta))
+                    if delta[pos] < best[0]:
+                        best = (float(delta[pos]), b, pos + 1)
+
+                _, b, pos = best
+                if b is None:
+                    i += 1
+                    continue
+                routes[b].insert(pos, ra.pop(i))
+                lengths[a] -= gain
+                lengths[b] += best[0]
+                moves += 1
+                improved = True
+        if not improved:
+            break
+
+    return [r for r in routes if len(r) > 2], moves
+
+
+# --- Driver ------------------------------------------------------------
+def decompose_and_solve(data_dir=DATA_DIR, sectors: int = 8, method: str = "sweep",
+                        time_limit: float = 30, battery_cap: float = MAX_BATTERY_CAP,
+                        drones_per_sector: Optional[int] = None, workers: Optional[int] = None,
+                        vehicle_fixed_cost: int = VEHICLE_FIXED_COST,
+                        nodes: Optional[np.ndarray] = None) -> Tuple[List[List[int]], Dict]:
+    """
+    Partitions, solves sectors in a process pool and repairs boundaries.
+    time_limit is the wall-clock budget for the whole sector phase.
+    Returns (routes, report).
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+    t_start = time.perf_counter()
+    data_dir = Path(data_dir)
+    distances, _ = open_matrices(data_dir)
+    if nodes is None:
+        nodes = np.arange(len(distances))
+    nodes = np.asarray(nodes, dtype=np.int64)
+    nodes = nodes[nodes != DEPOT_INDEX]
+
+    if method == "sweep":
+        points = np.load(data_dir / "points_lat_long.npy")
+        parts, neighbors = sweep_sectors(points, nodes, sectors)
+    else:
+        parts, neighbors = kmedoids_sectors(distances, nodes, sectors)
+    t_partition = time.perf_counter() - t_start
+
+    workers = workers or min(len(parts), os.cpu_count() or 1)
+    waves = math.ceil(len(parts) / workers)
+    per_sector = max(1.0, (time_limit - t_partition) / waves)
+    tasks = [{"sector": s, "nodes": part, "depot": DEPOT_INDEX, "data_dir": str(data_dir),
+              "drones": drones_per_sector, "battery_cap": battery_cap,
+              "vehicle_fixed_cost": vehicle_fixed_cost, "time_limit": per_sector}
+             for s, part in enumerate(parts)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_solve_sector, tasks))
+    t_solve = time.perf_counter() - t_start - t_partition
+
+    routes, route_sector = [], []
+    for res in results:
+        routes.extend(res["routes"])
+        route_sector.extend([res["sector"]] * len(res["routes"]))
+    before = float(route_lengths(distances, routes).sum())
+
+    t0 = time.perf_counter()
+    routes, moves = repair_boundaries(distances, routes, route_sector, neighbors, battery_cap)
+    t_repair = time.perf_counter() - t0
+
+    lengths = route_lengths(distances, routes)
+    report = {
+        "method": method,
+        "sectors": len(parts),
+        "sector_sizes": [len(p) for p in parts],
+        "workers": workers,
+        "per_sector_time_s": per_sector,
+        "partition_s": t_partition,
+        "solve_s": t_solve,
+        "repair_s": t_repair,
+        "wall_s": time.perf_counter() - t_start,
+        "repair_moves": moves,
+        "distance_before_repair": before,
+        "total_distance": float(lengths.sum()),
+        "max_route_length": float(lengths.max()) if len(lengths) else 0.0,
+        "drones": len(routes),
+    }
+    return routes, report
+
+def print_report(report: Dict) -> None:
+    print(f"[decomp] {report['method']}: {report['sectors']} sectors on {report['workers']} workers "
+          f"({report['per_sector_time_s']:.1f}s each)")
+    print(f"[decomp] partition={report['partition_s']:.2f}s solve={report['solve_s']:.2f}s "
+          f"repair={report['repair_s']:.2f}s wall={report['wall_s']:.2f}s")
+    print(f"[decomp] distance={report['total_distance']:.0f} ft "
+          f"(before repair {report['distance_before_repair']:.0f}, {report['repair_moves']} moves), "
+          f"drones={report['drones']}, longest={report['max_route_length']:.0f} ft")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster-first / route-second VRP solve")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--sectors", type=int, default=8)
+    parser.add_argument("--method", choices=METHODS, default="sweep")
+    parser.add_argument("--time-limit", type=float, default=30, help="wall-clock budget in seconds")
+    parser.add_argument("--battery-cap", type=float, default=MAX_BATTERY_CAP)
+    parser.add_argument("--drones-per-sector", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=str(DATA_DIR / "routes.npy"))
+    args = parser.parse_args()
+
+    routes, report = decompose_and_solve(args.data_dir, args.sectors, args.method, args.time_limit,
+                                         args.battery_cap, args.drones_per_sector, args.workers)
+    print_report(report)
+    save_routes(args.out, routes)
+    print(f"[decomp] saved {len(routes)} routes -> {args.out}")
@@ -1,80 +1,313 @@
 
+import time
+from pathlib import Path
+
 import numpy as np
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
 
+from src.config import DATA_DIR, DEPOT_INDEX, MAX_BATTERY_CAP, VEHICLE_FIXED_COST
+from src.matrix_store import open_matrices
+from src.route_io import config_hash, load_routes, save_routes
+from src.shared_data import load_array
+
+TRANSIT_MODES = ("matrix", "callback")
+UNREACHABLE_COST = 10**9
+
+
+#Integer feet costs as OR-tools wants them (unreachable pairs get a huge cost)
+def quantize_costs(distances):
+    costs = np.asarray(distances, dtype=float)
+    costs = np.where(np.isfinite(costs), np.rint(costs), UNREACHABLE_COST)
+    return np.minimum(costs, UNREACHABLE_COST).astype(np.int64)
+
+#Battery: cumulative flight distance per drone, no slack, capped at battery_cap
+def add_battery_dimension(routing, transit_callback_index, battery_cap):
+    if battery_cap is not None:
+        routing.AddDimension(transit_callback_index, 0, int(battery_cap), True, "Distance")
+
+#Routing model over an integer cost matrix on the native evaluator (no Python in the search loop)
+def build_matrix_model(costs, num_drones, battery_cap=None, vehicle_fixed_cost=0, depot=DEPOT_INDEX):
+    manager = pywrapcp.RoutingIndexManager(len(costs), num_drones, depot)
+    routing = pywrapcp.RoutingModel(manager)
+    transit_callback_index = routing.RegisterTransitMatrix(np.asarray(costs, dtype=np.int64).tolist())
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+    add_battery_dimension(routing, transit_callback_index, battery_cap)
+    if vehicle_fixed_cost:
+        routing.SetFixedCostOfAllVehicles(int(vehicle_fixed_cost))
+    return manager, routing
+
+#Search parameters from enum names, e.g. ("SAVINGS", "GUIDED_LOCAL_SEARCH")
+def make_search_parameters(time_limit, first_solution="PATH_CHEAPEST_ARC",
+                           metaheuristic="GUIDED_LOCAL_SEARCH", log_search=False):
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = getattr(routing_enums_pb2.FirstSolutionStrategy, first_solution)
+    search_parameters.local_search_metaheuristic = (
+    getattr(routing_enums_pb2.LocalSearchMetaheuristic, metaheuristic))
+    search_parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
+    search_parameters.log_search = log_search
+    return search_parameters
+
+#Initial assignment from node routes (depot stripped); None if they do not fit this model
+def read_routes_assignment(routing, manager, routes):
+    routes = [[int(n) for n in r if int(n) != DEPOT_INDEX] for r in routes]
+    routes = [r for r in routes if r]
+    num_nodes = manager.GetNumberOfNodes()
+    if len(routes) > routing.vehicles() or any(n >= num_nodes for r in routes for n in r):
+        return None
+    routes += [[] for _ in range(routing.vehicles() - len(routes))]
+    routes_internal = [[manager.NodeToIndex(n) for n in r] for r in routes]
+    return routing.ReadAssignmentFromRoutes(routes_internal, True)
+
+#Node sequence of every vehicle (depot -> ... -> depot), optionally skipping unused drones
+def extract_routes(routing, manager, solution, drop_empty=False):
+    routes = []
+    for vehicle in range(routing.vehicles()):
+        index = routing.Start(vehicle)
+        route = []
+        while not routing.IsEnd(index):
+            route.append(manager.IndexToNode(index))
+            index = solution.Value(routing.NextVar(index))
+        route.append(manager.IndexToNode(index))
+        if drop_empty and len(route) <= 2:
+            continue
+        routes.append(route)
+    return routes
+
 
 class RouteFinder:
-    def __init__(self, search_time_limit, num_drones):
+    first_solution = "PATH_CHEAPEST_ARC"
+    metaheuristic = "GUIDED_LOCAL_SEARCH"
+
+    def __init__(self, search_time_limit, num_drones, data_dir=DATA_DIR,
+                 battery_cap=MAX_BATTERY_CAP, transit_mode="matrix", vehicle_fixed_cost=0, reduce_assets=False,
+                 candidate_k=None):
+        if transit_mode not in TRANSIT_MODES:
+            raise ValueError(f"transit_mode must be one of {TRANSIT_MODES}, got {transit_mode!r}")
         self.routes = []
         self.search_time_limit = search_time_limit #Time in seconds
         self.num_drones =  num_drones
+        self.data_dir = Path(data_dir)
+        self.battery_cap = battery_cap #Max feet per drone (default MAX_BATTERY_CAP), None disables the battery dimension
+        self.transit_mode = transit_mode
+        self.vehicle_fixed_cost = vehicle_fixed_cost #Cost penalty per drone used
+        self.reduce_assets = reduce_assets #Solve over asset photo rings instead of every node
+        self.supernodes = None
+        self.candidate_k = candidate_k #Successors kept per node (k nearest + depot), None = all arcs
         self.load_assets()
 
+    #Arrays come from the shared-memory daemon when it serves data_dir (src/shared_data.py),
+    #else matrices are memory-mapped read-only (compact .kdm store if converted, else the raw .npy)
     def load_assets(self):
-        self.asset_indexes = np.load("../Data/asset_indexes.npy")
-        self.distance_matrix = np.load("../Data/distance_matrix.npy")
-        self.photo_indexes = np.load("../Data/photo_indexes.npy")
-        self.points_lat_long = np.load("../Data/points_lat_long.npy")
-        self.predecessors = np.load("../Data/predecessors.npy")
-        self.waypoint_indexes = np.load("../Data/waypoint_indexes.npy")
-        self.routes = np.load("../Data/routes.npy")
+        data = self.data_dir
+        self.asset_indexes = load_array("asset_indexes", data)
+        self.distance_matrix, self.predecessors = open_matrices(data)
+        self.photo_indexes = load_array("photo_indexes", data)
+        self.points_lat_long = load_array("points", data)
+        self.waypoint_indexes = load_array("waypoint_indexes", data)
+        routes_path = data / "routes.npy"
+        self.routes = load_routes(routes_path) if routes_path.exists() else []
 
-    #Inits OR-tools and finds the shortest path for X amount of drones starting from inital point
-    def find_initial_route(self):
-        manager = pywrapcp.RoutingIndexManager(len(self.distance_matrix), self.num_drones, 0)
+    #Matrix the model is built on: every node, or one super-node per asset photo ring
+    #(src/supernodes.py) whose costs already include the ring's internal path
+    def transit_matrix(self):
+        if not self.reduce_assets:
+            return self.distance_matrix
+        if self.supernodes is None:
+            from src.route_metrics import index_slice
+            from src.supernodes import build_supernodes
+
+            n = len(self.distance_matrix)
+            self.supernodes = build_supernodes(self.distance_matrix, index_slice(self.photo_indexes, n),
+                                               index_slice(self.asset_indexes, n))
+        return self.supernodes.costs
+
+    #Model routes <-> node routes (identity unless reduce_assets)
+    def to_model_routes(self, routes):
+        return self.supernodes.to_super(routes) if self.reduce_assets else routes
+
+    def from_model_routes(self, routes):
+        return self.supernodes.expand(self.distance_matrix, routes) if self.reduce_assets else routes
+
+    def cost_matrix(self):
+        return quantize_costs(self.transit_matrix())
+
+    #Builds the index manager and routing model with the arc cost and battery dimension
+    #prune=False keeps every successor even with candidate_k (see unpruned_start)
+    def build_model(self, prune=True):
+        if self.transit_mode == "matrix":
+            manager, routing = build_matrix_model(self.cost_matrix(), self.num_drones, self.battery_cap,
+                                                  self.vehicle_fixed_cost)
+            if prune:
+                self.restrict_arcs(routing, manager)
+            return manager, routing
+
+        #Same quantized costs as the matrix path, so both modes solve the same model
+        costs = self.cost_matrix()
+        manager = pywrapcp.RoutingIndexManager(len(costs), self.num_drones, DEPOT_INDEX)
         routing = pywrapcp.RoutingModel(manager)
 
         #Defines how OR-tool checks distances between waypoitns
         def distance_callback(from_index: int, to_index: int):
             from_node = manager.IndexToNode(from_index)
             to_node = manager.IndexToNode(to_index)
-            return int(self.distance_matrix[from_node][to_node])
+            return int(costs[from_node, to_node])
 
-    
         transit_callback_index = routing.RegisterTransitCallback(distance_callback)
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+        add_battery_dimension(routing, transit_callback_index, self.battery_cap)
+        if self.vehicle_fixed_cost:
+            routing.SetFixedCostOfAllVehicles(int(self.vehicle_fixed_cost))
+        if prune:
+            self.restrict_arcs(routing, manager)
+        return manager, routing
+
+    #Sparse candidates: each node may only go to its candidate_k nearest nodes or back to the depot
+    def restrict_arcs(self, routing, manager):
+        if not self.candidate_k:
+            return
+        from src.candidates import neighbor_lists, restrict_successors, route_arcs
+
+        transit = self.transit_matrix()
+        nodes = np.arange(len(transit))
+        neighbors = neighbor_lists(transit, nodes[nodes != DEPOT_INDEX], self.candidate_k)
+        #Arcs of the current routes stay allowed so they can still warm-start the search
+        arcs = restrict_successors(routing, manager, neighbors,
+                                   extra_arcs=route_arcs(self.to_model_routes(self.routes)))
+        print(f"Candidate arcs: k={self.candidate_k}, {arcs} of {len(transit) ** 2}")
+
+    def search_parameters(self):
+        return make_search_parameters(self.search_time_limit, self.first_solution,
+                                      self.metaheuristic, log_search=True)
+
+    #First solution on the unpruned model (from the current routes when they fit), within time_limit.
+    #Its arcs stay candidates, so the pruned model is never infeasible where the full one is not.
+    #Returns (routes, solution, routing, manager); routes is None without a solution.
+    def unpruned_start(self, time_limit):
+        manager, routing = self.build_model(prune=False)
+        params = make_search_parameters(time_limit, self.first_solution, self.metaheuristic)
+        params.solution_limit = 1
+        initial = None
+        if len(self.routes) > 0:
+            initial = read_routes_assignment(routing, manager, self.to_model_routes(self.routes))
+        if initial is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial, params)
+        else:
+            solution = routing.SolveWithParameters(params)
+        if not solution:
+            return None, solution, routing, manager
+        return self.from_model_routes(extract_routes(routing, manager, solution)), solution, routing, manager
+
+    #Inits OR-tools and finds the shortest path for X amount of drones starting from inital point
+    #trace_path: JSONL of improving solutions | checkpoint_path: incumbent routes every checkpoint_every s
+    #min_improvement: stop once the objective improves < this % per minute over stall_window s
+    #With candidate_k, local search on the pruned model starts from unpruned_start, all within
+    #search_time_limit
+    def find_initial_route(self, trace_path=None, checkpoint_path=None, checkpoint_every=10.0,
+                           min_improvement=None, stall_window=60.0):
+        t0 = time.perf_counter()
+        if self.candidate_k:
+            routes, solution, routing, manager = self.unpruned_start(self.search_time_limit)
+            if routes is not None:
+                self.routes = routes
+            remaining = self.search_time_limit - (time.perf_counter() - t0)
+            if routes is None or remaining <= 0:
+                self.getRouteList(routing, manager, solution)
+                return solution, routing
+            print(f"First solution on full successor domains in {time.perf_counter() - t0:.1f}s, "
+                  f"{remaining:.1f}s left for the pruned search")
+        solution, routing, manager = self._solve(trace_path, checkpoint_path, checkpoint_every,
+                                                 min_improvement, stall_window,
+                                                 self.search_time_limit - (time.perf_counter() - t0))
+        self.getRouteList(routing, manager, solution)
+        return solution, routing
 
-        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-        search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
-        search_parameters.local_search_metaheuristic = (
-        routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
-        search_parameters.time_limit.seconds = self.search_time_limit
-        search_parameters.log_search = True
+    def _solve(self, trace_path, checkpoint_path, checkpoint_every, min_improvement, stall_window,
+               time_limit=None):
+        manager, routing = self.build_model()
+        search_parameters = self.search_parameters()
+        time_limit = self.search_time_limit if time_limit is None else time_limit
+        search_parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
 
-        #Start our search from best prev route if already exists
-        if self.routes.size == 0:
-            routes_internal = [[manager.NodeToIndex(n) for n in r] for r in self.routes]
+        #Structured progress replaces the raw OR-tools search log
+        monitor = None
+        if trace_path or checkpoint_path or min_improvement is not None:
+            from src.progress import SolveMonitor
+            search_parameters.log_search = False
+            monitor = SolveMonitor(routing, manager, trace_path, checkpoint_path,
+                                   checkpoint_every, min_improvement, stall_window,
+                                   expand=self.from_model_routes if self.reduce_assets else None)
 
-            initial_solution = routing.ReadAssignmentFromRoutes(routes_internal, True)
+        #Start our search from best prev route if already exists and still fits the model
+        initial_solution = None
+        if len(self.routes) > 0:
+            initial_solution = read_routes_assignment(routing, manager, self.to_model_routes(self.routes))
 
+        if monitor is not None:
+            monitor.attach(time_limit=time_limit, warm_start=initial_solution is not None,
+                           candidate_k=self.candidate_k)
+        if initial_solution is not None:
             solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
 
         #Start search from beginning
         else:
             solution = routing.SolveWithParameters(search_parameters)
-        self.getRouteList(routing, manager, solution)
+        if monitor is not None:
+            monitor.finish(solution)
+        return solution, routing, manager
+
+    #Polish stage: NumPy 2-opt / Or-opt / relocate / swap on the current routes (src/polish.py)
+    def polish_routes(self, time_limit=None):
+        from src.polish import polish_routes
+
+        self.routes, report = polish_routes(self.distance_matrix, self.routes,
+                                            self.battery_cap or MAX_BATTERY_CAP, time_limit=time_limit)
+        print(f"Polish: {report['distance_before']:.0f} -> {report['distance_after']:.0f} ft "
+              f"in {report['wall_s']:.2f}s")
+        self.printMetrics()
+        return report
 
     #Resets the waypoints for all drones and populates it with new shortest routes
     def getRouteList(self, routing, manager, solution) -> None:
         self.routes = [] 
-        for vehicle in range(routing.vehicles()):
-            if solution:
-                print("Total distance:", solution.ObjectiveValue())
-                index = routing.Start(0)
-                route = []
-                while not routing.IsEnd(index):
-                    route.append(manager.IndexToNode(index))
-                    index = solution.Value(routing.NextVar(index))
-                route.append(manager.IndexToNode(index))
-                self.routes.append(route)
-                print("Route:", route)
-
-            else:
-                print("No solution found.")
-    #Exports the best routes into a npy file
-    def exportRoutesNPY(self, filePath):
-        np.save(filePath, np.array(self.routes, dtype=float))
-
-route = RouteFinder(90, 1)
-route.find_initial_route()
-route.exportRoutesNPY("../Data/routes.npy")
\ No newline at end of file
+        if not solution:
+            print("No solution found.")
+            return
+        for route in self.from_model_routes(extract_routes(routing, manager, solution)):
+            self.routes.append(route)
+            print("Route:", route)
+        self.printMetrics(solution.ObjectiveValue())
+
+    #One-line summary of the current routes (lengths from the distance matrix, photo coverage)
+    def printMetrics(self, objective=None) -> None:
+        from src.route_metrics import evaluate, index_slice
+
+        photo_ids = index_slice(self.photo_indexes, len(self.distance_matrix))
+        s = evaluate(self.distance_matrix, self.routes, self.battery_cap or MAX_BATTERY_CAP, photo_ids)["summary"]
+        prefix = f"Objective: {objective} | " if objective is not None else ""
+        print(f"{prefix}drones: {s['drones']} | total: {s['total_ft']:.0f} ft | max: {s['max_ft']:.0f} ft | "
+              f"photos covered: {s['photos_covered']:.1%} ({s['photos_missed']} missed, "
+              f"{s['photos_duplicates']} duplicated)")
+    #Solver settings that produced the routes, hashed into every mission of a .kdr export
+    def config(self):
+        return {"num_drones": self.num_drones, "battery_cap": self.battery_cap,
+                "vehicle_fixed_cost": self.vehicle_fixed_cost, "time_limit": self.search_time_limit,
+                "transit_mode": self.transit_mode, "first_solution": self.first_solution,
+                "metaheuristic": self.metaheuristic, "reduce_assets": self.reduce_assets,
+                "candidate_k": self.candidate_k}
+
+    #Exports the best routes (.npy, or .kdr with per-mission length/drone/config columns)
+    def exportRoutesNPY(self, filePath, check_geofence=True):
+        from src.route_metrics import mission_table, to_csr
+
+        #Refuses to write routes whose flown legs leave the flight polygon
+        if check_geofence and self.routes:
+            from src.geofence import check_export
+            check_export(self.data_dir, self.points_lat_long, self.routes, self.predecessors)
+        lengths = mission_table(self.distance_matrix, *to_csr(self.routes))["length_ft"] if self.routes else None
+        save_routes(filePath, self.routes, length_ft=lengths, config=config_hash(self.config()))
+
+if __name__ == "__main__":
+    #One drone cannot fly the site within MAX_BATTERY_CAP; let the fixed cost pick how many of 40 fly
+    route = RouteFinder(90, 40, vehicle_fixed_cost=VEHICLE_FIXED_COST)
+    route.find_initial_route()
+    route.exportRoutesNPY(DATA_DIR / "routes.npy")
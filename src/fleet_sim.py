@@ -0,0 +1,234 @@
+"""
+KDKR src/fleet_sim.py
+
+Headless fleet simulator: the browser Engine (frontend/sim/src/engine.js with
+kinematics.js / energy.js) ported to NumPy arrays over all drones at once.
+
+Per step, every running drone
+  - advances to its next waypoint once within ARRIVE_M of the current target,
+  - moves min(speed * dt, remaining) metres along the great circle to it,
+  - drains its pack by powerW(v, climb) * dt (same constants as energy.js).
+Unlike the browser engine, a drone stops as FINISHED when it reaches its last
+waypoint, or as DEPLETED when its charge falls to RESERVE_SOC.
+
+Steps run in fixed-dt batches; `run` yields one telemetry frame per batch,
+so callers (CLI, the SSE endpoint in frontend/sim_server.py) see the fleet
+faster than real time.
+
+Usage (from the repo root):
+  python -m src.fleet_sim --dt 1 --batch 60 --speed 12
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import DATA_DIR, OPT_DIR
+
+EARTH_RADIUS_M = 6371000.0
+# energy.js
+P_HOVER_W = 120.0
+K_DRAG = 0.8
+K_CLIMB = 30.0
+PACK_WH = 222.0
+# engine.js
+ARRIVE_M = 2.0
+RESERVE_SOC = 5.0
+
+RUNNING, FINISHED, DEPLETED = 0, 1, 2
+STATE_NAMES = ("RUNNING", "FINISHED", "DEPLETED")
+
+
+# --- Models (vectorized energy.js / kinematics.js) ---------------------
+def power_w(v_mps, climb_mps=0.0):
+    return P_HOVER_W + K_DRAG * np.square(v_mps) + K_CLIMB * np.maximum(0.0, climb_mps)
+
+def update_soc(soc_pct, power_watt, dt_s, pack_wh: float = PACK_WH):
+    drop = power_watt * (dt_s / 3600.0) / pack_wh * 100.0
+    return np.maximum(0.0, soc_pct - drop)
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def bearing_rad(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    y = np.sin(lon2 - lon1) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    return np.arctan2(y, x)
+
+def step_towards(lat, lon, tgt_lat, tgt_lon, dist_m):
+    br = bearing_rad(lat, lon, tgt_lat, tgt_lon)
+    d = dist_m / EARTH_RADIUS_M
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2 = np.arcsin(np.sin(lat1) * np.cos(d) + np.cos(lat1) * np.sin(d) * np.cos(br))
+    lon2 = lon1 + np.arctan2(np.sin(br) * np.sin(d) * np.cos(lat1),
+                             np.cos(d) - np.sin(lat1) * np.sin(lat2))
+    return np.degrees(lat2), np.degrees(lon2)
+
+
+# --- Simulator ---------------------------------------------------------
+class FleetSim:
+    """
+    paths: one (n_k, 3) array of [lat, lon, alt_m] waypoints per drone.
+    All state is kept in flat arrays indexed by drone.
+    """
+
+    def __init__(self, paths: Sequence[np.ndarray], speed_mps: float = 12.0, soc_pct: float = 100.0):
+        paths = [np.asarray(p, dtype=float).reshape(-1, 3) for p in paths]
+        if any(len(p) == 0 for p in paths):
+            raise ValueError("every drone needs at least one waypoint")
+        self.n = len(paths)
+        self.lengths = np.array([len(p) for p in paths], dtype=np.int64)
+        self.offsets = np.r_[0, np.cumsum(self.lengths)[:-1]].astype(np.int64)
+        self.wps = np.concatenate(paths) if paths else np.zeros((0, 3))
+
+        self.speed = np.full(self.n, float(speed_mps))
+        self.idx = np.zeros(self.n, dtype=np.int64)
+        self.lat = self.wps[self.offsets, 0].copy()
+        self.lon = self.wps[self.offsets, 1].copy()
+        self.alt = self.wps[self.offsets, 2].copy()
+        self.soc = np.full(self.n, float(soc_pct))
+        self.dist = np.zeros(self.n)
+        self.energy_wh = np.zeros(self.n)
+        self.state = np.where(self.lengths > 1, RUNNING, FINISHED).astype(np.int8)
+        self.finish_t = np.where(self.state == FINISHED, 0.0, np.nan)
+        self.t = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(np.any(self.state == RUNNING))
+
+    def _target(self, k: np.ndarray):
+        nxt = self.offsets[k] + np.minimum(self.idx[k] + 1, self.lengths[k] - 1)
+        return self.wps[nxt, 0], self.wps[nxt, 1], self.wps[nxt, 2]
+
+    def step(self, dt: float) -> None:
+        """One fixed-dt step of every running drone."""
+        self.t += dt
+        k = np.flatnonzero(self.state == RUNNING)
+        if len(k) == 0:
+            return
+
+        t_lat, t_lon, t_alt = self._target(k)
+        seg = haversine_m(self.lat[k], self.lon[k], t_lat, t_lon)
+
+        # Advance waypoint if close (engine.js), or finish at the last one
+        close = seg < ARRIVE_M
+        last = self.idx[k] >= self.lengths[k] - 2
+        done = close & last
+        adv = close & ~last
+        if adv.any():
+            self.idx[k[adv]] += 1
+            a_lat, a_lon, a_alt = self._target(k[adv])
+            t_lat[adv], t_lon[adv], t_alt[adv] = a_lat, a_lon, a_alt
+            seg[adv] = haversine_m(self.lat[k[adv]], self.lon[k[adv]], a_lat, a_lon)
+        if done.any():
+            self.state[k[done]] = FINISHED
+            self.finish_t[k[done]] = self.t - dt
+            k, t_lat, t_lon, t_alt, seg = k[~done], t_lat[~done], t_lon[~done], t_alt[~done], seg[~done]
+
+        # Move, with altitude following the same fraction of the leg
+        step = np.minimum(self.speed[k] * dt, seg)
+        frac = np.divide(step, seg, out=np.ones_like(seg), where=seg > 0)
+        n_lat, n_lon = step_towards(self.lat[k], self.lon[k], t_lat, t_lon, step)
+        climb = (t_alt - self.alt[k]) * frac
+        self.dist[k] += haversine_m(self.lat[k], self.lon[k], n_lat, n_lon)
+        self.lat[k], self.lon[k] = n_lat, n_lon
+        self.alt[k] += climb
+
+        # Energy
+        p = power_w(self.speed[k], climb / dt)
+        self.energy_wh[k] += p * dt / 3600.0
+        self.soc[k] = update_soc(self.soc[k], p, dt)
+        empty = self.soc[k] <= RESERVE_SOC
+        if empty.any():
+            self.state[k[empty]] = DEPLETED
+            self.finish_t[k[empty]] = self.t
+
+    def frame(self) -> Dict:
+        """Telemetry of the whole fleet as plain lists (JSON-ready), positions in degrees lat/lon."""
+        return {
+            "t": self.t,
+            "lat": self.lat.tolist(),
+            "lon": self.lon.tolist(),
+            "alt": self.alt.tolist(),
+            "soc": np.round(self.soc, 3).tolist(),
+            "wp": self.idx.tolist(),
+            "state": [STATE_NAMES[s] for s in self.state],
+        }
+
+    def run(self, dt: float = 1.0, batch: int = 60, max_t: Optional[float] = None,
+            on_step: Optional[Callable] = None) -> Iterator[Dict]:
+        """
+        Steps in batches of `batch` steps; yields a frame after each batch and at the end.
+        on_step(sim, drones) is called at the start and after every step with the
+        drones that were running before it (e.g. TelemetryRecorder.record).
+        """
+        if on_step is not None:
+            on_step(self, np.arange(self.n))
+        yield self.frame()
+        while self.running and (max_t is None or self.t < max_t):
+            for _ in range(batch):
+                active = np.flatnonzero(self.state == RUNNING)
+                self.step(dt)
+                if on_step is not None:
+                    on_step(self, active)
+                if not self.running:
+                    break
+            yield self.frame()
+
+    def summary(self) -> List[Dict]:
+        return [{
+            "mission": m,
+            "state": STATE_NAMES[self.state[m]],
+            "finish_s": None if np.isnan(self.finish_t[m]) else float(self.finish_t[m]),
+            "soc_pct": float(self.soc[m]),
+            "distance_m": float(self.dist[m]),
+            "energy_wh": float(self.energy_wh[m]),
+            "waypoints": int(self.lengths[m]),
+        } for m in range(self.n)]
+
+
+def load_fleet(data_dir=DATA_DIR, routes_path=None, expand: bool = True, alt_m: float = 50.0,
+               speed_mps: float = 12.0) -> FleetSim:
+    """FleetSim over routes_global.npy, flying the legs expanded through predecessors if available."""
+    from src.path_expansion import load_expander
+    from src.route_io import load_routes
+
+    data_dir = Path(data_dir)
+    points = np.load(data_dir / "points_lat_long.npy")      # columns are (lon, lat)
+    routes = [r for r in load_routes(routes_path or OPT_DIR / "routes_global.npy") if len(r)]
+    expander = load_expander(data_dir) if expand else None
+    if expander is not None:
+        paths = expander.expand_routes(routes)
+        routes = [paths.mission(k) for k in range(len(paths))]
+    return FleetSim([np.c_[points[r, 1], points[r, 0], np.full(len(r), alt_m)] for r in routes], speed_mps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless vectorized fleet simulation of routes_global.npy")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--routes", default=str(OPT_DIR / "routes_global.npy"))
+    parser.add_argument("--dt", type=float, default=1.0, help="seconds of sim time per step")
+    parser.add_argument("--batch", type=int, default=60, help="steps per reported frame")
+    parser.add_argument("--speed", type=float, default=12.0, help="ground speed (m/s)")
+    parser.add_argument("--alt", type=float, default=50.0, help="cruise altitude (m)")
+    parser.add_argument("--no-expand", action="store_true", help="fly straight chords between route nodes")
+    args = parser.parse_args()
+
+    sim = load_fleet(args.data_dir, args.routes, not args.no_expand, args.alt, args.speed)
+    t0 = time.perf_counter()
+    frames = sum(1 for _ in sim.run(args.dt, args.batch))
+    wall = time.perf_counter() - t0
+    print(f"[fleet_sim] {sim.n} drones, {sim.t:.0f}s simulated in {wall:.2f}s wall "
+          f"({sim.t / max(wall, 1e-9):.0f}x real time, {frames} frames)")
+    for s in sim.summary():
+        finish = f"{s['finish_s']:.0f}s" if s["finish_s"] is not None else "-"
+        print(f"[fleet_sim]   mission {s['mission']}: {s['state']:<8} t={finish:>6} soc={s['soc_pct']:5.1f}% "
+              f"dist={s['distance_m']:.0f} m energy={s['energy_wh']:.1f} Wh")
@@ -0,0 +1,206 @@
+"""
+KDKR src/geofence.py
+
+Checks that planned missions stay inside the allowed flight polygon.
+
+`Geofence` loads polygon_lon_lat.wkt once into a prepared geometry plus an
+STRtree over its boundary segments. `check_legs` tests any number of legs in
+bulk with Shapely 2 vectorized predicates:
+  - legs that touch no boundary segment only need a point-in-polygon test
+    of their midpoint,
+  - the rest get the exact `covers` test,
+  - failing legs also get a `crosses` count against the boundary segments.
+
+`validate_routes` runs that over every leg of every mission (optionally the
+flown legs expanded through predecessors) and returns the violating legs
+with their mission and leg indices.
+
+Usage (from the repo root):
+  python -m src.geofence --routes Optimized_Paths/routes_global.npy --expand
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+import shapely
+from shapely import wkt
+from shapely.geometry.polygon import orient
+
+from src.config import DATA_DIR, OPT_DIR
+
+
+# --- Polygon helpers ---------------------------------------------------
+def load_polygon(path) -> shapely.Geometry:
+    with open(path, "r") as f:
+        return wkt.loads(f.read().replace("\n", " ").strip())
+
+def polygon_rings(polygon):
+    """Vertex arrays (closing vertex dropped) of every ring: exteriors CCW, holes CW."""
+    parts = getattr(polygon, "geoms", [polygon])
+    for part in parts:
+        part = orient(part, 1.0)
+        yield np.asarray(part.exterior.coords)[:-1]
+        for hole in part.interiors:
+            yield np.asarray(hole.coords)[:-1]
+
+def boundary_segments(polygon) -> np.ndarray:
+    """(S, 2, 2) array of boundary segments."""
+    segs = [np.stack([ring, np.roll(ring, -1, axis=0)], axis=1) for ring in polygon_rings(polygon)]
+    return np.concatenate(segs)
+
+def boundary_tree(polygon) -> shapely.STRtree:
+    """Prepares the polygon and indexes its boundary segments."""
+    shapely.prepare(polygon)
+    return shapely.STRtree(shapely.linestrings(boundary_segments(polygon)))
+
+def legs_inside(polygon, tree: shapely.STRtree, a: np.ndarray, b: np.ndarray,
+                lines: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Boolean mask: leg a[l] -> b[l] lies inside the (prepared) polygon.
+    Legs touching no boundary segment only need their midpoint tested.
+    """
+    if lines is None:
+        lines = shapely.linestrings(np.stack([a, b], axis=1))
+    touching = np.zeros(len(lines), dtype=bool)
+    touching[tree.query(lines, predicate="intersects")[0]] = True
+
+    inside = np.zeros(len(lines), dtype=bool)
+    mid = (a + b) / 2
+    free = ~touching
+    inside[free] = shapely.contains_xy(polygon, mid[free, 0], mid[free, 1])
+    inside[touching] = shapely.covers(polygon, lines[touching])
+    return inside
+
+
+# --- Validation --------------------------------------------------------
+@dataclass(frozen=True)
+class LegCheck:
+    inside: np.ndarray       # bool, leg fully covered by the polygon
+    crossings: np.ndarray    # int, boundary segments an outside leg properly crosses
+
+    @property
+    def ok(self) -> np.ndarray:
+        return self.inside
+
+
+@dataclass(frozen=True)
+class Violation:
+    mission: int
+    leg: int
+    from_node: int
+    to_node: int
+    crossings: int           # 0: the leg leaves without properly crossing (e.g. fully outside)
+
+
+class GeofenceViolation(ValueError):
+    def __init__(self, violations: List[Violation]):
+        self.violations = violations
+        head = ", ".join(f"mission {v.mission} leg {v.leg} ({v.from_node}->{v.to_node})"
+                         for v in violations[:5])
+        more = f" and {len(violations) - 5} more" if len(violations) > 5 else ""
+        super().__init__(f"{len(violations)} legs leave the flight polygon: {head}{more}")
+
+
+class Geofence:
+    def __init__(self, polygon):
+        self.polygon = polygon
+        self.tree = boundary_tree(polygon)
+
+    @classmethod
+    def from_file(cls, path=DATA_DIR / "polygon_lon_lat.wkt") -> "Geofence":
+        return cls(load_polygon(path))
+
+    def check_legs(self, a: np.ndarray, b: np.ndarray) -> LegCheck:
+        """a, b: (L, 2) leg endpoints in the polygon's coordinates (lon, lat)."""
+        a = np.asarray(a, dtype=float)
+        b = np.asarray(b, dtype=float)
+        lines = shapely.linestrings(np.stack([a, b], axis=1))
+
+        inside = legs_inside(self.polygon, self.tree, a, b, lines)
+
+        # Proper boundary crossings, only for legs that already failed
+        crossings = np.zeros(len(lines), dtype=np.int64)
+        out = np.flatnonzero(~inside)
+        if len(out):
+            pairs = self.tree.query(lines[out], predicate="crosses")
+            crossings[out] = np.bincount(pairs[0], minlength=len(out))
+        return LegCheck(inside, crossings)
+
+    def validate_routes(self, points: np.ndarray, routes: Sequence[Sequence[int]],
+                        expander=None) -> List[Violation]:
+        """
+        Checks every leg of every route (node indices into `points`).
+        With a PathExpander, the expanded flown legs are checked instead and
+        leg indices refer to positions along the expanded path.
+        """
+        if expander is not None:
+            paths = expander.expand_routes(routes)
+            nodes, offsets = paths.nodes, paths.offsets
+        else:
+            seqs = [np.asarray(r, dtype=np.int64).ravel() for r in routes]
+            nodes = np.concatenate(seqs) if seqs else np.zeros(0, dtype=np.int64)
+            offsets = np.r_[0, np.cumsum([len(s) for s in seqs])].astype(np.int64)
+
+        # Leg l goes nodes[l] -> nodes[l + 1], except across mission boundaries
+        if len(nodes) < 2:
+            return []
+        mission = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        same = mission[:-1] == mission[1:]
+        src = nodes[:-1][same]
+        dst = nodes[1:][same]
+        leg_mission = mission[:-1][same]
+        leg_index = (np.arange(len(nodes) - 1) - offsets[mission[:-1]])[same]
+
+        moving = src != dst
+        check = self.check_legs(points[src[moving]], points[dst[moving]])
+        bad = np.flatnonzero(moving)[~check.ok]
+        crossings = check.crossings[~check.ok]
+        return [Violation(int(leg_mission[i]), int(leg_index[i]), int(src[i]), int(dst[i]), int(c))
+                for i, c in zip(bad, crossings)]
+
+
+def check_export(data_dir: Path, points: np.ndarray, routes, predecessors=None) -> None:
+    """Raises GeofenceViolation if any (expanded) leg of `routes` leaves the polygon."""
+    from src.path_expansion import PathExpander
+
+    fence = Geofence.from_file(Path(data_dir) / "polygon_lon_lat.wkt")
+    expander = PathExpander(predecessors) if predecessors is not None else None
+    violations = fence.validate_routes(points, routes, expander)
+    if violations:
+        raise GeofenceViolation(violations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate that mission legs stay inside the flight polygon")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--routes", default=str(OPT_DIR / "routes_global.npy"))
+    parser.add_argument("--expand", action="store_true", help="check legs expanded through predecessors")
+    args = parser.parse_args()
+
+    from src.path_expansion import load_expander
+    from src.route_io import load_routes
+
+    data_dir = Path(args.data_dir)
+    points = np.load(data_dir / "points_lat_long.npy")
+    routes = load_routes(args.routes)
+    expander: Optional[object] = load_expander(data_dir) if args.expand else None
+    if args.expand and expander is None:
+        parser.error("--expand needs predecessors.npy (or predecessors.kdm) in the data dir")
+
+    t0 = time.perf_counter()
+    fence = Geofence.from_file(data_dir / "polygon_lon_lat.wkt")
+    t_load = time.perf_counter() - t0
+    violations = fence.validate_routes(points, routes, expander)
+    t_check = time.perf_counter() - t0 - t_load
+
+    n_legs = sum(max(len(r) - 1, 0) for r in routes)
+    print(f"[geofence] {len(routes)} missions, {n_legs} route legs "
+          f"(load {t_load * 1000:.0f} ms, check {t_check * 1000:.0f} ms)")
+    for v in violations:
+        kind = f"crosses boundary x{v.crossings}" if v.crossings else "outside"
+        print(f"[geofence]   mission {v.mission} leg {v.leg}: {v.from_node} -> {v.to_node} {kind}")
+    print(f"[geofence] {'OK' if not violations else f'{len(violations)} violating legs'}")
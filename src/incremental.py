@@ -0,0 +1,186 @@
+"""
+KDKR src/incremental.py
+
+Incremental re-optimization of an existing plan after waypoint changes.
+
+Given the previous routes and a node diff, the planner
+  1. remaps indices if the dataset was renumbered, then drops removed and
+     moved nodes from their routes,
+  2. inserts added and moved nodes one by one at the cheapest position that
+     keeps the receiving route under the battery cap (all positions of all
+     routes are scored in one vectorized pass; a new depot->v->depot route
+     is opened only when nothing fits),
+  3. re-opens only the touched routes to OR-Tools local search, warm-started
+     from their repaired sequences. Untouched routes are kept as they are.
+
+Diff file (JSON, indices refer to the current distance matrix):
+  {"added": [...], "removed": [...], "moved": [...], "remap": {"old": new, ...}}
+
+Usage (from the repo root):
+  python -m src.incremental --routes Data/routes.npy --diff changes.json --time-limit 10
+  (writes Data/routes_incremental.npy; --out to choose, the input is never overwritten by default)
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.config import DATA_DIR, DEPOT_INDEX, MAX_BATTERY_CAP, VEHICLE_FIXED_COST
+from src.matrix_store import open_matrices
+from src.route_io import load_routes, save_routes
+
+
+def load_diff(path) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {
+        "added": [int(n) for n in raw.get("added", [])],
+        "removed": [int(n) for n in raw.get("removed", [])],
+        "moved": [int(n) for n in raw.get("moved", [])],
+        "remap": {int(k): int(v) for k, v in raw.get("remap", {}).items()},
+    }
+
+def _route_length(distances, route: Sequence[int]) -> float:
+    r = np.asarray(route)
+    return float(np.sum(np.asarray(distances[r[:-1], r[1:]], dtype=float)))
+
+
+# --- Repair ------------------------------------------------------------
+def drop_nodes(routes: List[List[int]], drop: Set[int]) -> Tuple[List[List[int]], Set[int]]:
+    """Removes `drop` from every route; returns (routes, indices of touched routes)."""
+    touched = set()
+    out = []
+    for k, route in enumerate(routes):
+        kept = [n for n in route if n not in drop or n == DEPOT_INDEX]
+        if len(kept) != len(route):
+            touched.add(k)
+        out.append(kept)
+    return out, touched
+
+def cheapest_insertion(distances, routes: List[List[int]], nodes: Sequence[int],
+                       battery_cap: float) -> Tuple[List[List[int]], Set[int]]:
+    """
+    Inserts each node at the globally cheapest feasible position.
+    Returns (routes, indices of routes that received nodes).
+    """
+    routes = [list(r) for r in routes]
+    lengths = np.array([_route_length(distances, r) for r in routes])
+    touched = set()
+
+    for v in nodes:
+        if routes:
+            a = np.concatenate([r[:-1] for r in routes]).astype(np.int64)
+            b = np.concatenate([r[1:] for r in routes]).astype(np.int64)
+            owner = np.repeat(np.arange(len(routes)), [len(r) - 1 for r in routes])
+            pos = np.concatenate([np.arange(1, len(r)) for r in routes])
+            delta = (np.asarray(distances[a, v], dtype=float) + np.asarray(distances[v, b], dtype=float)
+                     - np.asarray(distances[a, b], dtype=float))
+            delta[lengths[owner] + delta > battery_cap] = np.inf
+            best = int(np.argmin(delta))
+        if routes and np.isfinite(delta[best]):
+            k = int(owner[best])
+            routes[k].insert(int(pos[best]), int(v))
+            lengths[k] += delta[best]
+        else:
+            out_and_back = 2 * float(distances[DEPOT_INDEX, v])
+            if out_and_back > battery_cap:
+                raise ValueError(f"node {v} is out of range: {out_and_back:.0f} ft round trip "
+                                 f"> battery cap {battery_cap:.0f} ft")
+            k = len(routes)
+            routes.append([DEPOT_INDEX, int(v), DEPOT_INDEX])
+            lengths = np.r_[lengths, out_and_back]
+        touched.add(k)
+    return routes, touched
+
+
+# --- Local re-optimization --------------------------------------------
+def reoptimize_routes(distances, routes: List[List[int]], time_limit: float,
+                      battery_cap: float, vehicle_fixed_cost: int = VEHICLE_FIXED_COST) -> List[List[int]]:
+    """
+    OR-Tools local search over just the nodes of `routes`, warm-started from
+    them. Returns the input unchanged if the solver cannot improve on it.
+    """
+    from src.find_initial_route import (build_matrix_model, extract_routes, make_search_parameters,
+                                        quantize_costs, read_routes_assignment)
+
+    local = np.unique(np.r_[DEPOT_INDEX, np.concatenate(routes)]).astype(np.int64)
+    to_local = {int(n): i for i, n in enumerate(local)}     # depot stays at 0
+    sub = quantize_costs(np.asarray(distances[np.ix_(local, local)]))
+
+    manager, routing = build_matrix_model(sub, len(routes), battery_cap, vehicle_fixed_cost)
+    initial = read_routes_assignment(routing, manager, [[to_local[int(n)] for n in r] for r in routes])
+    if initial is None:
+        return routes
+    params = make_search_parameters(time_limit)
+    solution = routing.SolveFromAssignmentWithParameters(initial, params)
+    if not solution:
+        return routes
+    return [local[r].tolist() for r in extract_routes(routing, manager, solution, drop_empty=True)]
+
+def apply_diff(distances, routes: Sequence[Sequence[int]], diff: Dict,
+               battery_cap: float = MAX_BATTERY_CAP, time_limit: float = 10,
+               vehicle_fixed_cost: int = VEHICLE_FIXED_COST) -> Tuple[List[List[int]], Dict]:
+    """Repairs `routes` for `diff` and locally re-optimizes the touched routes."""
+    t0 = time.perf_counter()
+    remap = diff.get("remap") or {}
+    routes = [[remap.get(int(n), int(n)) for n in r] for r in routes]
+    before = sum(_route_length(distances, r) for r in routes)
+
+    moved = [n for n in diff.get("moved", []) if n != DEPOT_INDEX]
+    drop = set(diff.get("removed", [])) | set(moved)
+    routes, touched = drop_nodes(routes, drop)
+
+    present = {n for r in routes for n in r}
+    insert = [n for n in list(diff.get("added", [])) + moved if n not in present and n != DEPOT_INDEX]
+    insert = list(dict.fromkeys(insert))
+    routes, received = cheapest_insertion(distances, routes, insert, battery_cap)
+    touched |= received
+    t_repair = time.perf_counter() - t0
+
+    affected = sorted(k for k in touched if len(routes[k]) > 2)
+    untouched = [r for k, r in enumerate(routes) if k not in touched and len(r) > 2]
+    t1 = time.perf_counter()
+    reopened = (reoptimize_routes(distances, [routes[k] for k in affected], time_limit,
+                                  battery_cap, vehicle_fixed_cost) if affected else [])
+    t_search = time.perf_counter() - t1
+
+    routes = untouched + reopened
+    report = {
+        "removed": len(drop),
+        "inserted": len(insert),
+        "routes_reopened": len(affected),
+        "routes_total": len(routes),
+        "distance_before": before,
+        "distance_after": sum(_route_length(distances, r) for r in routes),
+        "repair_s": t_repair,
+        "search_s": t_search,
+        "wall_s": time.perf_counter() - t0,
+    }
+    return routes, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental re-optimization after waypoint changes")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--routes", default=str(DATA_DIR / "routes.npy"))
+    parser.add_argument("--diff", required=True, help="JSON with added/removed/moved/remap")
+    parser.add_argument("--time-limit", type=float, default=10, help="local search seconds for reopened routes")
+    parser.add_argument("--battery-cap", type=float, default=MAX_BATTERY_CAP)
+    parser.add_argument("--out", default=None, help="defaults to <routes>_incremental next to --routes")
+    args = parser.parse_args()
+
+    distances, _ = open_matrices(args.data_dir)
+    routes, report = apply_diff(distances, [r.tolist() for r in load_routes(args.routes)],
+                                load_diff(args.diff), args.battery_cap, args.time_limit)
+    print(f"[incremental] -{report['removed']} +{report['inserted']} nodes, "
+          f"reopened {report['routes_reopened']}/{report['routes_total']} routes")
+    print(f"[incremental] distance {report['distance_before']:.0f} -> {report['distance_after']:.0f} ft "
+          f"(repair {report['repair_s']:.2f}s, search {report['search_s']:.2f}s, wall {report['wall_s']:.2f}s)")
+    routes_path = Path(args.routes)
+    out = args.out or routes_path.with_name(f"{routes_path.stem}_incremental{routes_path.suffix}")
+    save_routes(out, routes)
+    print(f"[incremental] saved {len(routes)} routes -> {out}")
@@ -0,0 +1,302 @@
+"""
+KDKR src/jobs.py
+
+Asynchronous optimization jobs for the simulator server.
+
+`JobManager` accepts solve requests (drones, battery cap, time limit,
+optional node subset, search strategy, optional src/polish.py pass) and
+runs them in a bounded process pool. Each job gets a directory under `jobs_dir`:
+  trace.jsonl   SolveMonitor progress trace (src/progress.py), read for progress
+  cancel        flag file; the worker's search limit polls it and stops
+  routes.kdr    resulting routes (global node indices) with per-mission length
+                and the job spec's config hash (src/route_io.py)
+
+At most `workers` jobs run at once and at most `max_queued` more wait in the
+queue; further submissions raise `JobQueueFull`. Queued jobs are cancelled
+before they start, running ones stop within `poll_every` seconds and keep the
+best solution found so far (saved, but not published). `on_done(job)` is
+called for every job that completes with routes; the server publishes them
+to the mission-view cache.
+
+Workers are spawned, not forked, so the pool is safe to start from a
+threaded web server. They memory-map the matrices themselves; only the
+spec and the routes cross the process boundary.
+"""
+
+import math
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.config import DATA_DIR, DEPOT_INDEX, MAX_BATTERY_CAP, VEHICLE_FIXED_COST
+from src.route_io import config_hash, load_routes, save_routes
+
+JOB_WORKERS = 2
+MAX_QUEUED = 8
+MAX_TIME_LIMIT = 3600.0
+MAX_HISTORY = 200                  # (t, objective) points returned by progress()
+JOBS_DIR = DATA_DIR / "jobs"
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+def _integer(value, name: str) -> int:
+    """int(value), refusing booleans and non-integral numbers instead of truncating them."""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    return int(value)
+
+
+@dataclass(frozen=True)
+class JobSpec:
+    num_drones: int = 40
+    battery_cap: float = MAX_BATTERY_CAP
+    time_limit: float = 30.0
+    nodes: Optional[List[int]] = None           # subset to plan (depot added); None = all nodes
+    vehicle_fixed_cost: int = VEHICLE_FIXED_COST
+    first_solution: str = "PATH_CHEAPEST_ARC"
+    metaheuristic: str = "GUIDED_LOCAL_SEARCH"
+    polish: bool = False                        # src/polish.py pass over the solver's routes
+
+    @classmethod
+    def from_dict(cls, raw: Dict, num_nodes: int) -> "JobSpec":
+        """Validated spec from request JSON; ValueError describes the first problem."""
+        from ortools.constraint_solver import routing_enums_pb2
+
+        if not isinstance(raw, dict):
+            raise ValueError("job spec must be a JSON object")
+        unknown = set(raw) - {f.name for f in fields(cls)}
+        if unknown:
+            raise ValueError(f"unknown fields: {sorted(unknown)}")
+        try:
+            spec = cls(
+                num_drones=_integer(raw.get("num_drones", cls.num_drones), "num_drones"),
+                battery_cap=float(raw.get("battery_cap", cls.battery_cap)),
+                time_limit=float(raw.get("time_limit", cls.time_limit)),
+                nodes=None if raw.get("nodes") is None else sorted({int(n) for n in raw["nodes"]}),
+                vehicle_fixed_cost=_integer(raw.get("vehicle_fixed_cost", cls.vehicle_fixed_cost),
+                                            "vehicle_fixed_cost"),
+                first_solution=str(raw.get("first_solution", cls.first_solution)),
+                metaheuristic=str(raw.get("metaheuristic", cls.metaheuristic)),
+                polish=raw.get("polish", cls.polish),
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"bad field value: {e}") from None
+
+        if not isinstance(spec.polish, bool):
+            raise ValueError("polish must be true or false")
+        if spec.num_drones < 1:
+            raise ValueError("num_drones must be >= 1")
+        if not (math.isfinite(spec.battery_cap) and spec.battery_cap > 0):
+            raise ValueError("battery_cap must be a finite number > 0")
+        if not 0 < spec.time_limit <= MAX_TIME_LIMIT:
+            raise ValueError(f"time_limit must be in (0, {MAX_TIME_LIMIT:g}] seconds")
+        if spec.nodes is not None and (not spec.nodes or spec.nodes[0] < 0 or spec.nodes[-1] >= num_nodes):
+            raise ValueError(f"nodes must be a non-empty list of indices in [0, {num_nodes})")
+        if not hasattr(routing_enums_pb2.FirstSolutionStrategy, spec.first_solution):
+            raise ValueError(f"unknown first_solution {spec.first_solution!r}")
+        if not hasattr(routing_enums_pb2.LocalSearchMetaheuristic, spec.metaheuristic):
+            raise ValueError(f"unknown metaheuristic {spec.metaheuristic!r}")
+        return spec
+
+
+@dataclass
+class Job:
+    id: str
+    spec: JobSpec
+    dir: Path
+    state: str = "queued"
+    submitted: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def trace_path(self) -> Path:
+        return self.dir / "trace.jsonl"
+
+    @property
+    def cancel_path(self) -> Path:
+        return self.dir / "cancel"
+
+    @property
+    def routes_path(self) -> Path:
+        return self.dir / "routes.kdr"
+
+
+# --- Worker ------------------------------------------------------------
+def solve_job(spec: Dict, data_dir: str, job_dir: str) -> Dict:
+    """Runs in a pool process. Solves the (sub-)instance and saves routes.kdr in job_dir."""
+    from src.find_initial_route import (build_matrix_model, extract_routes,
+                                        make_search_parameters, quantize_costs)
+    from src.matrix_store import open_matrices
+    from src.progress import SolveMonitor
+    from src.route_metrics import mission_table, to_csr
+
+    spec = JobSpec(**spec)
+    job_dir = Path(job_dir)
+    cancel_path = job_dir / "cancel"
+    distances, _ = open_matrices(data_dir)
+
+    # Node subset: depot first so it stays the depot of the sub-model
+    if spec.nodes is None:
+        sub = np.arange(len(distances))
+        costs = quantize_costs(distances)
+    else:
+        nodes = np.asarray(spec.nodes, dtype=np.int64)
+        sub = np.r_[DEPOT_INDEX, nodes[nodes != DEPOT_INDEX]]
+        costs = quantize_costs(distances[np.ix_(sub, sub)])
+
+    t0 = time.perf_counter()
+    manager, routing = build_matrix_model(costs, spec.num_drones, spec.battery_cap, spec.vehicle_fixed_cost)
+    params = make_search_parameters(spec.time_limit, spec.first_solution, spec.metaheuristic)
+    monitor = SolveMonitor(routing, manager, job_dir / "trace.jsonl", should_stop=cancel_path.exists)
+    monitor.attach(**{**asdict(spec), "nodes": len(sub), "started": time.time()})
+    solution = routing.SolveWithParameters(params)
+    monitor.finish(solution)
+
+    result = {"solve_s": time.perf_counter() - t0, "cancelled": monitor.cancelled, "routes": None,
+              "objective": None, "drones": None, "total_ft": None}
+    if solution:
+        routes = [sub[np.asarray(r)].tolist() for r in extract_routes(routing, manager, solution, drop_empty=True)]
+        if spec.polish:
+            from src.polish import polish_routes
+            routes, result["polish"] = polish_routes(distances, routes, spec.battery_cap)
+        table = mission_table(distances, *to_csr(routes), spec.battery_cap)
+        save_routes(job_dir / "routes.kdr", routes, length_ft=table["length_ft"],
+                    config=config_hash({k: v for k, v in asdict(spec).items() if k != "nodes"}))
+        result.update(routes=routes, objective=solution.ObjectiveValue(), drones=len(routes),
+                      total_ft=float(table["length_ft"].sum()))
+    return result
+
+
+# --- Manager -----------------------------------------------------------
+class JobManager:
+    def __init__(self, data_dir=DATA_DIR, jobs_dir=JOBS_DIR, workers: int = JOB_WORKERS,
+                 max_queued: int = MAX_QUEUED, on_done: Optional[Callable[[Job], None]] = None):
+        from src.matrix_store import open_matrices
+
+        self.data_dir = Path(data_dir)
+        self.jobs_dir = Path(jobs_dir)
+        self.workers = workers
+        self.max_queued = max_queued
+        self.on_done = on_done
+        self.num_nodes = len(open_matrices(self.data_dir)[0])
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _active(self) -> List[Job]:
+        return [j for j in self._jobs.values() if j.state in ("queued", "running", "cancelling")]
+
+    def submit(self, raw_spec: Dict) -> Job:
+        spec = JobSpec.from_dict(raw_spec, self.num_nodes)
+        with self._lock:
+            if len(self._active()) >= self.workers + self.max_queued:
+                raise JobQueueFull(f"{self.workers} running and {self.max_queued} queued jobs already")
+            job_id = uuid.uuid4().hex[:12]
+            job = Job(job_id, spec, self.jobs_dir / job_id)
+            job.dir.mkdir(parents=True, exist_ok=True)
+            self._jobs[job.id] = job
+            job.future = self._pool.submit(solve_job, asdict(spec), str(self.data_dir), str(job.dir))
+        job.future.add_done_callback(lambda f, job=job: self._finished(job, f))
+        return job
+
+    def _finished(self, job: Job, future: Future) -> None:
+        """Runs on the pool's thread once the worker returns (or the job is cancelled while queued)."""
+        with self._lock:
+            job.finished = time.time()
+            if future.cancelled():
+                job.state = "cancelled"
+                return
+            error = future.exception()
+            if error is not None:
+                job.state, job.error = "failed", f"{type(error).__name__}: {error}"
+                return
+            job.result = future.result()
+            if job.result["cancelled"]:
+                job.state = "cancelled"
+            elif job.result["routes"] is None:
+                job.state, job.error = "failed", "no solution found"
+            else:
+                job.state = "done"
+        if job.state == "done" and self.on_done is not None:
+            try:
+                self.on_done(job)
+            except Exception as e:             # a failed publish must not lose the result
+                job.error = f"publish failed: {type(e).__name__}: {e}"
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def _refresh(self, job: Job) -> None:
+        # The worker writes the trace's start record once it picks the job up
+        if job.state == "queued" and job.trace_path.exists():
+            job.state = "running"
+
+    def status(self, job: Job) -> Dict:
+        self._refresh(job)
+        out = {"id": job.id, "state": job.state, "spec": asdict(job.spec),
+               "submitted": job.submitted, "finished": job.finished, "error": job.error}
+        if job.state == "queued":
+            queued = [j for j in self._jobs.values() if j.state == "queued"]
+            out["queue_position"] = sorted(queued, key=lambda j: j.submitted).index(job)
+        if job.result is not None:
+            out["result"] = {k: v for k, v in job.result.items() if k != "routes"}
+        return out
+
+    def progress(self, job: Job) -> Dict:
+        """
+        Improving solutions so far from the job's trace, plus elapsed time vs the
+        time limit. history is thinned to at most MAX_HISTORY points (first and
+        last always kept).
+        """
+        from src.progress import load_trace
+
+        self._refresh(job)
+        records = load_trace(job.trace_path) if job.trace_path.exists() else []
+        sols = [r for r in records if r["event"] == "solution"]
+        keep = range(len(sols))
+        if len(sols) > MAX_HISTORY:
+            keep = np.unique(np.linspace(0, len(sols) - 1, MAX_HISTORY).round().astype(int))
+        elapsed = records[-1]["t"] if records else 0.0
+        if job.state in ("running", "cancelling") and records:
+            elapsed = max(elapsed, time.time() - records[0]["started"])
+        return {"id": job.id, "state": job.state, "elapsed_s": elapsed,
+                "fraction": min(1.0, elapsed / job.spec.time_limit) if job.state != "done" else 1.0,
+                "solutions": len(sols), "objective": sols[-1]["objective"] if sols else None,
+                "drones": sols[-1]["drones"] if sols else None,
+                "history": [[sols[i]["t"], sols[i]["objective"]] for i in keep]}
+
+    def cancel(self, job: Job) -> Dict:
+        """Drops a queued job, or asks a running one to stop (keeping its best solution)."""
+        with self._lock:
+            active = job.state in ("queued", "running")
+        # Outside the lock: a successful cancel() runs _finished, which takes it
+        if active and not job.future.cancel():
+            with self._lock:
+                if job.state in ("queued", "running"):
+                    job.cancel_path.touch()
+                    job.state = "cancelling"
+        return self.status(job)
+
+    def routes(self, job: Job) -> Optional[List[np.ndarray]]:
+        return load_routes(job.routes_path) if job.routes_path.exists() else None
+
+    def list(self) -> List[Dict]:
+        return [self.status(j) for j in sorted(self._jobs.values(), key=lambda j: j.submitted)]
+
+    def shutdown(self) -> None:
+        for job in self._active():
+            job.cancel_path.touch()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,236 @@
+"""
+KDKR src/lod.py
+
+Level-of-detail pyramid for the web map, addressed by slippy-map z/x/y
+(Web Mercator, 256 px tiles). Every zoom level in [MIN_ZOOM, MAX_ZOOM] is
+built once up front:
+  - points: photo waypoints sorted by tile. A tile holding more than
+    POINT_BUDGET of them is sent as a CELL_PX grid of aggregates
+    (centroid + count) instead of raw points,
+  - polygon: the geofence boundary simplified to half a pixel at that zoom
+    (topology preserving), clipped to the tile on first request,
+  - routes: the mission paths simplified the same way and split into
+    segments, indexed by every tile their bounding box touches. A tile gets
+    the runs of consecutive segments it touches as polylines.
+
+`LodPyramid.tile(z, x, y)` returns one tile as columnar lists, so the payload
+size depends on what is visible and not on the size of the network.
+Coordinates go out as lat/lon.
+
+Usage (from the repo root), to print per-zoom tile counts and payload sizes:
+  python -m src.lod --routes Optimized_Paths/routes_global.npy --expand
+"""
+
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+
+TILE_PX = 256
+MIN_ZOOM = 10
+MAX_ZOOM = 19
+POINT_BUDGET = 256          # raw points per tile before switching to aggregates
+CELL_PX = 32                # aggregate cell size (8x8 cells per tile)
+CELLS = TILE_PX // CELL_PX
+
+
+# --- Tile math ---------------------------------------------------------
+def lonlat_to_tile(lon, lat, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Fractional Web Mercator tile coordinates of (lon, lat) at zoom z."""
+    n = 2.0 ** z
+    lat = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    fx = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * n
+    fy = (1.0 - np.arcsinh(np.tan(lat)) / math.pi) / 2.0 * n
+    return fx, fy
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(lon_min, lat_min, lon_max, lat_max) of a tile."""
+    n = 2.0 ** z
+    lat = lambda ty: math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+def pixel_degrees(z: int) -> float:
+    """Longitude degrees per screen pixel at zoom z (an upper bound for latitude too)."""
+    return 360.0 / (TILE_PX * 2 ** z)
+
+def coord_digits(z: int) -> int:
+    """Decimal places that resolve a tenth of a pixel at zoom z."""
+    return max(0, math.ceil(-math.log10(pixel_degrees(z) / 10)))
+
+def _csr_by_key(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique sorted keys and their [start, end) offsets in the sorted order."""
+    uniq, starts = np.unique(keys, return_index=True)
+    return uniq, np.r_[starts, len(keys)]
+
+def _lookup(uniq: np.ndarray, offsets: np.ndarray, key: int) -> Tuple[int, int]:
+    i = np.searchsorted(uniq, key)
+    if i < len(uniq) and uniq[i] == key:
+        return int(offsets[i]), int(offsets[i + 1])
+    return 0, 0
+
+
+# --- One zoom level ----------------------------------------------------
+class _Level:
+    def __init__(self, z: int, lonlat: np.ndarray, ids: np.ndarray, boundary,
+                 paths: Sequence[np.ndarray], simplify: bool = True):
+        self.z = z
+        self.digits = coord_digits(z)
+        n = 1 << z
+        tol = pixel_degrees(z) / 2 if simplify else 0.0
+
+        # Points: raw, sorted by tile key
+        fx, fy = lonlat_to_tile(lonlat[:, 0], lonlat[:, 1], z)
+        tx, ty = fx.astype(np.int64), fy.astype(np.int64)
+        keys = tx * n + ty
+        order = np.argsort(keys, kind="stable")
+        self.pt_lonlat, self.pt_ids = lonlat[order], ids[order]
+        self.pt_keys, self.pt_offsets = _csr_by_key(keys[order])
+
+        # Points: CELL_PX aggregates, also sorted by tile key
+        cx = np.minimum(((fx - tx) * CELLS).astype(np.int64), CELLS - 1)
+        cy = np.minimum(((fy - ty) * CELLS).astype(np.int64), CELLS - 1)
+        cell_keys, inverse = np.unique(keys * CELLS * CELLS + cy * CELLS + cx, return_inverse=True)
+        counts = np.bincount(inverse)
+        self.agg_lonlat = np.c_[np.bincount(inverse, lonlat[:, 0]), np.bincount(inverse, lonlat[:, 1])] / counts[:, None]
+        self.agg_counts = counts
+        self.agg_keys, self.agg_offsets = _csr_by_key(cell_keys // (CELLS * CELLS))
+
+        # Polygon boundary, clipped per tile on demand
+        self.boundary = None
+        if boundary is not None:
+            self.boundary = shapely.simplify(boundary, tol, preserve_topology=True) if tol else boundary
+            shapely.prepare(self.boundary)
+        self._clipped: Dict[int, List] = {}
+
+        # Route segments, indexed by every tile of their bounding box
+        segs, missions = [], []
+        for m, coords in enumerate(paths):
+            if len(coords) < 2:
+                continue
+            if tol:
+                coords = shapely.get_coordinates(shapely.simplify(shapely.linestrings(coords), tol))
+            segs.append(np.c_[coords[:-1], coords[1:]])
+            missions.append(np.full(len(coords) - 1, m + 1, dtype=np.int32))     # 1-based like mission_view
+        segs = np.concatenate(segs) if segs else np.empty((0, 4))
+        missions = np.concatenate(missions) if missions else np.empty(0, dtype=np.int32)
+        ax, ay = lonlat_to_tile(segs[:, 0], segs[:, 1], z)
+        bx, by = lonlat_to_tile(segs[:, 2], segs[:, 3], z)
+        x0, x1 = np.minimum(ax, bx).astype(np.int64), np.maximum(ax, bx).astype(np.int64)
+        y0, y1 = np.minimum(ay, by).astype(np.int64), np.maximum(ay, by).astype(np.int64)
+        nx, per_seg = x1 - x0 + 1, (x1 - x0 + 1) * (y1 - y0 + 1)
+        seg_of = np.repeat(np.arange(len(segs)), per_seg)
+        local = np.arange(len(seg_of)) - np.repeat(np.cumsum(per_seg) - per_seg, per_seg)
+        seg_keys = (x0[seg_of] + local % nx[seg_of]) * n + (y0[seg_of] + local // nx[seg_of])
+        order = np.argsort(seg_keys, kind="stable")
+        self.seg_index = seg_of[order]
+        self.seg_keys, self.seg_offsets = _csr_by_key(seg_keys[order])
+        self.segs, self.seg_missions = segs, missions
+
+    def points(self, key: int) -> Dict:
+        lo, hi = _lookup(self.pt_keys, self.pt_offsets, key)
+        if hi - lo <= POINT_BUDGET:
+            ll = self.pt_lonlat[lo:hi].round(self.digits)
+            return {"mode": "raw", "id": self.pt_ids[lo:hi].tolist(),
+                    "lat": ll[:, 1].tolist(), "lon": ll[:, 0].tolist()}
+        lo, hi = _lookup(self.agg_keys, self.agg_offsets, key)
+        ll = self.agg_lonlat[lo:hi].round(self.digits)
+        return {"mode": "grid", "lat": ll[:, 1].tolist(), "lon": ll[:, 0].tolist(),
+                "count": self.agg_counts[lo:hi].tolist()}
+
+    def polygon(self, key: int, bounds) -> List:
+        """Boundary polylines inside the tile, [[[lat, lon], ...], ...]."""
+        if self.boundary is None:
+            return []
+        hit = self._clipped.get(key)
+        if hit is None:
+            clipped = shapely.clip_by_rect(self.boundary, *bounds)
+            lines = shapely.get_parts(shapely.line_merge(clipped)) if not clipped.is_empty else []
+            hit = [np.asarray(line.coords)[:, ::-1].round(self.digits).tolist() for line in lines
+                   if line.geom_type == "LineString"]
+            self._clipped[key] = hit
+        return hit
+
+    def routes(self, key: int) -> Dict:
+        """Route pieces inside the tile: runs of consecutive segments joined into polylines."""
+        lo, hi = _lookup(self.seg_keys, self.seg_offsets, key)
+        idx = np.sort(self.seg_index[lo:hi])
+        breaks = np.flatnonzero((np.diff(idx) != 1) | (np.diff(self.seg_missions[idx]) != 0)) + 1
+        segs = self.segs[:, [1, 0, 3, 2]].round(self.digits)      # lat0, lon0, lat1, lon1
+        missions, lines = [], []
+        for run in np.split(idx, breaks) if len(idx) else []:
+            missions.append(int(self.seg_missions[run[0]]))
+            lines.append(np.r_[segs[run, :2], segs[run[-1:], 2:]].tolist())
+        return {"mission": missions, "path": lines}
+
+
+# --- Pyramid -----------------------------------------------------------
+class LodPyramid:
+    def __init__(self, lonlat: np.ndarray, ids: Optional[np.ndarray] = None, polygon=None,
+                 paths: Sequence[np.ndarray] = (), zooms: Sequence[int] = range(MIN_ZOOM, MAX_ZOOM + 1)):
+        """
+        lonlat: (N, 2) photo waypoints as (lon, lat); ids: their point indices
+        polygon: shapely geometry of the flight area; paths: (L_k, 2) lon/lat per mission
+        """
+        lonlat = np.asarray(lonlat, dtype=float)[:, :2]
+        ids = np.arange(len(lonlat)) if ids is None else np.asarray(ids)
+        boundary = polygon.boundary if polygon is not None else None
+        paths = [np.asarray(p, dtype=float)[:, :2] for p in paths]
+        self.zooms = list(zooms)
+        self.levels = {z: _Level(z, lonlat, ids, boundary, paths, simplify=z < self.zooms[-1])
+                       for z in self.zooms}
+
+    def tile(self, z: int, x: int, y: int) -> Optional[Dict]:
+        """One tile as {"z", "x", "y", "points", "polygon", "routes"}, or None if z is not built."""
+        level = self.levels.get(z)
+        if level is None or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+            return None
+        key = x * (1 << z) + y
+        return {"z": z, "x": x, "y": y, "points": level.points(key),
+                "polygon": level.polygon(key, tile_bounds(z, x, y)), "routes": level.routes(key)}
+
+    def covering_tiles(self, z: int) -> List[Tuple[int, int]]:
+        """(x, y) of every tile at zoom z with points or route segments."""
+        level = self.levels[z]
+        n = 1 << z
+        keys = np.union1d(level.pt_keys, level.seg_keys)
+        return list(zip((keys // n).tolist(), (keys % n).tolist()))
+
+
+if __name__ == "__main__":
+    from src.config import DATA_DIR, OPT_DIR
+    from src.geofence import load_polygon
+    from src.route_io import load_routes
+    from src.route_metrics import index_slice
+
+    parser = argparse.ArgumentParser(description="Build the map LOD pyramid and report tile payload sizes")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--routes", default=str(OPT_DIR / "routes_global.npy"))
+    parser.add_argument("--expand", action="store_true", help="index the flown paths expanded through predecessors")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    points = np.load(data_dir / "points_lat_long.npy")[:, :2]
+    photo_ids = index_slice(np.load(data_dir / "photo_indexes.npy"), len(points))
+    routes = load_routes(args.routes)
+    if args.expand:
+        from src.path_expansion import load_expander
+        expander = load_expander(data_dir)
+        if expander is not None:
+            expanded = expander.expand_routes(routes)
+            routes = [expanded.mission(k) for k in range(len(expanded))]
+
+    t0 = time.perf_counter()
+    pyramid = LodPyramid(points[photo_ids], photo_ids, load_polygon(data_dir / "polygon_lon_lat.wkt"),
+                         [points[r] for r in routes])
+    print(f"[lod] built zooms {pyramid.zooms[0]}-{pyramid.zooms[-1]} in {time.perf_counter() - t0:.2f}s")
+
+    for z in pyramid.zooms:
+        tiles = pyramid.covering_tiles(z)
+        sizes = [len(json.dumps(pyramid.tile(z, x, y), separators=(",", ":"))) for x, y in tiles]
+        print(f"[lod] z{z:<2} {len(tiles):5d} tiles  max {max(sizes) / 1024:7.1f} KB  "
+              f"mean {np.mean(sizes) / 1024:6.1f} KB")
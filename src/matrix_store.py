@@ -0,0 +1,265 @@
+"""
+KDKR src/matrix_store.py
+
+Compact on-disk store for the N x N distance and predecessor matrices.
+
+The supplied `distance_matrix.npy` / `predecessors.npy` are dense float64 /
+int32 arrays. `convert_data_dir` rewrites them once into `.kdm` files:
+  - distances as int32 feet (unreachable pairs -> UNREACHABLE)
+  - predecessors in the smallest signed int dtype that fits
+  - a fixed 64 byte header with N, dtype, tile size and a CRC32 of the payload
+  - optional square tiling so a block of neighbouring nodes is contiguous
+
+`open_matrix` / `open_matrices` map the files read-only with `np.memmap`, so
+opening is O(1) and only the pages that are actually touched get read.
+"""
+
+import argparse
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Tuple, Union
+
+import numpy as np
+
+from src.config import DATA_DIR
+
+MAGIC = b"KDKRMTX\0"
+VERSION = 1
+HEADER_FMT = "<8sI8sQIIq"     # magic, version, dtype, n, tile, crc32, sentinel
+HEADER_SIZE = 64
+UNREACHABLE = np.iinfo(np.int32).max
+PRED_NONE = -9999              # scipy.sparse.csgraph "no predecessor"
+
+DISTANCE_FILE = "distance_matrix.kdm"
+PREDECESSORS_FILE = "predecessors.kdm"
+CHUNK_ROWS = 1024
+
+
+@dataclass(frozen=True)
+class MatrixHeader:
+    dtype: np.dtype
+    n: int
+    tile: int
+    crc32: int
+    sentinel: int
+
+    @property
+    def padded(self) -> int:
+        """Side length of the stored payload (N rounded up to the tile size)."""
+        if not self.tile:
+            return self.n
+        return -(-self.n // self.tile) * self.tile
+
+
+class TiledMatrix:
+    """
+    Read-only N x N view over a tiled payload of shape (nt, nt, T, T).
+    Supports m[i, j] with scalars or index arrays, m[i] (one row) and len(m).
+    """
+
+    def __init__(self, tiles: np.ndarray, n: int):
+        self._tiles = tiles
+        self._tile = tiles.shape[2]
+        self.n = n
+        self.shape = (n, n)
+        self.dtype = tiles.dtype
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, key):
+        t = self._tile
+        if isinstance(key, tuple):
+            i, j = key
+            i = np.asarray(i)
+            j = np.asarray(j)
+            return self._tiles[i // t, j // t, i % t, j % t]
+        i = int(key)
+        return self._tiles[i // t, :, i % t, :].reshape(-1)[: self.n]
+
+    def rows(self, idx) -> np.ndarray:
+        """Dense (len(idx), N) copy of the requested rows."""
+        return np.stack([self[i] for i in np.asarray(idx).ravel()])
+
+    def __array__(self, dtype=None, copy=None):
+        t = self._tile
+        nt = self._tiles.shape[0]
+        full = self._tiles.transpose(0, 2, 1, 3).reshape(nt * t, nt * t)[: self.n, : self.n]
+        return np.asarray(full, dtype=dtype)
+
+
+# --- Header ------------------------------------------------------------
+def _pack_header(dtype: np.dtype, n: int, tile: int, crc: int, sentinel: int) -> bytes:
+    raw = struct.pack(HEADER_FMT, MAGIC, VERSION, dtype.str.encode("ascii"),
+                      n, tile, crc, sentinel)
+    return raw.ljust(HEADER_SIZE, b"\0")
+
+def read_header(path: Union[str, Path]) -> MatrixHeader:
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path} is too short to be a matrix store file")
+    magic, version, dtype, n, tile, crc, sentinel = struct.unpack_from(HEADER_FMT, raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a matrix store file (bad magic)")
+    if version != VERSION:
+        raise ValueError(f"{path} has unsupported version {version}")
+    return MatrixHeader(np.dtype(dtype.rstrip(b"\0").decode("ascii")), n, tile, crc, sentinel)
+
+
+# --- Conversion --------------------------------------------------------
+def _int_dtype_for(lo: int, hi: int) -> np.dtype:
+    """Smallest signed int dtype holding [lo, hi]."""
+    for dt in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dt)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(dt)
+    raise ValueError(f"range [{lo}, {hi}] does not fit in int64")
+
+def _quantize_distances(block: np.ndarray) -> np.ndarray:
+    out = np.rint(np.where(np.isfinite(block), block, UNREACHABLE))
+    return np.clip(out, 0, UNREACHABLE).astype(np.int32)
+
+def _predecessor_range(src: np.ndarray) -> Tuple[int, int]:
+    lo, hi = 0, 0
+    for start in range(0, src.shape[0], CHUNK_ROWS):
+        block = src[start:start + CHUNK_ROWS]
+        lo = min(lo, int(block.min()))
+        hi = max(hi, int(block.max()))
+    return lo, hi
+
+def write_matrix(src: np.ndarray, path: Union[str, Path], dtype: np.dtype,
+                 tile: int = 0, sentinel: int = 0, transform=None) -> MatrixHeader:
+    """
+    Streams `src` (any (N, N) array, typically an np.load mmap) into a store
+    file, CHUNK_ROWS rows at a time so the source is never fully resident.
+    """
+    dtype = np.dtype(dtype)
+    n = int(src.shape[0])
+    if src.ndim != 2 or src.shape[1] != n:
+        raise ValueError(f"expected a square matrix, got shape {src.shape}")
+    if tile < 0:
+        raise ValueError("tile must be >= 0")
+
+    header = MatrixHeader(dtype, n, tile, 0, sentinel)
+    side = header.padded
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_pack_header(dtype, n, tile, 0, sentinel))
+        f.truncate(HEADER_SIZE + side * side * dtype.itemsize)
+
+    shape = (side // tile, side // tile, tile, tile) if tile else (n, n)
+    out = np.memmap(tmp, dtype=dtype, mode="r+", offset=HEADER_SIZE, shape=shape)
+    step = tile or CHUNK_ROWS
+    crc = 0
+    for start in range(0, n, step):
+        block = np.asarray(src[start:start + step])
+        if transform is not None:
+            block = transform(block)
+        block = block.astype(dtype, copy=False)
+        if tile:
+            padded = np.full((tile, side), sentinel, dtype=dtype)
+            padded[: block.shape[0], :n] = block
+            out[start // tile] = padded.reshape(tile, side // tile, tile).transpose(1, 0, 2)
+            crc = zlib.crc32(np.ascontiguousarray(out[start // tile]), crc)
+        else:
+            out[start:start + block.shape[0]] = block
+            crc = zlib.crc32(np.ascontiguousarray(block), crc)
+    out.flush()
+    del out
+
+    with open(tmp, "r+b") as f:
+        f.write(_pack_header(dtype, n, tile, crc, sentinel))
+    tmp.replace(path)
+    return MatrixHeader(dtype, n, tile, crc, sentinel)
+
+def convert_distances(src_path: Union[str, Path], dst_path: Union[str, Path], tile: int = 0) -> MatrixHeader:
+    src = np.load(str(src_path), mmap_mode="r")
+    return write_matrix(src, dst_path, np.int32, tile=tile,
+                        sentinel=UNREACHABLE, transform=_quantize_distances)
+
+def convert_predecessors(src_path: Union[str, Path], dst_path: Union[str, Path], tile: int = 0) -> MatrixHeader:
+    src = np.load(str(src_path), mmap_mode="r")
+    lo, hi = _predecessor_range(src)
+    dtype = _int_dtype_for(min(lo, PRED_NONE), hi)
+    return write_matrix(src, dst_path, dtype, tile=tile, sentinel=PRED_NONE)
+
+def convert_data_dir(data_dir: Union[str, Path] = DATA_DIR, tile: int = 0) -> None:
+    """Converts distance_matrix.npy / predecessors.npy in `data_dir` to .kdm files."""
+    data_dir = Path(data_dir)
+    h = convert_distances(data_dir / "distance_matrix.npy", data_dir / DISTANCE_FILE, tile)
+    print(f"[store] {DISTANCE_FILE}: N={h.n} dtype={h.dtype} tile={h.tile} crc32={h.crc32:08x}")
+    h = convert_predecessors(data_dir / "predecessors.npy", data_dir / PREDECESSORS_FILE, tile)
+    print(f"[store] {PREDECESSORS_FILE}: N={h.n} dtype={h.dtype} tile={h.tile} crc32={h.crc32:08x}")
+
+
+# --- Reading -----------------------------------------------------------
+def verify(path: Union[str, Path]) -> bool:
+    """Recomputes the payload CRC32 and compares it with the header."""
+    header = read_header(path)
+    crc = 0
+    with open(path, "rb") as f:
+        f.seek(HEADER_SIZE)
+        while True:
+            buf = f.read(1 << 24)
+            if not buf:
+                break
+            crc = zlib.crc32(buf, crc)
+    return crc == header.crc32
+
+def open_matrix(path: Union[str, Path], check: bool = False):
+    """
+    Maps a store file read-only. Returns an (N, N) np.memmap for untiled
+    files and a TiledMatrix for tiled ones; both support m[i, j] indexing.
+    """
+    header = read_header(path)
+    if check and not verify(path):
+        raise ValueError(f"{path} failed its checksum")
+    side = header.padded
+    if header.tile:
+        t = header.tile
+        tiles = np.memmap(str(path), dtype=header.dtype, mode="r", offset=HEADER_SIZE,
+                          shape=(side // t, side // t, t, t))
+        return TiledMatrix(tiles, header.n)
+    return np.memmap(str(path), dtype=header.dtype, mode="r", offset=HEADER_SIZE,
+                     shape=(header.n, header.n))
+
+def open_matrices(data_dir: Union[str, Path] = DATA_DIR, check: bool = False, shared: bool = True):
+    """
+    Returns (distance_matrix, predecessors) as read-only zero-copy views.
+    Uses the shared-memory copy when src/shared_data.py serves data_dir, else
+    prefers the .kdm store and falls back to memory-mapping the raw .npy files.
+    """
+    data_dir = Path(data_dir)
+    if shared and not check:
+        from src.shared_data import attach
+        world = attach(data_dir)
+        if world is not None and "distances" in world:
+            return world.arrays["distances"], world.arrays["predecessors"]
+    out = []
+    for store_name, npy_name in ((DISTANCE_FILE, "distance_matrix.npy"),
+                                 (PREDECESSORS_FILE, "predecessors.npy")):
+        store_path = data_dir / store_name
+        if store_path.exists():
+            out.append(open_matrix(store_path, check=check))
+        else:
+            out.append(np.load(str(data_dir / npy_name), mmap_mode="r"))
+    return tuple(out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the distance/predecessor matrices to the compact store")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--tile", type=int, default=0, help="square tile size (0 = row-major)")
+    parser.add_argument("--verify", action="store_true", help="only check the existing store checksums")
+    args = parser.parse_args()
+
+    if args.verify:
+        for name in (DISTANCE_FILE, PREDECESSORS_FILE):
+            path = Path(args.data_dir) / name
+            print(f"[store] {name}: {'ok' if verify(path) else 'CHECKSUM MISMATCH'}")
+    else:
+        convert_data_dir(args.data_dir, tile=args.tile)
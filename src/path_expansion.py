@@ -0,0 +1,161 @@
+"""
+KDKR src/path_expansion.py
+
+Expands optimizer legs (i -> j) into the waypoint sequence actually flown,
+using predecessors.npy with scipy.sparse.csgraph.dijkstra conventions:
+predecessors[i, j] is the node before j on the shortest path from i.
+
+  - `expand_legs` walks the predecessor chains of many legs at once: each
+    step is one fancy-indexed gather over all still-active legs.
+  - `PathExpander` keeps an LRU cache of expanded legs shared across
+    missions and returns every mission as one flat CSR-style array.
+
+Example:
+  expander = load_expander()
+  paths = expander.expand_routes(routes)      # ExpandedPaths
+  flown = paths.mission(3)                    # node indices of mission 3
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import DATA_DIR
+from src.matrix_store import open_matrices
+
+DEFAULT_CACHE_SIZE = 1 << 16
+
+
+@dataclass(frozen=True)
+class ExpandedPaths:
+    """Flat node array; mission k is nodes[offsets[k]:offsets[k + 1]]."""
+    nodes: np.ndarray
+    offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def mission(self, k: int) -> np.ndarray:
+        return self.nodes[self.offsets[k]:self.offsets[k + 1]]
+
+
+def _gather_csr(nodes: np.ndarray, offsets: np.ndarray, ids: np.ndarray, skip_first: bool = False) -> np.ndarray:
+    """Concatenates CSR rows `ids` (optionally without their first element) in one gather."""
+    starts = offsets[ids] + (1 if skip_first else 0)
+    lengths = offsets[ids + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return nodes[:0]
+    shift = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return nodes[np.arange(total) + shift]
+
+def expand_legs(predecessors, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Expands legs src[l] -> dst[l] together. Returns (nodes, offsets) where
+    leg l is nodes[offsets[l]:offsets[l + 1]], both endpoints included.
+    Raises ValueError if some dst is unreachable from its src.
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    cur = dst.copy()
+    active = cur != src
+    hops = np.zeros(len(src), dtype=np.int64)
+    chain = [cur.copy()]
+
+    while active.any():
+        step = np.asarray(predecessors[src[active], cur[active]], dtype=np.int64)
+        if np.any(step < 0):
+            bad = np.flatnonzero(active)[step < 0][0]
+            raise ValueError(f"node {dst[bad]} is unreachable from {src[bad]} in predecessors")
+        cur[active] = step
+        hops[active] += 1
+        chain.append(cur.copy())
+        active &= cur != src
+
+    # chain[k, l] is the k-th node walking back from dst[l]; lay legs out src -> dst
+    chain = np.stack(chain)
+    offsets = np.r_[0, np.cumsum(hops + 1)]
+    leg, k = np.nonzero(np.arange(len(chain))[None, :] <= hops[:, None])
+    nodes = np.empty(offsets[-1], dtype=np.int64)
+    nodes[offsets[leg] + hops[leg] - k] = chain[k, leg]
+    return nodes, offsets
+
+
+class PathExpander:
+    """Batched leg expansion with an LRU cache of legs shared across calls."""
+
+    def __init__(self, predecessors, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.predecessors = predecessors
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[int, int], np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, legs: np.ndarray) -> Dict[Tuple[int, int], np.ndarray]:
+        found, missing = {}, []
+        for i, j in map(tuple, legs.tolist()):
+            seq = self._cache.get((i, j))
+            if seq is None:
+                missing.append((i, j))
+            else:
+                self._cache.move_to_end((i, j))
+                found[(i, j)] = seq
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        if missing:
+            arr = np.array(missing, dtype=np.int64)
+            nodes, offsets = expand_legs(self.predecessors, arr[:, 0], arr[:, 1])
+            for n, key in enumerate(missing):
+                seq = nodes[offsets[n]:offsets[n + 1]]
+                found[key] = seq
+                self._cache[key] = seq
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return found
+
+    def expand_routes(self, routes: Sequence[Sequence[int]]) -> ExpandedPaths:
+        """Expands every leg of every route; returns one CSR array of flown paths."""
+        routes = [np.asarray(r, dtype=np.int64).ravel() for r in routes]
+        if not routes:
+            return ExpandedPaths(np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64))
+
+        n_legs = np.array([max(len(r) - 1, 0) for r in routes])
+        src = np.concatenate([r[:-1] for r in routes]) if n_legs.sum() else np.zeros(0, dtype=np.int64)
+        dst = np.concatenate([r[1:] for r in routes]) if n_legs.sum() else np.zeros(0, dtype=np.int64)
+
+        # Unique legs -> one CSR block, then one gather for all missions
+        pairs = np.stack([src, dst], axis=1)
+        unique, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        found = self._lookup(unique)
+        seqs = [found[(int(i), int(j))] for i, j in unique]
+        leg_nodes = np.concatenate(seqs) if seqs else np.zeros(0, dtype=np.int64)
+        leg_offsets = np.r_[0, np.cumsum([len(s) for s in seqs])].astype(np.int64)
+
+        body = _gather_csr(leg_nodes, leg_offsets, inverse.ravel(), skip_first=True)
+        body_len = leg_offsets[1:] - leg_offsets[:-1] - 1
+        mission_of_leg = np.repeat(np.arange(len(routes)), n_legs)
+        per_mission = np.bincount(mission_of_leg, weights=body_len[inverse.ravel()],
+                                  minlength=len(routes)).astype(np.int64)
+
+        # Each mission is its first node followed by the legs' bodies
+        lengths = per_mission + np.array([1 if len(r) else 0 for r in routes])
+        offsets = np.r_[0, np.cumsum(lengths)].astype(np.int64)
+        nodes = np.empty(offsets[-1], dtype=np.int64)
+        first = offsets[:-1][lengths > 0]
+        nodes[first] = [r[0] for r in routes if len(r)]
+        body_mask = np.ones(len(nodes), dtype=bool)
+        body_mask[first] = False
+        nodes[body_mask] = body
+        return ExpandedPaths(nodes, offsets)
+
+
+def load_expander(data_dir=DATA_DIR, cache_size: int = DEFAULT_CACHE_SIZE) -> Optional[PathExpander]:
+    """PathExpander over the memory-mapped predecessors, or None if they are not available."""
+    try:
+        _, predecessors = open_matrices(data_dir)
+    except FileNotFoundError:
+        return None
+    return PathExpander(predecessors, cache_size)
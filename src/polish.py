@@ -0,0 +1,348 @@
+"""
+KDKR src/polish.py
+
+Fast route improvement without OR-Tools, for what-if edits and as a polish
+stage after any solve.
+
+`polish_routes` takes depot -> ... -> depot routes and the distance matrix and
+runs to a local optimum of:
+  - intra-route 2-opt (segment reversal) and Or-opt (move a run of 1..3 nodes,
+    optionally reversed, elsewhere in the same route),
+  - inter-route relocate (move a node next to one of its nearest neighbours in
+    another route) and swap (exchange two neighbouring nodes of two routes),
+all under the battery cap. Both kinds only consider each node's `neighbors`
+nearest nodes. Intra-route moves run first improvement with don't-look bits
+(a node is rescored only after an edge next to it changed); inter-route moves
+score every node in one pass, then apply the best non-conflicting moves (each
+route changes at most once per round) and rescore. Works with
+asymmetric matrices; unreachable pairs are never chosen.
+
+Usage (from the repo root):
+  python -m src.polish --routes Data/routes.npy --out Data/routes_polished.npy
+"""
+
+import argparse
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.candidates import neighbor_lists
+from src.config import DATA_DIR, DEPOT_INDEX, MAX_BATTERY_CAP
+
+K_NEIGHBORS = 16
+MAX_SEGMENT = 3
+EPS = 1e-6
+
+
+def _dist(distances, a, b) -> np.ndarray:
+    return np.asarray(distances[a, b], dtype=float)
+
+def route_length(distances, route: np.ndarray) -> float:
+    return float(_dist(distances, route[:-1], route[1:]).sum()) if len(route) > 1 else 0.0
+
+
+# --- Intra-route -------------------------------------------------------
+class _RouteCosts:
+    """Edge costs of seq (node ids) with prefix sums, forward and backward."""
+
+    def __init__(self, distances, seq: np.ndarray):
+        self.distances = distances
+        self.fwd = _dist(distances, seq[:-1], seq[1:])
+        self.bwd = _dist(distances, seq[1:], seq[:-1])
+        self._sums()
+
+    def _sums(self):
+        self.cf, self.cb = np.r_[0.0, np.cumsum(self.fwd)], np.r_[0.0, np.cumsum(self.bwd)]
+
+    def update(self, seq: np.ndarray, lo: int, hi: int) -> None:
+        """Edges lo..hi-1 changed."""
+        self.fwd[lo:hi] = _dist(self.distances, seq[lo:hi], seq[lo + 1:hi + 1])
+        self.bwd[lo:hi] = _dist(self.distances, seq[lo + 1:hi + 1], seq[lo:hi])
+        self._sums()
+
+def _two_opt_moves(distances, seq, rc, p, c):
+    """
+    2-opt moves that add an edge between position p and each candidate position
+    in c: reverse positions i+1..j, giving (delta, i, j). Edge e is seq[e] -> seq[e + 1].
+    """
+    lo, hi = np.minimum(p, c), np.maximum(p, c)
+    i, j = np.concatenate([lo, lo - 1]), np.concatenate([hi, hi - 1])
+    ok = (i >= 0) & (j >= i + 2) & (j <= len(seq) - 2)
+    i, j = i[ok], j[ok]
+    with np.errstate(invalid="ignore"):
+        delta = (distances[seq[i], seq[j]] + distances[seq[i + 1], seq[j + 1]]
+                 - rc.fwd[i] - rc.fwd[j] + (rc.cb[j] - rc.cb[i + 1]) - (rc.cf[j] - rc.cf[i + 1]))
+    return np.where(np.isnan(delta), np.inf, delta), i, j
+
+_OR_OPT_TEMPLATES: Dict[Tuple[int, int], Tuple[np.ndarray, ...]] = {}
+
+def _or_opt_template(n_cand: int, max_segment: int) -> Tuple[np.ndarray, ...]:
+    """Flat (first offset from p, run length, candidate index, edge offset from c, reversed)."""
+    key = (n_cand, max_segment)
+    if key not in _OR_OPT_TEMPLATES:
+        # axes: run length, run starts / ends at p, edge before / after c, reversed, candidate
+        L = np.arange(1, max_segment + 1)[:, None, None, None, None]
+        first = np.where(np.arange(2)[:, None, None, None] == 0, 0, 1 - L)
+        e = np.arange(2)[:, None, None] - 1
+        rev = np.arange(2)[:, None] == 1
+        cand = np.arange(n_cand)
+        _OR_OPT_TEMPLATES[key] = tuple(np.ascontiguousarray(x).ravel()
+                                       for x in np.broadcast_arrays(first, L, cand, e, rev))
+    return _OR_OPT_TEMPLATES[key]
+
+def _or_opt_moves(distances, seq, rc, p, c, max_segment):
+    """
+    Or-opt moves of a run of 1..max_segment nodes starting or ending at
+    position p, inserted into the edge before or after each candidate position
+    in c, optionally reversed: (delta, first, seg_len, e, reversed).
+    """
+    m = len(seq)
+    first, L, cand, e, rev = _or_opt_template(len(c), max_segment)
+    first, e = first + p, c[cand] + e
+    last = first + L - 1
+    ok = (first >= 1) & (last <= m - 2) & (e >= 0) & (e <= m - 2) & ((e < first - 1) | (e > last))
+    first, last, L, e, rev = first[ok], last[ok], L[ok], e[ok], rev[ok]
+    with np.errstate(invalid="ignore"):
+        gain = rc.fwd[first - 1] + rc.fwd[last] - distances[seq[first - 1], seq[last + 1]]
+        head, tail = np.where(rev, seq[last], seq[first]), np.where(rev, seq[first], seq[last])
+        delta = (distances[seq[e], head] + distances[tail, seq[e + 1]] - rc.fwd[e] - gain
+                 + np.where(rev, (rc.cb[last] - rc.cb[first]) - (rc.cf[last] - rc.cf[first]), 0.0))
+    return np.where(np.isnan(delta), np.inf, delta), first, L, e, rev
+
+def _reorder(seq: np.ndarray, kind: str, move: tuple) -> None:
+    """Applies a move in place; only positions inside its span change."""
+    if kind == "two_opt":
+        i, j = move
+        seq[i + 1:j + 1] = seq[i + 1:j + 1][::-1].copy()
+        return
+    first, seg_len, e, rev = move
+    last = first + seg_len - 1
+    seg = seq[first:last + 1][::-1].copy() if rev else seq[first:last + 1].copy()
+    if e < first:
+        seq[e + 1:last + 1] = np.r_[seg, seq[e + 1:first]]
+    else:
+        seq[first:e + 1] = np.r_[seq[last + 1:e + 1], seg]
+
+def improve_route(distances, route: Sequence[int], max_segment: int = MAX_SEGMENT,
+                  stats: Optional[Dict[str, int]] = None, nbr: Optional[np.ndarray] = None,
+                  neighbors: int = K_NEIGHBORS, start: Optional[Sequence[int]] = None) -> np.ndarray:
+    """
+    2-opt and Or-opt restricted to candidate lists (nbr rows, as from
+    neighbor_lists), first improvement with don't-look bits: a node is scored
+    against its neighbours in the same route, its best improving move is
+    applied at once, and only the nodes next to changed edges are queued again.
+    `start` limits the first queue to these nodes (default: every node).
+    """
+    seq = np.array(route, dtype=np.int64)
+    m = len(seq)
+    if m < 4:
+        return seq
+    distances = np.asarray(distances)                # plain view of a memmap: cheaper scalar-ish indexing
+    if nbr is None:
+        nbr = neighbor_lists(distances, np.unique(seq[1:-1]), neighbors)
+    pos = np.full(max(len(distances), int(seq.max()) + 1), -1, dtype=np.int64)
+    pos[seq[1:-1]] = np.arange(1, m - 1)             # the depot ends never move
+    rc = _RouteCosts(distances, seq)
+    first = seq[1:-1] if start is None else np.unique(np.asarray(start, dtype=np.int64))
+    first = first[pos[first] > 0]
+    queue = deque(first.tolist())
+    queued = np.zeros(len(pos), dtype=bool)
+    queued[first] = True
+
+    while queue:
+        v = queue.popleft()
+        queued[v] = False
+        cand = nbr[v]
+        c = pos[cand[cand >= 0]]
+        c = c[c > 0]                                 # neighbours in this route
+        if len(c) == 0:
+            continue
+        p = pos[v]
+
+        best = (-EPS, None, None, None)
+        delta, i, j = _two_opt_moves(distances, seq, rc, p, c)
+        if len(delta) and delta.min() < best[0]:
+            k = int(np.argmin(delta))
+            best = (delta[k], "two_opt", (int(i[k]), int(j[k])), (int(i[k]), int(j[k]) + 1))
+        delta, first, seg, e, rev = _or_opt_moves(distances, seq, rc, p, c, max_segment)
+        if len(delta) and delta.min() < best[0]:
+            k = int(np.argmin(delta))
+            last = first[k] + seg[k] - 1
+            span = (int(e[k]), int(last) + 1) if e[k] < first[k] else (int(first[k]) - 1, int(e[k]) + 1)
+            best = (delta[k], "or_opt", (int(first[k]), int(seg[k]), int(e[k]), bool(rev[k])), span)
+        _, kind, move, span = best
+        if kind is None:
+            continue
+        lo, hi = span
+
+        if kind == "two_opt":
+            ends = seq[[move[0], move[0] + 1, move[1], move[1] + 1]]
+        else:
+            first, seg_len, e, _ = move
+            ends = seq[[first - 1, first, first + seg_len - 1, first + seg_len, e, e + 1]]
+        _reorder(seq, kind, move)
+        pos[seq[lo:hi + 1]] = np.arange(lo, hi + 1)
+        pos[seq[[0, -1]]] = -1
+        rc.update(seq, lo, hi)
+        for u in ends[pos[ends] > 0].tolist():
+            if not queued[u]:
+                queued[u] = True
+                queue.append(u)
+        if not queued[v]:
+            queued[v] = True
+            queue.append(v)
+        if stats is not None:
+            stats[kind] = stats.get(kind, 0) + 1
+    return seq
+
+
+# --- Inter-route -------------------------------------------------------
+def _inter_moves(distances, routes: List[np.ndarray], lengths: np.ndarray,
+                 nbr: np.ndarray, battery_cap: float) -> List[Tuple[float, str, int, int, int, int]]:
+    """
+    Improving relocate and swap moves, best first, as
+    (delta, kind, route_a, pos_a, route_b, pos_b). Relocate inserts at pos_b.
+    """
+    n = len(distances)
+    route_of = np.full(n, -1, dtype=np.int64)
+    pos_of = np.zeros(n, dtype=np.int64)
+    pred = np.zeros(n, dtype=np.int64)
+    succ = np.zeros(n, dtype=np.int64)
+    for k, r in enumerate(routes):
+        inner = r[1:-1]
+        route_of[inner] = k
+        pos_of[inner] = np.arange(1, len(r) - 1)
+        pred[inner], succ[inner] = r[:-2], r[2:]
+
+    v = np.flatnonzero(route_of >= 0)
+    if len(v) == 0 or nbr.shape[1] == 0:
+        return []
+    u = nbr[v]                                               # (V, K)
+    vv = np.broadcast_to(v[:, None], u.shape)
+    ok = (u >= 0) & (route_of[np.maximum(u, 0)] >= 0) & (route_of[np.maximum(u, 0)] != route_of[vv])
+    vv, u = vv[ok], u[ok]
+    ra, rb = route_of[vv], route_of[u]
+    pv, sv, pu, su = pred[vv], succ[vv], pred[u], succ[u]
+
+    gain = _dist(distances, pv, vv) + _dist(distances, vv, sv) - _dist(distances, pv, sv)
+    d_pu_v, d_v_u = _dist(distances, pu, vv), _dist(distances, vv, u)
+    d_u_v, d_v_su = _dist(distances, u, vv), _dist(distances, vv, su)
+    d_pu_u, d_u_su = _dist(distances, pu, u), _dist(distances, u, su)
+    moves = []
+
+    # Relocate v before u (between pred(u) and u) or after u (between u and succ(u))
+    for ins, pos in ((d_pu_v + d_v_u - d_pu_u, pos_of[u]), (d_u_v + d_v_su - d_u_su, pos_of[u] + 1)):
+        with np.errstate(invalid="ignore"):
+            delta = ins - gain
+            keep = (delta < -EPS) & (lengths[rb] + ins <= battery_cap)
+        for idx in np.flatnonzero(keep):
+            moves.append((float(delta[idx]), "relocate", int(ra[idx]), int(pos_of[vv[idx]]),
+                          int(rb[idx]), int(pos[idx])))
+
+    # Swap v and u
+    with np.errstate(invalid="ignore"):
+        da = _dist(distances, pv, u) + _dist(distances, u, sv) - _dist(distances, pv, vv) - _dist(distances, vv, sv)
+        db = d_pu_v + d_v_su - d_pu_u - d_u_su
+        keep = ((da + db) < -EPS) & (lengths[ra] + da <= battery_cap) & (lengths[rb] + db <= battery_cap)
+    for idx in np.flatnonzero(keep):
+        moves.append((float(da[idx] + db[idx]), "swap", int(ra[idx]), int(pos_of[vv[idx]]),
+                      int(rb[idx]), int(pos_of[u[idx]])))
+    moves.sort(key=lambda m: m[0])
+    return moves
+
+
+# --- Driver ------------------------------------------------------------
+def polish_routes(distances, routes: Sequence[Sequence[int]], battery_cap: float = MAX_BATTERY_CAP,
+                  neighbors: int = K_NEIGHBORS, max_segment: int = MAX_SEGMENT,
+                  time_limit: Optional[float] = None, max_rounds: int = 1000) -> Tuple[List[List[int]], Dict]:
+    """
+    Local search to a local optimum (or time_limit seconds). Routes keep their
+    order; routes that end up empty stay as [depot, depot]. Returns (routes, report).
+    """
+    t0 = time.perf_counter()
+    routes = [np.asarray(r, dtype=np.int64) for r in routes]
+    lengths = np.array([route_length(distances, r) for r in routes])
+    before = float(lengths.sum())
+    drones_before = sum(len(r) > 2 for r in routes)
+    stats: Dict[str, int] = {"two_opt": 0, "or_opt": 0, "relocate": 0, "swap": 0}
+
+    customers = np.unique(np.concatenate([r[1:-1] for r in routes])) if routes else np.empty(0, np.int64)
+    customers = customers[customers != DEPOT_INDEX]
+    nbr = neighbor_lists(distances, customers, neighbors)
+    t_neighbors = time.perf_counter() - t0
+
+    dirty = set(range(len(routes)))
+    touched: Dict[int, List[int]] = {}           # route -> nodes next to edges inter moves changed
+    rounds = 0
+    while rounds < max_rounds:
+        for k in dirty:
+            routes[k] = improve_route(distances, routes[k], max_segment, stats, nbr,
+                                      start=touched.get(k) if rounds else None)
+            lengths[k] = route_length(distances, routes[k])
+        dirty, touched = set(), {}
+        if time_limit is not None and time.perf_counter() - t0 > time_limit:
+            break
+
+        rounds += 1
+        for delta, kind, a, pa, b, pb in _inter_moves(distances, routes, lengths, nbr, battery_cap):
+            if a in dirty or b in dirty:
+                continue
+            ra, rb = routes[a], routes[b]
+            touched.setdefault(a, []).extend(ra[max(pa - 1, 0):pa + 2].tolist() + [rb[min(pb, len(rb) - 1)]])
+            touched.setdefault(b, []).extend(rb[max(pb - 1, 0):pb + 2].tolist() + [ra[pa]])
+            if kind == "relocate":
+                routes[a] = np.delete(ra, pa)
+                routes[b] = np.insert(rb, pb, ra[pa])
+            else:
+                routes[a], routes[b] = ra.copy(), rb.copy()
+                routes[a][pa], routes[b][pb] = rb[pb], ra[pa]
+            lengths[a] = route_length(distances, routes[a])
+            lengths[b] = route_length(distances, routes[b])
+            stats[kind] += 1
+            dirty |= {a, b}
+        if not dirty:
+            break
+
+    report = {
+        **stats,
+        "rounds": rounds,
+        "distance_before": before,
+        "distance_after": float(lengths.sum()),
+        "drones_before": drones_before,
+        "drones_after": sum(len(r) > 2 for r in routes),
+        "neighbors_s": t_neighbors,
+        "wall_s": time.perf_counter() - t0,
+    }
+    return [r.tolist() for r in routes], report
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+    from src.matrix_store import open_matrices
+    from src.route_io import load_routes, save_routes
+
+    parser = argparse.ArgumentParser(description="NumPy 2-opt / Or-opt / relocate / swap route polish")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--routes", default=str(DATA_DIR / "routes.npy"))
+    parser.add_argument("--out", default=None, help="defaults to <routes>_polished next to --routes")
+    parser.add_argument("--battery-cap", type=float, default=MAX_BATTERY_CAP)
+    parser.add_argument("--neighbors", type=int, default=K_NEIGHBORS, help="inter-route candidates per node")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds (default: until local optimum)")
+    args = parser.parse_args()
+
+    distances, _ = open_matrices(args.data_dir)
+    routes, report = polish_routes(distances, load_routes(args.routes), args.battery_cap,
+                                   args.neighbors, time_limit=args.time_limit)
+    gain = report["distance_before"] - report["distance_after"]
+    print(f"[polish] distance {report['distance_before']:.0f} -> {report['distance_after']:.0f} ft "
+          f"(-{gain:.0f} ft, {gain / max(report['distance_before'], 1e-9):.2%})")
+    print(f"[polish] 2-opt {report['two_opt']}, or-opt {report['or_opt']}, relocate {report['relocate']}, "
+          f"swap {report['swap']} in {report['rounds']} rounds, {report['wall_s']:.2f}s "
+          f"(neighbor lists {report['neighbors_s']:.2f}s)")
+    routes_path = Path(args.routes)
+    out = args.out or routes_path.with_name(f"{routes_path.stem}_polished{routes_path.suffix}")
+    lengths = [route_length(distances, np.asarray(r)) for r in routes]
+    save_routes(out, routes, length_ft=lengths)
+    print(f"[polish] saved {len(routes)} routes -> {out}")
@@ -0,0 +1,214 @@
+"""
+KDKR src/portfolio.py
+
+Runs N independent OR-Tools solves in parallel, each with its own first
+solution strategy, metaheuristic and seed, under the same time budget, and
+keeps the best (fewest drones, then lowest total distance).
+
+OR-Tools' routing parameters have no random seed, so a seed is applied by
+relabelling the non-depot nodes with a seeded permutation before building
+the model (seed 0 = identity). That changes tie-breaking and neighbourhood
+order without changing the instance; routes are mapped back afterwards.
+
+The distance matrix is quantized to integer costs once in the parent and
+saved to a temporary .npy that every worker memory-maps, so the N x N
+conversion is not repeated per run and the pages are shared.
+
+Every run is appended to a JSON history; wins per configuration are used to
+weight which configurations get picked next time.
+
+Usage (from the repo root):
+  python -m src.portfolio --runs 16 --time-limit 90 --drones 40
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.config import DATA_DIR, MAX_BATTERY_CAP, VEHICLE_FIXED_COST
+from src.matrix_store import open_matrices
+from src.route_io import config_hash, save_routes
+from src.route_metrics import mission_table, to_csr
+
+FIRST_SOLUTIONS = (
+    "SAVINGS",
+    "PATH_CHEAPEST_ARC",
+    "PARALLEL_CHEAPEST_INSERTION",
+    "LOCAL_CHEAPEST_INSERTION",
+    "GLOBAL_CHEAPEST_ARC",
+    "CHRISTOFIDES",
+    "AUTOMATIC",
+)
+METAHEURISTICS = (
+    "GUIDED_LOCAL_SEARCH",
+    "SIMULATED_ANNEALING",
+    "TABU_SEARCH",
+)
+HISTORY_FILE = DATA_DIR / "portfolio_history.json"
+
+
+@dataclass(frozen=True)
+class SolverConfig:
+    first_solution: str
+    metaheuristic: str
+    seed: int = 0
+
+    @property
+    def key(self) -> str:
+        """Strategy pair without the seed; history is kept per key."""
+        return f"{self.first_solution}+{self.metaheuristic}"
+
+
+# --- History -----------------------------------------------------------
+def load_history(path=HISTORY_FILE) -> Dict:
+    path = Path(path)
+    if not path.exists():
+        return {"wins": {}, "runs": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_history(history: Dict, path=HISTORY_FILE) -> None:
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    tmp.replace(path)
+
+def pick_configs(n: int, history: Optional[Dict] = None, seed: int = 0) -> List[SolverConfig]:
+    """
+    n configurations drawn without replacement from the strategy grid,
+    weighted by 1 + past wins. Seeds continue after the configurations
+    already in the history, so no run repeats an earlier (pair, seed) and
+    only the very first run gets seed 0 (no relabelling). When n exceeds
+    the grid, pairs are reused with fresh seeds.
+    """
+    rng = np.random.default_rng(seed)
+    history = history or {}
+    wins = history.get("wins", {})
+    first = sum(len(run.get("results", [])) for run in history.get("runs", []))
+    grid = [SolverConfig(fs, mh) for fs in FIRST_SOLUTIONS for mh in METAHEURISTICS]
+    weights = np.array([1.0 + wins.get(c.key, 0) for c in grid])
+
+    picked = []
+    while len(picked) < n:
+        take = min(n - len(picked), len(grid))
+        order = rng.choice(len(grid), size=take, replace=False, p=weights / weights.sum())
+        picked.extend(grid[i] for i in order)
+    return [SolverConfig(c.first_solution, c.metaheuristic, seed=first + i) for i, c in enumerate(picked)]
+
+
+# --- Worker ------------------------------------------------------------
+def _run_config(task: Dict) -> Dict:
+    from src.find_initial_route import build_matrix_model, extract_routes, make_search_parameters
+
+    config = SolverConfig(**task["config"])
+    distances, _ = open_matrices(task["data_dir"])
+    costs = np.load(task["costs_path"], mmap_mode="r")     # quantized once by run_portfolio
+
+    # Seeded relabelling of every node except the depot (index 0)
+    perm = np.arange(len(costs))
+    if config.seed:
+        perm[1:] = 1 + np.random.default_rng(config.seed).permutation(len(costs) - 1)
+    costs = costs[np.ix_(perm, perm)]
+
+    t0 = time.perf_counter()
+    manager, routing = build_matrix_model(costs, task["num_drones"], task["battery_cap"],
+                                          task["vehicle_fixed_cost"])
+    params = make_search_parameters(task["time_limit"], config.first_solution, config.metaheuristic)
+    solution = routing.SolveWithParameters(params)
+    elapsed = time.perf_counter() - t0
+
+    result = {"config": asdict(config), "key": config.key, "solve_s": elapsed,
+              "routes": None, "drones": None, "total_distance": None}
+    if solution:
+        local = [np.asarray(r) for r in extract_routes(routing, manager, solution, drop_empty=True)]
+        routes = [perm[r].tolist() for r in local]
+        table = mission_table(distances, *to_csr(routes), task["battery_cap"])
+        result.update(routes=routes, drones=len(local), total_distance=float(table["length_ft"].sum()))
+    return result
+
+
+# --- Driver ------------------------------------------------------------
+def rank_key(result: Dict):
+    """Fewest drones first, then lowest total distance; failed runs last."""
+    if result["routes"] is None:
+        return (1, 0, 0.0)
+    return (0, result["drones"], result["total_distance"])
+
+def run_portfolio(data_dir=DATA_DIR, runs: int = 8, time_limit: float = 90,
+                  num_drones: int = 40, battery_cap: float = MAX_BATTERY_CAP,
+                  vehicle_fixed_cost: int = VEHICLE_FIXED_COST, workers: Optional[int] = None,
+                  history_path=HISTORY_FILE, configs: Optional[List[SolverConfig]] = None) -> Dict:
+    """
+    Solves `runs` configurations in a process pool and returns
+    {"best": result, "results": [...]} with results sorted best first.
+    The winning configuration is recorded in the history file.
+    """
+    from src.find_initial_route import quantize_costs
+
+    history = load_history(history_path)
+    configs = configs or pick_configs(runs, history, seed=len(history["runs"]))
+    workers = workers or min(len(configs), os.cpu_count() or 1)
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="kdkr-portfolio-") as tmp:
+        costs_path = Path(tmp) / "costs.npy"
+        np.save(costs_path, quantize_costs(open_matrices(data_dir)[0]))
+        tasks = [{"config": asdict(c), "data_dir": str(data_dir), "costs_path": str(costs_path),
+                  "num_drones": num_drones, "battery_cap": battery_cap,
+                  "vehicle_fixed_cost": vehicle_fixed_cost, "time_limit": time_limit} for c in configs]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = sorted(pool.map(_run_config, tasks), key=rank_key)
+    wall = time.perf_counter() - t0
+
+    best = results[0]
+    if best["routes"] is not None:
+        history["wins"][best["key"]] = history["wins"].get(best["key"], 0) + 1
+    history["runs"].append({
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "time_limit": time_limit,
+        "num_drones": num_drones,
+        "battery_cap": battery_cap,
+        "winner": best["config"] if best["routes"] is not None else None,
+        "results": [{k: r[k] for k in ("config", "drones", "total_distance", "solve_s")} for r in results],
+    })
+    save_history(history, history_path)
+    return {"best": best, "results": results, "wall_s": wall, "workers": workers}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel multi-strategy OR-Tools portfolio")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--runs", type=int, default=8)
+    parser.add_argument("--time-limit", type=float, default=90)
+    parser.add_argument("--drones", type=int, default=40)
+    parser.add_argument("--battery-cap", type=float, default=MAX_BATTERY_CAP)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--history", default=str(HISTORY_FILE))
+    parser.add_argument("--out", default=str(DATA_DIR / "routes.npy"))
+    args = parser.parse_args()
+
+    out = run_portfolio(args.data_dir, args.runs, args.time_limit, args.drones, args.battery_cap,
+                        workers=args.workers, history_path=args.history)
+    print(f"[portfolio] {len(out['results'])} runs on {out['workers']} workers in {out['wall_s']:.1f}s")
+    for r in out["results"]:
+        c = r["config"]
+        status = (f"drones={r['drones']} distance={r['total_distance']:.0f} ft"
+                  if r["routes"] is not None else "no solution")
+        print(f"[portfolio]   {c['first_solution']:>28} + {c['metaheuristic']:<20} seed={c['seed']:<3} {status}")
+
+    best = out["best"]
+    if best["routes"] is None:
+        print("No solution found.")
+    else:
+        print(f"[portfolio] winner: {best['key']} (seed {best['config']['seed']})")
+        save_routes(args.out, best["routes"], config=config_hash(best["config"]))
+        print(f"[portfolio] saved {best['drones']} routes -> {args.out}")
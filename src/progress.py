@@ -0,0 +1,214 @@
+"""
+KDKR src/progress.py
+
+Progress instrumentation for OR-Tools solves.
+
+`SolveMonitor` hooks a RoutingModel's solution callback and
+  - appends every improving solution (elapsed time, objective, drones used)
+    to a JSONL trace,
+  - checkpoints the incumbent routes at most every `checkpoint_every`
+    seconds, atomically, in the routes.npy layout (src/route_io.py), so a
+    killed run can be resumed by warm-starting from the checkpoint,
+  - optionally stops the search early once the best objective improved by
+    less than `min_improvement` percent per minute over the last
+    `stall_window` seconds. The check runs whenever the search reports a
+    solution,
+  - optionally stops the search as soon as `should_stop()` returns True
+    (polled every `poll_every` seconds from a search limit, so it reacts
+    between solutions too), e.g. for cancelling a queued job.
+
+Trace lines:
+  {"event": "start", "t": 0.0, ...}
+  {"event": "solution", "t": 1.23, "objective": 51234, "drones": 7, "n": 5}
+  {"event": "checkpoint", "t": 10.4, "objective": 50010, "path": "..."}
+  {"event": "stop", "t": 42.0, "reason": "stalled" | "cancelled" | "done", "objective": ...}
+
+Usage (from the repo root), to read a trace:
+  python -m src.progress Data/solve_trace.jsonl
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.route_io import save_routes
+
+
+class SolveMonitor:
+    def __init__(self, routing, manager, trace_path=None, checkpoint_path=None,
+                 checkpoint_every: float = 10.0, min_improvement: Optional[float] = None,
+                 stall_window: float = 60.0, should_stop: Optional[Callable[[], bool]] = None,
+                 poll_every: float = 0.25, expand: Optional[Callable[[List[List[int]]], List[List[int]]]] = None):
+        self.routing = routing
+        self.manager = manager
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.checkpoint_every = checkpoint_every
+        self.min_improvement = min_improvement      # percent of objective per minute
+        self.stall_window = stall_window
+        self.should_stop = should_stop
+        self.poll_every = poll_every
+        self.expand = expand                        # model routes -> node routes for checkpoints
+
+        self.best: Optional[int] = None
+        self.history: List[tuple] = []              # (t, objective) of improving solutions
+        self.solutions = 0
+        self.stopped_early = False
+        self.cancelled = False
+        self._t0 = None
+        self._last_checkpoint = None                # elapsed s of the last checkpoint, 0.0 = none yet
+        self._dirty = False
+        self._trace = None
+        self._limit = None
+        self._next_poll = 0.0
+
+    # --- Lifecycle -----------------------------------------------------
+    def attach(self, **meta) -> "SolveMonitor":
+        """Registers the callback and starts the clock; call right before solving."""
+        if self.trace_path:
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            self._trace = open(self.trace_path, "a", encoding="utf-8")
+        self._t0 = time.perf_counter()
+        self._last_checkpoint = 0.0
+        self._write({"event": "start", "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     "nodes": self.manager.GetNumberOfNodes(), "vehicles": self.routing.vehicles(), **meta})
+        self.routing.AddAtSolutionCallback(self._on_solution)
+        if self.should_stop is not None:
+            self._limit = self.routing.solver().CustomLimit(self._poll)      # keep a reference
+            self.routing.AddSearchMonitor(self._limit)
+        return self
+
+    def finish(self, solution=None) -> None:
+        """Final checkpoint of `solution` (unless already saved) and closes the trace."""
+        if solution and self.checkpoint_path and (self._dirty or self._last_checkpoint == 0.0):
+            self._checkpoint(self._routes(solution.Value))
+        reason = "cancelled" if self.cancelled else "stalled" if self.stopped_early else "done"
+        self._write({"event": "stop", "reason": reason,
+                     "objective": self.best, "solutions": self.solutions})
+        if self._trace:
+            self._trace.close()
+            self._trace = None
+
+    # --- Callback ------------------------------------------------------
+    def _elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def _write(self, record: Dict) -> None:
+        if self._trace:
+            record = {"event": record.pop("event"), "t": round(self._elapsed(), 4), **record}
+            self._trace.write(json.dumps(record) + "\n")
+            self._trace.flush()
+
+    def _routes(self, value) -> List[List[int]]:
+        """Routes of the current assignment; `value(var)` reads a NextVar."""
+        routing, manager = self.routing, self.manager
+        routes = []
+        for vehicle in range(routing.vehicles()):
+            index = routing.Start(vehicle)
+            route = [manager.IndexToNode(index)]
+            while not routing.IsEnd(index):
+                index = value(routing.NextVar(index))
+                route.append(manager.IndexToNode(index))
+            if len(route) > 2:
+                routes.append(route)
+        return routes
+
+    def _drones(self) -> int:
+        routing = self.routing
+        return sum(1 for v in range(routing.vehicles())
+                   if not routing.IsEnd(routing.NextVar(routing.Start(v)).Value()))
+
+    def _checkpoint(self, routes) -> None:
+        save_routes(self.checkpoint_path, self.expand(routes) if self.expand else routes)
+        self._last_checkpoint = self._elapsed()
+        self._dirty = False
+        self._write({"event": "checkpoint", "objective": self.best, "path": str(self.checkpoint_path)})
+
+    def _stalled(self, now: float) -> bool:
+        if self.min_improvement is None or now < self.stall_window or not self.best:
+            return False
+        # Best objective as of stall_window seconds ago
+        before = next((obj for t, obj in reversed(self.history) if t <= now - self.stall_window), None)
+        if before is None:
+            return False
+        rate = (before - self.best) / before * 100 / (self.stall_window / 60)
+        return rate < self.min_improvement
+
+    def _poll(self) -> bool:
+        """Search limit: called very often, so should_stop only runs every poll_every seconds."""
+        if self.cancelled:
+            return True
+        now = time.perf_counter()
+        if now < self._next_poll:
+            return False
+        self._next_poll = now + self.poll_every
+        self.cancelled = bool(self.should_stop())
+        return self.cancelled
+
+    def _on_solution(self) -> None:
+        self.solutions += 1
+        now = self._elapsed()
+        objective = self.routing.CostVar().Value()
+        if self.best is None or objective < self.best:
+            self.best = objective
+            self.history.append((now, objective))
+            self._dirty = True
+            self._write({"event": "solution", "objective": objective, "drones": self._drones(), "n": self.solutions})
+
+        if self.checkpoint_path and self._dirty and now - self._last_checkpoint >= self.checkpoint_every:
+            self._checkpoint(self._routes(lambda var: var.Value()))
+        if self._stalled(now):
+            self.stopped_early = True
+            self.routing.solver().FinishCurrentSearch()
+
+
+# --- Trace analysis ----------------------------------------------------
+def load_trace(path) -> List[Dict]:
+    """Records of the last run in a trace file (traces are appended to)."""
+    runs: List[List[Dict]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["event"] == "start" or not runs:
+                runs.append([])
+            runs[-1].append(record)
+    return runs[-1] if runs else []
+
+def convergence(records: List[Dict], within=(10.0, 5.0, 1.0, 0.1)) -> Dict:
+    """Seconds until the best objective was within each percentage of the final one."""
+    sols = [r for r in records if r["event"] == "solution"]
+    if not sols:
+        return {"solutions": 0}
+    final = sols[-1]["objective"]
+    reached = {}
+    for pct in within:
+        hit = next(r["t"] for r in sols if r["objective"] <= final * (1 + pct / 100))
+        reached[f"within_{pct:g}pct_s"] = hit
+    return {"solutions": len(sols), "first_s": sols[0]["t"], "first_objective": sols[0]["objective"],
+            "final_s": sols[-1]["t"], "final_objective": final, **reached}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a solver progress trace")
+    parser.add_argument("trace", help="JSONL trace written by SolveMonitor")
+    args = parser.parse_args()
+
+    records = load_trace(args.trace)
+    summary = convergence(records)
+    if not summary["solutions"]:
+        print("[progress] no solutions in trace")
+    else:
+        print(f"[progress] {summary['solutions']} improving solutions: "
+              f"{summary['first_objective']} at {summary['first_s']:.1f}s -> "
+              f"{summary['final_objective']} at {summary['final_s']:.1f}s")
+        for key, t in summary.items():
+            if key.startswith("within_"):
+                pct = key[len("within_"):-len("pct_s")]
+                print(f"[progress]   within {pct}% of final after {t:.1f}s")
+    stop = next((r for r in reversed(records) if r["event"] == "stop"), None)
+    if stop:
+        print(f"[progress] stopped: {stop['reason']} at {stop['t']:.1f}s")
@@ -0,0 +1,236 @@
+"""
+KDKR src/route_io.py
+
+Reading and writing route sets in the shapes the rest of the repo expects:
+  - routes.npy          (K, L) float array when every route has the same length
+  - routes_global.npy   (K,) object array, each entry a list of node indices
+  - *.kdr               compact route set (below); preferred for new files
+
+.kdr layout (little-endian), a fixed 64 byte header then fixed-width columns:
+  header    magic, version, K missions, total nodes, CRC32 of everything after it
+  offsets   int64  (K+1,)   mission k is nodes[offsets[k]:offsets[k+1]]
+  nodes     int32  (total,) padded to 8 bytes
+  length_ft float64 (K,)    NaN when unknown
+  drone     int32  (K,)     vehicle index in the solver
+  config    uint64 (K,)     hash of the solver configuration (config_hash)
+
+`open_route_set` maps the file read-only with `np.memmap`, so opening is O(1)
+and `route_set[k]` is a slice of the node column. `save_routes` /
+`load_routes` pick the format from the suffix, so every caller reads and
+writes both. To convert an existing file:
+  python -m src.route_io convert Optimized_Paths/routes_global.npy
+"""
+
+import argparse
+import hashlib
+import json
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+ROUTE_MAGIC = b"KDKRRTE\0"
+ROUTE_VERSION = 1
+ROUTE_HEADER_FMT = "<8sIQQI"      # magic, version, k, total, crc32
+ROUTE_HEADER_SIZE = 64
+ROUTE_SUFFIX = ".kdr"
+
+
+def routes_to_object_array(routes: Sequence[Sequence[int]]) -> np.ndarray:
+    """(K,) object array of int lists, even when all routes share a length."""
+    arr = np.empty(len(routes), dtype=object)
+    for k, route in enumerate(routes):
+        arr[k] = [int(n) for n in route]
+    return arr
+
+def config_hash(config) -> int:
+    """Stable 64-bit hash of a solver configuration (any JSON-serializable value)."""
+    raw = json.dumps(config, sort_keys=True, default=str).encode()
+    return int.from_bytes(hashlib.sha1(raw).digest()[:8], "little")
+
+
+# --- .kdr route sets ---------------------------------------------------
+@dataclass(frozen=True)
+class RouteHeader:
+    k: int
+    total: int
+    crc32: int
+
+def _layout(k: int, total: int) -> Dict[str, tuple]:
+    """Byte offset, dtype and length of every column."""
+    cols, pos = {}, ROUTE_HEADER_SIZE
+    for name, dtype, count in (("offsets", "<i8", k + 1), ("nodes", "<i4", total),
+                               ("length_ft", "<f8", k), ("drone", "<i4", k), ("config", "<u8", k)):
+        cols[name] = (pos, np.dtype(dtype), count)
+        pos += -(-count * np.dtype(dtype).itemsize // 8) * 8           # 8-byte aligned
+    cols["end"] = (pos, None, 0)
+    return cols
+
+def read_route_header(path: Union[str, Path]) -> RouteHeader:
+    with open(path, "rb") as f:
+        raw = f.read(ROUTE_HEADER_SIZE)
+    if len(raw) < ROUTE_HEADER_SIZE:
+        raise ValueError(f"{path} is too short to be a route set file")
+    magic, version, k, total, crc = struct.unpack_from(ROUTE_HEADER_FMT, raw)
+    if magic != ROUTE_MAGIC:
+        raise ValueError(f"{path} is not a route set file (bad magic)")
+    if version != ROUTE_VERSION:
+        raise ValueError(f"{path} has unsupported version {version}")
+    return RouteHeader(k, total, crc)
+
+def write_route_set(path: Union[str, Path], routes: Sequence[Sequence[int]],
+                    length_ft: Optional[Sequence[float]] = None, drone: Optional[Sequence[int]] = None,
+                    config: Union[int, Sequence[int], None] = 0) -> RouteHeader:
+    """
+    Writes routes plus per-mission metadata. `config` is one hash for every
+    mission or one per mission. Written next to the target and renamed over it.
+    """
+    path = Path(path)
+    routes = [np.asarray(r, dtype=np.int64).ravel() for r in routes]
+    k = len(routes)
+    lengths = np.array([len(r) for r in routes], dtype=np.int64)
+    total = int(lengths.sum())
+    nodes = np.concatenate(routes) if k else np.empty(0, dtype=np.int64)
+    if total and (nodes.min() < 0 or nodes.max() > np.iinfo(np.int32).max):
+        raise ValueError("node indices must fit in int32")
+
+    cols = {
+        "offsets": np.r_[0, np.cumsum(lengths)],
+        "nodes": nodes,
+        "length_ft": np.full(k, np.nan) if length_ft is None else np.asarray(length_ft, dtype=float),
+        "drone": np.arange(k) if drone is None else np.asarray(drone),
+        "config": np.broadcast_to(np.asarray(0 if config is None else config, dtype=np.uint64), (k,)),
+    }
+    layout = _layout(k, total)
+    payload = bytearray(layout["end"][0] - ROUTE_HEADER_SIZE)
+    for name, values in cols.items():
+        pos, dtype, count = layout[name]
+        if len(values) != count:
+            raise ValueError(f"{name} has {len(values)} entries, expected {count}")
+        data = np.ascontiguousarray(values, dtype=dtype).tobytes()
+        payload[pos - ROUTE_HEADER_SIZE:pos - ROUTE_HEADER_SIZE + len(data)] = data
+
+    crc = zlib.crc32(payload)
+    header = struct.pack(ROUTE_HEADER_FMT, ROUTE_MAGIC, ROUTE_VERSION, k, total, crc)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header.ljust(ROUTE_HEADER_SIZE, b"\0"))
+        f.write(payload)
+    tmp.replace(path)
+    return RouteHeader(k, total, crc)
+
+
+class RouteSet:
+    """Read-only route set over a memory-mapped .kdr file; rs[k] is mission k's nodes."""
+
+    def __init__(self, path: Union[str, Path], header: RouteHeader):
+        self.path = Path(path)
+        self.header = header
+        layout = _layout(header.k, header.total)
+        raw = np.memmap(str(path), dtype=np.uint8, mode="r")
+        for name in ("offsets", "nodes", "length_ft", "drone", "config"):
+            pos, dtype, count = layout[name]
+            setattr(self, name, raw[pos:pos + count * dtype.itemsize].view(dtype))
+
+    def __len__(self) -> int:
+        return self.header.k
+
+    def __getitem__(self, k: int) -> np.ndarray:
+        if not -len(self) <= k < len(self):
+            raise IndexError(f"mission {k} out of range for {len(self)} missions")
+        k %= len(self)
+        return self.nodes[self.offsets[k]:self.offsets[k + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return (self[k] for k in range(len(self)))
+
+    def csr(self):
+        """(nodes, offsets), the layout src/route_metrics.py works on."""
+        return self.nodes, self.offsets
+
+def open_route_set(path: Union[str, Path], check: bool = False) -> RouteSet:
+    header = read_route_header(path)
+    if check:
+        with open(path, "rb") as f:
+            f.seek(ROUTE_HEADER_SIZE)
+            if zlib.crc32(f.read()) != header.crc32:
+                raise ValueError(f"{path} failed its checksum")
+    return RouteSet(path, header)
+
+
+# --- Any format --------------------------------------------------------
+def save_routes(path: Union[str, Path], routes: Sequence[Sequence[int]], **meta) -> None:
+    """
+    Saves a route set: .kdr paths get the compact format (meta is passed to
+    write_route_set), anything else the routes_global.npy layout (meta is
+    dropped). The file is written next to the target and renamed over it, so
+    readers never see a partial file.
+    """
+    path = Path(path)
+    if path.suffix == ROUTE_SUFFIX:
+        write_route_set(path, routes, **meta)
+        return
+    if path.suffix != ".npy":
+        path = path.with_name(path.name + ".npy")       # same as np.save
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, routes_to_object_array(routes), allow_pickle=True)
+    tmp.replace(path)
+
+def load_routes(path: Union[str, Path]) -> List[np.ndarray]:
+    """Loads a .kdr file, routes.npy or routes_global.npy into a list of int arrays."""
+    if Path(path).suffix == ROUTE_SUFFIX:
+        return [np.asarray(r, dtype=np.int64) for r in open_route_set(path)]
+    raw = np.load(str(path), allow_pickle=True)
+    if raw.dtype != object and raw.ndim == 1:
+        raw = raw[None, :]
+    return [np.asarray(r, dtype=float).astype(np.int64).ravel() for r in raw]
+
+def convert_routes(src: Union[str, Path], dst: Union[str, Path, None] = None,
+                   data_dir=None, config=0) -> Path:
+    """
+    Converts routes.npy / routes_global.npy to .kdr next to it (or to dst).
+    Mission lengths are filled in from data_dir's distance matrix when it exists.
+    """
+    src = Path(src)
+    dst = Path(dst) if dst else src.with_suffix(ROUTE_SUFFIX)
+    routes = load_routes(src)
+    lengths = None
+    if data_dir is not None:
+        try:
+            from src.matrix_store import open_matrices
+            from src.route_metrics import mission_table, to_csr
+            distances, _ = open_matrices(data_dir)
+            lengths = mission_table(distances, *to_csr(routes))["length_ft"]
+        except FileNotFoundError:
+            pass
+    write_route_set(dst, routes, length_ft=lengths, config=config)
+    return dst
+
+
+if __name__ == "__main__":
+    from src.config import DATA_DIR
+
+    parser = argparse.ArgumentParser(description="Convert and inspect route set files")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="routes.npy / routes_global.npy -> .kdr")
+    conv.add_argument("src")
+    conv.add_argument("--out", default=None, help="default: next to src with a .kdr suffix")
+    conv.add_argument("--data-dir", default=str(DATA_DIR), help="for mission lengths")
+    info = sub.add_parser("info", help="print a .kdr header and its missions")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        out = convert_routes(args.src, args.out, args.data_dir)
+        h = read_route_header(out)
+        print(f"[routes] {out}: {h.k} missions, {h.total} nodes, crc32={h.crc32:08x}")
+    else:
+        rs = open_route_set(args.path, check=True)
+        print(f"[routes] {args.path}: {len(rs)} missions, {rs.header.total} nodes, checksum ok")
+        for k in range(len(rs)):
+            print(f"[routes]   mission {k}: {len(rs[k])} nodes, {rs.length_ft[k]:.0f} ft, "
+                  f"drone {rs.drone[k]}, config {rs.config[k]:016x}")
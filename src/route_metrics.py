@@ -0,0 +1,200 @@
+"""
+KDKR src/route_metrics.py
+
+Scores a route set without OR-Tools, in one vectorized pass:
+  - per mission: length (one fancy-indexed gather of all legs from the
+    distance matrix + bincount), battery margin against the cap, node count,
+    photo points visited,
+  - fleet-wide: coverage of the photo (and asset) index slices, with missed
+    and duplicated waypoints flagged.
+
+Routes may be given as a list of sequences or directly as CSR arrays
+(nodes, offsets), which is the fast path for scoring many candidate route
+sets in portfolio / tuning loops.
+
+Per-mission results are a columnar table (dict of equal-length arrays) that
+`write_table` saves as .npz, .csv or .json.
+
+Usage (from the repo root):
+  python -m src.route_metrics --routes Optimized_Paths/routes_global.npy --out Optimized_Paths/metrics.csv
+"""
+
+import argparse
+import csv
+import json
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import DATA_DIR, DEPOT_INDEX, MAX_BATTERY_CAP, OPT_DIR
+
+
+# --- Inputs ------------------------------------------------------------
+def index_slice(arr, n_points: int) -> np.ndarray:
+    """
+    Node indices of an *_indexes.npy file. The challenge files hold an
+    inclusive [first, last] slice (as in visualize_map.slice_inclusive);
+    longer arrays are taken as explicit indices. Indices outside the point
+    array are dropped.
+    """
+    arr = np.asarray(arr).ravel()
+    if arr.dtype == bool:
+        idx = np.flatnonzero(arr)
+    elif len(arr) == 2:
+        idx = np.arange(int(arr[0]), int(arr[1]) + 1)
+    else:
+        idx = arr.astype(np.int64)
+    return idx[(idx >= 0) & (idx < n_points)]
+
+def to_csr(routes: Sequence[Sequence[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    seqs = [np.asarray(r, dtype=np.int64).ravel() for r in routes]
+    nodes = np.concatenate(seqs) if seqs else np.zeros(0, dtype=np.int64)
+    offsets = np.r_[0, np.cumsum([len(s) for s in seqs])].astype(np.int64)
+    return nodes, offsets
+
+
+# --- Metrics -----------------------------------------------------------
+def mission_table(distances, nodes: np.ndarray, offsets: np.ndarray,
+                  battery_cap: float = MAX_BATTERY_CAP,
+                  photo_ids: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Per-mission columns: mission, length_ft, margin_ft, over_cap, nodes, photos."""
+    n_missions = len(offsets) - 1
+    lengths_n = np.diff(offsets)
+    mission = np.repeat(np.arange(n_missions), lengths_n)
+
+    # Legs nodes[l] -> nodes[l + 1] within the same mission, gathered at once
+    same = mission[:-1] == mission[1:]
+    a, b = nodes[:-1][same], nodes[1:][same]
+    leg_len = np.asarray(distances[a, b], dtype=float)
+    length = np.bincount(mission[:-1][same], weights=leg_len, minlength=n_missions)
+
+    # Nodes that are not the depot
+    is_stop = nodes != DEPOT_INDEX
+    stops = np.bincount(mission[is_stop], minlength=n_missions)
+    table = {
+        "mission": np.arange(n_missions),
+        "length_ft": length,
+        "margin_ft": battery_cap - length,
+        "over_cap": length > battery_cap,
+        "nodes": stops,
+    }
+    if photo_ids is not None:
+        is_photo = np.zeros(int(max(nodes.max(initial=0), photo_ids.max(initial=0))) + 1, dtype=bool)
+        is_photo[photo_ids] = True
+        hit = is_photo[nodes] & is_stop
+        table["photos"] = np.bincount(mission[hit], minlength=n_missions)
+    return table
+
+def coverage(nodes: np.ndarray, required: np.ndarray, n_points: int) -> Dict:
+    """Visits of each required node (depot excluded); missed and duplicated indices."""
+    counts = np.bincount(nodes[nodes != DEPOT_INDEX], minlength=n_points)[:n_points]
+    required = required[required != DEPOT_INDEX]
+    visits = counts[required]
+    return {
+        "required": int(len(required)),
+        "covered": int(np.count_nonzero(visits)),
+        "fraction": float(np.count_nonzero(visits) / len(required)) if len(required) else 1.0,
+        "missed": required[visits == 0],
+        "duplicates": required[visits > 1],
+    }
+
+def evaluate(distances, routes=None, battery_cap: float = MAX_BATTERY_CAP,
+             photo_ids: Optional[np.ndarray] = None, asset_ids: Optional[np.ndarray] = None,
+             csr: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Dict:
+    """
+    Scores one route set (`routes`, or CSR `csr=(nodes, offsets)`).
+    Returns {"missions": table, "summary": {...}, "photos": coverage, "assets": coverage}.
+    """
+    nodes, offsets = csr if csr is not None else to_csr(routes)
+    n_points = len(distances)
+    table = mission_table(distances, nodes, offsets, battery_cap, photo_ids)
+    used = table["nodes"] > 0
+
+    out = {"missions": table}
+    summary = {
+        "drones": int(np.count_nonzero(used)),
+        "total_ft": float(table["length_ft"].sum()),
+        "max_ft": float(table["length_ft"].max(initial=0.0)),
+        "min_margin_ft": float(table["margin_ft"][used].min(initial=battery_cap)),
+        "over_cap": int(np.count_nonzero(table["over_cap"])),
+    }
+    for key, ids in (("photos", photo_ids), ("assets", asset_ids)):
+        if ids is None:
+            continue
+        cov = coverage(nodes, ids, n_points)
+        out[key] = cov
+        summary[f"{key}_covered"] = cov["fraction"]
+        summary[f"{key}_missed"] = int(len(cov["missed"]))
+        summary[f"{key}_duplicates"] = int(len(cov["duplicates"]))
+    summary["feasible"] = summary["over_cap"] == 0 and summary.get("photos_missed", 0) == 0
+    out["summary"] = summary
+    return out
+
+
+# --- Output ------------------------------------------------------------
+def write_table(path, table: Dict[str, np.ndarray]) -> None:
+    """Saves a columnar table as .npz, .csv or .json (by suffix)."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".npz":
+        np.savez(path, **table)
+    elif suffix == ".csv":
+        cols = list(table)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(cols)
+            writer.writerows(zip(*(np.asarray(table[c]).tolist() for c in cols)))
+    elif suffix == ".json":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({c: np.asarray(v).tolist() for c, v in table.items()}, f, indent=2)
+    else:
+        raise ValueError(f"unsupported table format {suffix!r}; use .npz, .csv or .json")
+
+
+def load_evaluation_inputs(data_dir=DATA_DIR):
+    """(distances, photo_ids, asset_ids) for `evaluate`."""
+    from src.matrix_store import open_matrices
+
+    data_dir = Path(data_dir)
+    distances, _ = open_matrices(data_dir)
+    n = len(distances)
+    photo_ids = index_slice(np.load(data_dir / "photo_indexes.npy"), n)
+    asset_ids = index_slice(np.load(data_dir / "asset_indexes.npy"), n)
+    return distances, photo_ids, asset_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized metrics for a route set")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--routes", default=str(OPT_DIR / "routes_global.npy"))
+    parser.add_argument("--battery-cap", type=float, default=MAX_BATTERY_CAP)
+    parser.add_argument("--out", default=None, help="per-mission table (.npz, .csv or .json)")
+    parser.add_argument("--lengths-npy", default=None, help="also write mission lengths, e.g. "
+                        "Optimized_Paths/mission_lengths_feet.npy")
+    args = parser.parse_args()
+
+    from src.route_io import load_routes
+
+    distances, photo_ids, asset_ids = load_evaluation_inputs(args.data_dir)
+    result = evaluate(distances, load_routes(args.routes), args.battery_cap, photo_ids, asset_ids)
+    table, summary = result["missions"], result["summary"]
+
+    for m in range(len(table["mission"])):
+        flag = "  OVER CAP" if table["over_cap"][m] else ""
+        print(f"[metrics] mission {m}: len={table['length_ft'][m]:.0f} ft margin={table['margin_ft'][m]:.0f} ft "
+              f"nodes={table['nodes'][m]} photos={table['photos'][m]}{flag}")
+    print(f"[metrics] {summary['drones']} drones, total {summary['total_ft']:.0f} ft, "
+          f"max {summary['max_ft']:.0f} ft, min margin {summary['min_margin_ft']:.0f} ft")
+    photos = result["photos"]
+    print(f"[metrics] photo coverage {photos['covered']}/{photos['required']} "
+          f"({len(photos['missed'])} missed, {len(photos['duplicates'])} duplicated)")
+    if len(photos["missed"]):
+        print(f"[metrics]   missed: {photos['missed'][:20].tolist()}{' ...' if len(photos['missed']) > 20 else ''}")
+
+    if args.out:
+        write_table(args.out, table)
+        print(f"[metrics] wrote {args.out}")
+    if args.lengths_npy:
+        np.save(args.lengths_npy, np.rint(table["length_ft"]).astype(np.int64))
+        print(f"[metrics] wrote {args.lengths_npy}")
@@ -0,0 +1,316 @@
+"""
+KDKR src/shared_data.py
+
+Resident loader that keeps one copy of the world in shared memory.
+
+`serve` loads a Data folder once and publishes every array into its own
+`multiprocessing.shared_memory` block:
+  points, asset_indexes, photo_indexes, waypoint_indexes   as stored in the .npy files
+  distances, predecessors   what open_matrices returns (compact .kdm dtypes when converted)
+  polygon_wkb               polygon_lon_lat.wkt as WKB (no WKT parsing in the clients)
+  polygon_exterior          (M, 2) exterior ring of the largest polygon part
+plus a small JSON manifest block with each array's block name, dtype and shape
+and the mtime/size of the files it came from. Block names are derived from the
+resolved data folder, so every Data folder gets its own set.
+
+`attach(data_dir)` maps those blocks in a few milliseconds and returns a
+`SharedWorld` of read-only arrays, or None when no daemon serves data_dir or
+its files changed since they were published (callers then load the files as
+before). `open_matrices`, `RouteFinder.load_assets`, `visualize_map.load_world`
+and frontend/sim/data_model.py go through it, so solver workers, renderers and
+the Flask server share one physical copy. The daemon polls the files and
+republishes when they change.
+
+Usage (from the repo root):
+  python -m src.shared_data serve            # stays in the foreground, Ctrl-C unlinks the blocks
+  python -m src.shared_data status
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import signal
+import struct
+import time
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from src.config import DATA_DIR
+
+BLOCK_PREFIX = "kdkr"
+MANIFEST_SIZE = 64 * 1024
+MANIFEST_HEADER = struct.Struct("<I")          # JSON length
+POLL_INTERVAL = 2.0
+POLYGON_FILE = "polygon_lon_lat.wkt"
+ARRAY_FILES = {
+    "points": "points_lat_long.npy",
+    "asset_indexes": "asset_indexes.npy",
+    "photo_indexes": "photo_indexes.npy",
+    "waypoint_indexes": "waypoint_indexes.npy",
+}
+MATRIX_FILES = ("distance_matrix.kdm", "predecessors.kdm", "distance_matrix.npy", "predecessors.npy")
+
+
+# --- Naming and file signatures ----------------------------------------
+def _dir_key(data_dir: Union[str, Path]) -> str:
+    return hashlib.sha1(str(Path(data_dir).resolve()).encode()).hexdigest()[:8]
+
+def manifest_name(data_dir: Union[str, Path]) -> str:
+    return f"{BLOCK_PREFIX}_{_dir_key(data_dir)}_manifest"
+
+def _signature(data_dir: Path) -> Dict[str, Optional[List[int]]]:
+    """mtime/size of every file the daemon reads (None when missing)."""
+    sig = {}
+    for name in (*ARRAY_FILES.values(), POLYGON_FILE, *MATRIX_FILES):
+        try:
+            st = (data_dir / name).stat()
+            sig[name] = [st.st_mtime_ns, st.st_size]
+        except FileNotFoundError:
+            sig[name] = None
+    return sig
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name)
+    # Attaching registers the block with this process's resource tracker, which
+    # would unlink it when we exit; only the daemon owns the blocks
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+def _create_block(name: str, size: int) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:                     # left behind by a daemon that was killed
+        _attach_block(name).unlink()
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+# --- Loading -----------------------------------------------------------
+def load_world_arrays(data_dir: Union[str, Path]) -> Dict[str, np.ndarray]:
+    """Everything the daemon publishes, read from the files. Missing files are skipped."""
+    from src.matrix_store import open_matrices
+
+    data_dir = Path(data_dir)
+    arrays = {}
+    for name, filename in ARRAY_FILES.items():
+        path = data_dir / filename
+        if path.exists():
+            arr = np.load(path, allow_pickle=True)
+            if arr.dtype != object:
+                arrays[name] = arr
+
+    polygon_path = data_dir / POLYGON_FILE
+    if polygon_path.exists():
+        import shapely
+        from src.geofence import load_polygon
+
+        polygon = load_polygon(polygon_path)
+        largest = max(getattr(polygon, "geoms", [polygon]), key=lambda p: p.area)
+        arrays["polygon_wkb"] = np.frombuffer(shapely.to_wkb(polygon), dtype=np.uint8)
+        arrays["polygon_exterior"] = np.asarray(largest.exterior.coords)
+
+    try:
+        distances, predecessors = open_matrices(data_dir, shared=False)
+        arrays["distances"] = np.asarray(distances)
+        arrays["predecessors"] = np.asarray(predecessors)
+    except FileNotFoundError:
+        pass
+    return arrays
+
+
+# --- Daemon ------------------------------------------------------------
+class Publisher:
+    """Owns the blocks of one data folder; publish() replaces them with a new generation."""
+
+    def __init__(self, data_dir: Union[str, Path] = DATA_DIR):
+        self.data_dir = Path(data_dir).resolve()
+        self.generation = 0
+        self.signature: Dict = {}
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self._manifest: Optional[shared_memory.SharedMemory] = None
+
+    def publish(self) -> Dict:
+        signature = _signature(self.data_dir)
+        arrays = load_world_arrays(self.data_dir)
+        self.generation += 1
+        prefix = f"{BLOCK_PREFIX}_{_dir_key(self.data_dir)}_{self.generation}"
+
+        blocks, entries = [], {}
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = _create_block(f"{prefix}_{name}", max(1, arr.nbytes))
+            np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+            blocks.append(shm)
+            entries[name] = {"block": shm.name, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+
+        manifest = {"data_dir": str(self.data_dir), "pid": os.getpid(), "generation": self.generation,
+                    "published": time.time(), "signature": signature, "arrays": entries}
+        raw = json.dumps(manifest).encode()
+        if MANIFEST_HEADER.size + len(raw) > MANIFEST_SIZE:
+            raise ValueError(f"manifest is {len(raw)} bytes, more than {MANIFEST_SIZE}")
+
+        # Swap the manifest first so new clients only ever see complete blocks;
+        # clients still mapping the old generation keep their pages until they exit
+        old_blocks, old_manifest = self._blocks, self._manifest
+        if old_manifest is not None:
+            old_manifest.close()
+            old_manifest.unlink()
+        self._manifest = _create_block(manifest_name(self.data_dir), MANIFEST_SIZE)
+        self._manifest.buf[MANIFEST_HEADER.size:MANIFEST_HEADER.size + len(raw)] = raw
+        MANIFEST_HEADER.pack_into(self._manifest.buf, 0, len(raw))
+        self._blocks, self.signature = blocks, signature
+        for shm in old_blocks:
+            shm.close()
+            shm.unlink()
+        return manifest
+
+    def stale(self) -> bool:
+        return _signature(self.data_dir) != self.signature
+
+    def close(self) -> None:
+        for shm in self._blocks + ([self._manifest] if self._manifest is not None else []):
+            shm.close()
+            shm.unlink()
+        self._blocks, self._manifest = [], None
+
+def serve(data_dir: Union[str, Path] = DATA_DIR, poll: float = POLL_INTERVAL) -> None:
+    """Publishes data_dir and republishes whenever its files change, until SIGINT/SIGTERM."""
+    publisher = Publisher(data_dir)
+    running = _read_manifest(publisher.data_dir)
+    if running is not None and _alive(running["pid"]):
+        raise SystemExit(f"[shared] {publisher.data_dir} is already served by pid {running['pid']}")
+
+    def _stop(*_):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        manifest = publisher.publish()
+        _report(manifest)
+        while True:
+            time.sleep(poll)
+            if publisher.stale():
+                _report(publisher.publish())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+        print(f"[shared] unlinked blocks for {publisher.data_dir}")
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _report(manifest: Dict) -> None:
+    total = sum(np.dtype(e["dtype"]).itemsize * int(np.prod(e["shape"])) for e in manifest["arrays"].values())
+    print(f"[shared] generation {manifest['generation']} of {manifest['data_dir']}: "
+          f"{len(manifest['arrays'])} arrays, {total / 1e6:.1f} MB")
+    for name, e in manifest["arrays"].items():
+        print(f"[shared]   {name:17s} {e['dtype']:4s} {tuple(e['shape'])}")
+
+
+# --- Client ------------------------------------------------------------
+@dataclass
+class SharedWorld:
+    """Read-only views over one generation of a daemon's blocks."""
+    manifest: Dict
+    arrays: Dict[str, np.ndarray]
+    _blocks: List[shared_memory.SharedMemory] = field(default_factory=list, repr=False)
+    _polygon: object = field(default=None, repr=False)
+
+    def get(self, name: str) -> Optional[np.ndarray]:
+        return self.arrays.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+    def polygon(self):
+        """The flight polygon as a prepared shapely geometry (shapely is imported here)."""
+        if self._polygon is None and "polygon_wkb" in self.arrays:
+            import shapely
+
+            self._polygon = shapely.from_wkb(self.arrays["polygon_wkb"].tobytes())
+            shapely.prepare(self._polygon)
+        return self._polygon
+
+def _read_manifest(data_dir: Path) -> Optional[Dict]:
+    try:
+        shm = _attach_block(manifest_name(data_dir))
+    except FileNotFoundError:
+        return None
+    try:
+        (length,) = MANIFEST_HEADER.unpack_from(shm.buf, 0)
+        return json.loads(bytes(shm.buf[MANIFEST_HEADER.size:MANIFEST_HEADER.size + length]))
+    except ValueError:
+        return None                             # caught mid-publish
+    finally:
+        shm.close()
+
+_ATTACHED: Dict[Path, SharedWorld] = {}
+
+def attach(data_dir: Union[str, Path] = DATA_DIR) -> Optional[SharedWorld]:
+    """
+    The daemon's arrays for data_dir, or None when there is no daemon or its
+    files changed since they were published. Cached per process; the cache is
+    revalidated against the files (a handful of stat calls) on every call.
+    """
+    data_dir = Path(data_dir).resolve()
+    signature = _signature(data_dir)
+    world = _ATTACHED.get(data_dir)
+    if world is not None and world.manifest["signature"] == signature:
+        return world
+
+    manifest = _read_manifest(data_dir)
+    if manifest is None or manifest["signature"] != signature:
+        _ATTACHED.pop(data_dir, None)
+        return None
+    blocks, arrays = [], {}
+    try:
+        for name, e in manifest["arrays"].items():
+            shm = _attach_block(e["block"])
+            blocks.append(shm)
+            arr = np.ndarray(tuple(e["shape"]), np.dtype(e["dtype"]), buffer=shm.buf)
+            arr.flags.writeable = False
+            arrays[name] = arr
+    except FileNotFoundError:                   # republished while attaching
+        return None
+    world = SharedWorld(manifest, arrays, blocks)
+    _ATTACHED[data_dir] = world
+    return world
+
+def load_array(name: str, data_dir: Union[str, Path] = DATA_DIR) -> np.ndarray:
+    """Array `name` of ARRAY_FILES from the daemon serving data_dir, else from its .npy file."""
+    world = attach(data_dir)
+    if world is not None and name in world:
+        return world.arrays[name]
+    return np.load(Path(data_dir) / ARRAY_FILES[name])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-memory copy of a Data folder")
+    parser.add_argument("cmd", choices=["serve", "status"])
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL, help="seconds between file checks")
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        serve(args.data_dir, args.poll)
+    else:
+        t0 = time.perf_counter()
+        world = attach(args.data_dir)
+        attach_ms = (time.perf_counter() - t0) * 1e3
+        if world is None:
+            manifest = _read_manifest(Path(args.data_dir).resolve())
+            print("[shared] files changed since the daemon published them" if manifest
+                  else f"[shared] no daemon serves {args.data_dir}")
+        else:
+            _report(world.manifest)
+            print(f"[shared] daemon pid {world.manifest['pid']}, attached in {attach_ms:.1f} ms")
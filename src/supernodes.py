@@ -0,0 +1,145 @@
+"""
+KDKR src/supernodes.py
+
+Asset-cluster reduction of the routing model.
+
+Only the photo waypoints have to be visited (Data/DRONE_CHALLENGE_GUIDE.md),
+and they come in rings of about 4 around each asset. `build_supernodes`
+collapses every ring into one super-node:
+  - each photo joins its nearest asset when it lies within `ring_factor` times
+    the median photo-to-asset distance; photos with no asset nearby stay single,
+  - the ring's visiting order is the cheapest open path through its photos
+    (all orders scored in one array op per ring size), which fixes its entry,
+    exit and internal cost,
+  - the reduced cost i -> j is internal(i) + distance(exit(i), entry(j)), so a
+    reduced route costs exactly what its expanded route flies and the battery
+    dimension needs no slack.
+`SuperNodes.expand` turns reduced routes back into full node sequences. It also
+picks each ring's direction (forward or reversed) with a small DP per route,
+which can only shorten it. On the 4274-node data set the model shrinks from
+every node to about 750 super-nodes.
+"""
+
+import itertools
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import numpy as np
+
+from src.config import DEPOT_INDEX
+
+RING_FACTOR = 2.0
+MAX_GROUP = 7                  # 7! = 5040 orders per ring; larger rings keep their nearest photos
+CHUNK_ROWS = 1024
+
+
+def _dist(distances, a, b) -> np.ndarray:
+    return np.asarray(distances[a, b], dtype=float)
+
+def asset_groups(distances, photo_ids: np.ndarray, asset_ids: np.ndarray,
+                 ring_factor: float = RING_FACTOR, max_group: int = MAX_GROUP) -> List[np.ndarray]:
+    """Photo ids grouped by nearest asset (one array per ring or stray photo)."""
+    photo_ids = np.asarray(photo_ids, dtype=np.int64)
+    if len(asset_ids) == 0 or len(photo_ids) == 0:
+        return [np.array([p]) for p in photo_ids]
+
+    nearest = np.empty(len(photo_ids), dtype=np.int64)
+    gap = np.empty(len(photo_ids))
+    for start in range(0, len(photo_ids), CHUNK_ROWS):
+        rows = photo_ids[start:start + CHUNK_ROWS]
+        block = np.asarray(distances[rows[:, None], asset_ids[None, :]], dtype=float)
+        nearest[start:start + len(rows)] = np.argmin(block, axis=1)
+        gap[start:start + len(rows)] = block.min(axis=1)
+
+    ringed = gap <= ring_factor * np.median(gap)
+    groups = [np.array([p]) for p in photo_ids[~ringed]]
+    order = np.lexsort((gap[ringed], nearest[ringed]))              # by asset, nearest photos first
+    by_asset = nearest[ringed][order]
+    members = photo_ids[ringed][order]
+    for ring in np.split(members, np.flatnonzero(np.diff(by_asset)) + 1):
+        groups.append(ring[:max_group])
+        groups.extend(np.array([p]) for p in ring[max_group:])
+    return groups
+
+def best_orders(distances, groups: Sequence[np.ndarray]) -> List[np.ndarray]:
+    """Each group in its cheapest open-path order; groups of one size are scored together."""
+    out: List[np.ndarray] = list(groups)
+    sizes = np.array([len(g) for g in groups])
+    for size in np.unique(sizes[sizes > 2]):
+        idx = np.flatnonzero(sizes == size)
+        G = np.stack([groups[i] for i in idx])                       # (ng, g)
+        local = np.asarray(distances[G[:, :, None], G[:, None, :]], dtype=float)
+        perms = np.array(list(itertools.permutations(range(size))))
+        perms = perms[perms[:, 0] < perms[:, -1]]                    # a path and its reverse once
+        cost = sum(local[:, perms[:, t], perms[:, t + 1]] for t in range(size - 1))
+        best = perms[np.argmin(cost, axis=1)]
+        for row, i in enumerate(idx):
+            out[i] = G[row, best[row]]
+    return out
+
+
+@dataclass
+class SuperNodes:
+    """Super-node s visits members[s] in order; super-node 0 is the depot."""
+    members: List[np.ndarray]
+    internal: np.ndarray                # (S,) cost through members[s] forward
+    internal_rev: np.ndarray            # (S,) same, reversed
+    costs: np.ndarray                   # (S, S) internal[i] + distance(exit(i), entry(j))
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def to_super(self, routes: Sequence[Sequence[int]]) -> List[List[int]]:
+        """Full routes as super-node routes (first visit of each ring), e.g. for warm starts."""
+        lookup = {int(n): s for s, m in enumerate(self.members) for n in m}
+        out = []
+        for route in routes:
+            seq = list(dict.fromkeys(lookup[int(n)] for n in route if int(n) in lookup))
+            out.append([0] + [s for s in seq if s != 0] + [0])
+        return out
+
+    def expand(self, distances, super_routes: Sequence[Sequence[int]]) -> List[List[int]]:
+        """Full node routes, each ring flown in whichever direction is shorter in context."""
+        out = []
+        for route in super_routes:
+            route = [int(s) for s in route]
+            # DP over ring directions: cost[o] = best length so far ending with direction o
+            ends = [(self.members[s][0], self.members[s][-1]) for s in route]
+            cost = np.array([0.0, np.inf])
+            back = []
+            for k in range(1, len(route)):
+                s = route[k]
+                entry = np.array([ends[k][0], ends[k][1]])
+                exit_prev = np.array([ends[k - 1][1], ends[k - 1][0]])
+                step = cost[:, None] + _dist(distances, exit_prev[:, None], entry[None, :])
+                step += np.array([self.internal[s], self.internal_rev[s]])[None, :]
+                back.append(np.argmin(step, axis=0))
+                cost = step.min(axis=0)
+            direction = [int(np.argmin(cost))]
+            for b in reversed(back):
+                direction.append(int(b[direction[-1]]))
+            direction.reverse()
+            nodes = [self.members[s][::-1] if d else self.members[s] for s, d in zip(route, direction)]
+            out.append(np.concatenate(nodes).tolist() if nodes else [])
+        return out
+
+def build_supernodes(distances, photo_ids: np.ndarray, asset_ids: np.ndarray,
+                     ring_factor: float = RING_FACTOR, depot: int = DEPOT_INDEX) -> SuperNodes:
+    photo_ids = np.asarray(photo_ids, dtype=np.int64)
+    photo_ids = photo_ids[photo_ids != depot]
+    groups = best_orders(distances, asset_groups(distances, photo_ids, np.asarray(asset_ids, dtype=np.int64),
+                                                 ring_factor))
+    members = [np.array([depot], dtype=np.int64)] + [np.asarray(g, dtype=np.int64) for g in groups]
+
+    internal = np.zeros(len(members))
+    internal_rev = np.zeros(len(members))
+    for s, m in enumerate(members):
+        if len(m) > 1:
+            internal[s] = _dist(distances, m[:-1], m[1:]).sum()
+            internal_rev[s] = _dist(distances, m[1:], m[:-1]).sum()
+
+    entries = np.array([m[0] for m in members])
+    exits = np.array([m[-1] for m in members])
+    costs = np.asarray(distances[exits[:, None], entries[None, :]], dtype=float) + internal[:, None]
+    np.fill_diagonal(costs, 0.0)
+    return SuperNodes(members, internal, internal_rev, costs)
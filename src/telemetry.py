@@ -0,0 +1,313 @@
+"""
+KDKR src/telemetry.py
+
+Columnar telemetry store for fleet runs (src/fleet_sim.py), so a mission can be
+scrubbed or compared after the fact without re-simulating.
+
+`TelemetryRecorder` appends one row per active drone per tick into
+preallocated NumPy ring buffers, one per column (COLUMNS). When the buffer
+fills (or on `flush`/`close`) its rows go to disk as one chunk: a directory
+with one .npy file per column, opened later with mmap_mode="r". `index.json`
+lists the chunks with their first/last time and is rewritten atomically after
+every flush, so a reader can follow a run while it is recorded.
+
+`TelemetryRun.query(t0, t1)` finds the rows in a time range by binary search:
+first over the chunk start/end times, then over the memory-mapped time column
+of each touched chunk, so only the pages holding the range are read.
+`points` downsamples the range to at most that many samples per mission (the
+last row in each of `points` equal time bins). The unflushed tail of a live
+recorder in the same process is included when it is passed in.
+
+Layout:
+  Data/telemetry/<run>/index.json
+  Data/telemetry/<run>/000000/{t,mission,lat,lon,alt,soc,wp,state}.npy
+
+Usage (from the repo root):
+  python -m src.telemetry record --dt 1 --speed 12          # records a run of routes_global.npy
+  python -m src.telemetry list
+  python -m src.telemetry query <run> --t0 600 --t1 1200 --points 100 --mission 3
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.config import DATA_DIR
+
+TELEMETRY_DIR = DATA_DIR / "telemetry"
+INDEX_FILE = "index.json"
+CHUNK_ROWS = 1 << 16              # rows per ring buffer / chunk file
+FORMAT_VERSION = 1
+
+COLUMNS = {
+    "t": np.float64,              # sim time (s)
+    "mission": np.int32,          # drone / route index
+    "lat": np.float64,
+    "lon": np.float64,
+    "alt": np.float32,            # m
+    "soc": np.float32,            # %
+    "wp": np.int32,               # active waypoint index
+    "state": np.int8,             # fleet_sim RUNNING / FINISHED / DEPLETED
+}
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid() % 10000:04d}"
+
+def _write_json(path: Path, payload: Dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(payload))
+    os.replace(tmp, path)
+
+
+# --- Recording ---------------------------------------------------------
+class TelemetryRecorder:
+    """Ring buffers of CHUNK_ROWS rows per column, flushed to run_dir as chunk directories."""
+
+    def __init__(self, run_dir, chunk_rows: int = CHUNK_ROWS, meta: Optional[Dict] = None):
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_rows = int(chunk_rows)
+        self.buffers = {name: np.empty(self.chunk_rows, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0
+        self.last_t = -np.inf
+        self.chunks: List[Dict] = []
+        self.meta = dict(meta or {})
+        self.closed = False
+        self._lock = threading.Lock()         # appends vs. tail() from a server thread
+        self._write_index()
+
+    @property
+    def run_id(self) -> str:
+        return self.run_dir.name
+
+    @property
+    def rows(self) -> int:
+        return sum(c["rows"] for c in self.chunks) + self.size
+
+    def append(self, t: float, **columns) -> None:
+        """
+        One tick: scalar t plus equal-length arrays for the other COLUMNS
+        (missing columns are recorded as 0). Time must not go backwards.
+        """
+        if t < self.last_t:
+            raise ValueError(f"telemetry time went backwards: {t} < {self.last_t}")
+        with self._lock:
+            self._append(t, columns)
+        self.last_t = t
+
+    def _append(self, t: float, columns: Dict) -> None:
+        n = len(columns["mission"])
+        done = 0
+        while done < n:
+            take = min(n - done, self.chunk_rows - self.size)
+            rows = slice(self.size, self.size + take)
+            self.buffers["t"][rows] = t
+            for name in COLUMNS:
+                if name != "t":
+                    self.buffers[name][rows] = columns[name][done:done + take] if name in columns else 0
+            self.size += take
+            done += take
+            if self.size == self.chunk_rows:
+                self._flush()
+
+    def record(self, sim, drones: Optional[np.ndarray] = None) -> None:
+        """Appends the current state of a FleetSim, for `drones` (default: the running ones)."""
+        from src.fleet_sim import RUNNING
+
+        k = np.flatnonzero(sim.state == RUNNING) if drones is None else np.asarray(drones)
+        self.append(sim.t, mission=k, lat=sim.lat[k], lon=sim.lon[k], alt=sim.alt[k],
+                    soc=sim.soc[k], wp=sim.idx[k], state=sim.state[k])
+
+    def tail(self) -> Dict[str, np.ndarray]:
+        """Copy of the rows still in the ring buffer."""
+        with self._lock:
+            return {name: buf[:self.size].copy() for name, buf in self.buffers.items()}
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.size == 0:
+            return
+        name = f"{len(self.chunks):06d}"
+        chunk_dir = self.run_dir / name
+        chunk_dir.mkdir(exist_ok=True)
+        for column, buf in self.buffers.items():
+            np.save(chunk_dir / f"{column}.npy", buf[:self.size])
+        t = self.buffers["t"]
+        self.chunks.append({"name": name, "rows": self.size, "t0": float(t[0]), "t1": float(t[self.size - 1])})
+        self.size = 0
+        self._write_index()
+
+    def close(self) -> None:
+        self.flush()
+        self.closed = True
+        self._write_index()
+
+    def _write_index(self) -> None:
+        _write_json(self.run_dir / INDEX_FILE, {
+            "version": FORMAT_VERSION,
+            "columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+            "chunks": self.chunks,
+            "closed": self.closed,
+            "meta": self.meta,
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Replay ------------------------------------------------------------
+class TelemetryRun:
+    """Read side of one run directory; re-reads index.json when it changes."""
+
+    def __init__(self, run_dir):
+        self.run_dir = Path(run_dir)
+        self._stamp = None
+        self._mapped: Dict[str, Dict[str, np.ndarray]] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        st = (self.run_dir / INDEX_FILE).stat()
+        if (st.st_mtime_ns, st.st_size) == self._stamp:
+            return
+        index = json.loads((self.run_dir / INDEX_FILE).read_text())
+        if index.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{self.run_dir}: unsupported telemetry version {index.get('version')}")
+        self.index = index
+        self.chunks = index["chunks"]
+        self.chunk_t0 = np.array([c["t0"] for c in self.chunks])
+        self.chunk_t1 = np.array([c["t1"] for c in self.chunks])
+        self._stamp = (st.st_mtime_ns, st.st_size)
+
+    def _chunk(self, i: int) -> Dict[str, np.ndarray]:
+        name = self.chunks[i]["name"]
+        if name not in self._mapped:
+            self._mapped[name] = {c: np.load(self.run_dir / name / f"{c}.npy", mmap_mode="r") for c in COLUMNS}
+        return self._mapped[name]
+
+    def info(self, live: Optional[TelemetryRecorder] = None) -> Dict:
+        self.refresh()
+        rows = sum(c["rows"] for c in self.chunks)
+        t0 = self.chunks[0]["t0"] if self.chunks else None
+        t1 = self.chunks[-1]["t1"] if self.chunks else None
+        tail = live.tail()["t"] if live is not None else []
+        if len(tail):
+            rows += len(tail)
+            t0 = float(tail[0]) if t0 is None else t0
+            t1 = float(tail[-1])
+        return {"run": self.run_dir.name, "rows": rows, "chunks": len(self.chunks), "t0": t0, "t1": t1,
+                "closed": self.index["closed"] and live is None, "meta": self.index["meta"]}
+
+    def query(self, t0: float = -np.inf, t1: float = np.inf, points: Optional[int] = None,
+              mission: Optional[int] = None, live: Optional[TelemetryRecorder] = None) -> Dict[str, np.ndarray]:
+        """Rows with t0 <= t <= t1 (optionally one mission), downsampled to `points` per mission."""
+        self.refresh()
+        parts = []
+        first = int(np.searchsorted(self.chunk_t1, t0, side="left"))
+        last = int(np.searchsorted(self.chunk_t0, t1, side="right"))
+        for i in range(first, last):
+            cols = self._chunk(i)
+            lo = int(np.searchsorted(cols["t"], t0, side="left"))
+            hi = int(np.searchsorted(cols["t"], t1, side="right"))
+            if hi > lo:
+                parts.append({c: np.asarray(a[lo:hi]) for c, a in cols.items()})
+        if live is not None:
+            cols = live.tail()
+            lo = int(np.searchsorted(cols["t"], t0, side="left"))
+            hi = int(np.searchsorted(cols["t"], t1, side="right"))
+            if hi > lo:
+                parts.append({c: a[lo:hi] for c, a in cols.items()})
+
+        if parts:
+            out = {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
+        else:
+            out = {c: np.empty(0, dtype=dtype) for c, dtype in COLUMNS.items()}
+        if mission is not None:
+            keep = out["mission"] == mission
+            out = {c: a[keep] for c, a in out.items()}
+        if points and len(out["t"]):
+            out = downsample(out, points)
+        return out
+
+
+def downsample(cols: Dict[str, np.ndarray], points: int) -> Dict[str, np.ndarray]:
+    """Last row of every mission in each of `points` equal time bins (rows are in time order)."""
+    t = cols["t"]
+    span = t[-1] - t[0]
+    bins = np.zeros(len(t), dtype=np.int64) if span <= 0 else \
+        np.minimum(((t - t[0]) / span * points).astype(np.int64), points - 1)
+    key = cols["mission"].astype(np.int64) * points + bins
+    _, last = np.unique(key[::-1], return_index=True)
+    keep = np.sort(len(t) - 1 - last)
+    return {c: a[keep] for c, a in cols.items()}
+
+def to_payload(cols: Dict[str, np.ndarray]) -> Dict[str, List]:
+    """JSON-ready columns (state as names)."""
+    from src.fleet_sim import STATE_NAMES
+
+    out = {c: a.tolist() for c, a in cols.items() if c != "state"}
+    out["state"] = [STATE_NAMES[s] for s in cols["state"]]
+    return out
+
+def list_runs(root=TELEMETRY_DIR) -> List[str]:
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(p.name for p in root.iterdir() if (p / INDEX_FILE).exists())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay columnar fleet telemetry")
+    parser.add_argument("--root", default=str(TELEMETRY_DIR))
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="simulate routes_global.npy (src/fleet_sim.py) and record every tick")
+    rec.add_argument("--data-dir", default=str(DATA_DIR))
+    rec.add_argument("--routes", default=None)
+    rec.add_argument("--dt", type=float, default=1.0)
+    rec.add_argument("--speed", type=float, default=12.0)
+    rec.add_argument("--run", default=None, help="run id (default: timestamp)")
+    sub.add_parser("list")
+    q = sub.add_parser("query")
+    q.add_argument("run")
+    q.add_argument("--t0", type=float, default=-np.inf)
+    q.add_argument("--t1", type=float, default=np.inf)
+    q.add_argument("--points", type=int, default=None, help="max samples per mission")
+    q.add_argument("--mission", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.cmd == "record":
+        from src.fleet_sim import load_fleet
+
+        sim = load_fleet(args.data_dir, args.routes, speed_mps=args.speed)
+        run_dir = Path(args.root) / (args.run or new_run_id())
+        t_start = time.perf_counter()
+        with TelemetryRecorder(run_dir, meta={"dt": args.dt, "speed_mps": args.speed, "drones": sim.n}) as rec:
+            for _ in sim.run(args.dt, on_step=rec.record):
+                pass
+        print(f"[telemetry] {run_dir.name}: {rec.rows} rows in {len(rec.chunks)} chunks, "
+              f"{sim.t:.0f}s simulated in {time.perf_counter() - t_start:.2f}s")
+    elif args.cmd == "list":
+        for run_id in list_runs(args.root):
+            info = TelemetryRun(Path(args.root) / run_id).info()
+            print(f"[telemetry] {run_id}: {info['rows']} rows, t={info['t0']}..{info['t1']}s, "
+                  f"{'closed' if info['closed'] else 'recording'}")
+    else:
+        run = TelemetryRun(Path(args.root) / args.run)
+        t0 = time.perf_counter()
+        cols = run.query(args.t0, args.t1, args.points, args.mission)
+        print(f"[telemetry] {len(cols['t'])} rows in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for i in range(min(len(cols["t"]), 10)):
+            print(f"[telemetry]   t={cols['t'][i]:.0f} mission={cols['mission'][i]} "
+                  f"lat={cols['lat'][i]:.6f} lon={cols['lon'][i]:.6f} soc={cols['soc'][i]:.1f} wp={cols['wp'][i]}")